@@ -1,4 +1,8 @@
+import asyncio
+import functools
+import json
 import logging
+import time
 import traceback
 import uuid
 
@@ -7,11 +11,21 @@ from appdaemon.plugins.mqtt.mqttapi import Mqtt
 from mqtt.exceptions import MqttPluginUnavailableException
 from mqtt.listener import MqttQolsysControlListener
 from mqtt.listener import MqttQolsysEventListener
+from mqtt.scheduler import MqttPublishScheduler
 from mqtt.updater import MqttUpdater
 from mqtt.updater import MqttWrapperFactory
 
+from qolsys.coalescer import QolsysZoneCoalescer
+from qolsys.actions import QolsysAction
+from qolsys.actions import QolsysActionArm
 from qolsys.config import QolsysGatewayConfig
 from qolsys.control import QolsysControl
+from qolsys.control import QolsysControlArmAway
+from qolsys.control import QolsysControlArmHome
+from qolsys.control import QolsysControlDisarm
+from qolsys.control import QolsysControlPolicy
+from qolsys.control import QolsysControlTrigger
+from qolsys.dedup import QolsysControlDeduplicator
 from qolsys.events import QolsysEvent
 from qolsys.events import QolsysEventAlarm
 from qolsys.events import QolsysEventArming
@@ -23,13 +37,57 @@ from qolsys.events import QolsysEventZoneEventAdd
 from qolsys.events import QolsysEventZoneEventUpdate
 from qolsys.exceptions import InvalidUserCodeException
 from qolsys.exceptions import MissingUserCodeException
+from qolsys.exceptions import QolsysControlTimeoutException
+from qolsys.exceptions import UnknownQolsysPartitionException
+from qolsys.history import QolsysZoneHistories
+from qolsys.journal import QolsysJournal
+from qolsys.mac import QolsysMacResolver
+from qolsys.metrics import QolsysMetrics
+from qolsys.metrics import current_trace
+from qolsys.profiler import QolsysStartupProfiler
+from qolsys.profiler import import_times
+from qolsys.profiler import is_app_module
+from qolsys.sensors import QolsysSensor
+from qolsys.snapshot import QolsysStateSnapshot
 from qolsys.socket import QolsysSocket
 from qolsys.state import QolsysState
+from qolsys.vocabulary import PARTITION_STATUS
+from qolsys.vocabulary import SENSOR_STATUS
 
 
 LOGGER = logging.getLogger(__name__)
 
 
+# The connections to the panel and states of the gateways that were just
+# terminated, by app name, so that a new instance of the same app can take
+# them over when AppDaemon restarts the app after a configuration change
+_RUNTIMES = {}
+
+
+class _QolsysGatewayRuntime(object):
+    def __init__(self, cfg: QolsysGatewayConfig, socket: QolsysSocket,
+                 tasks: dict, state: QolsysState, session_token: str,
+                 panel_mac: str, teardown: callable) -> None:
+        self.cfg = cfg
+        self.socket = socket
+        self.tasks = tasks
+        self.state = state
+        self.session_token = session_token
+        self.panel_mac = panel_mac
+        self.teardown = teardown
+        self.handle = None
+        self.incomplete = False
+
+        # The events received from the panel while no instance of the app
+        # handles them, to be replayed in order by the next one
+        self.pending = []
+
+    def parked_callback(self, name: str) -> callable:
+        async def callback(*args):
+            self.pending.append((name, args))
+        return callback
+
+
 class AppDaemonLoggingFilter(logging.Filter):
     def __init__(self, app, *args, **kwargs):
         super().__init__(*args, **kwargs)
@@ -69,12 +127,73 @@ def fqcn(o):
 
 
 class QolsysGateway(Mqtt):
+
+    # Configuration keys that require to connect again to the panel
+    _RECONNECT_KEYS = (
+        'panel_host',
+        'panel_port',
+        'panel_token',
+    )
+
+    # Configuration keys that can be reloaded without publishing the
+    # discovery of all the entities, with the entities that depend on them;
+    # changing a key that is not listed here affects all the entities
+    _RELOAD_KEYS = {
+        'panel_mac_cache_path': (),
+        'panel_ack_timeout': (),
+        'reload_grace_period': (),
+        'arm_away_exit_delay': (),
+        'arm_stay_exit_delay': (),
+        'arm_away_bypass': (),
+        'arm_stay_bypass': (),
+        'arm_type_custom_bypass': (),
+        'mqtt_attributes_interval': (),
+        'event_topic': (),
+        'metrics_topic': (),
+        'metrics_interval': (),
+        'metrics_port': (),
+        'metrics_host': (),
+        'diagnostics_interval': ('metrics', ),
+        'startup_profile': (),
+        'user_control_token': (),
+        'control_dedup_window': (),
+        'ha_check_user_code': ('partitions', ),
+        'ha_user_code': ('partitions', ),
+        'panel_user_code': ('partitions', ),
+        'code_arm_required': ('partitions', ),
+        'code_disarm_required': ('partitions', ),
+        'code_trigger_required': ('partitions', ),
+        'default_trigger_command': ('partitions', ),
+        'control_topic': ('partitions', ),
+        'default_sensor_device_class': ('sensors', ),
+        'enable_static_sensors_by_default': ('sensors', ),
+        'sensor_device_class': ('sensors', ),
+        'coalesce_window': ('sensors', ),
+        'zone_history_size': ('sensors', ),
+        'zone_history_attributes': ('sensors', ),
+        'state_snapshot_path': (),
+        'journal_path': (),
+        'journal_retention': (),
+    }
+
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
 
         self._qolsys_socket = None
         self._factory = None
+        self._scheduler = None
         self._state = None
+        self._coalescer = None
+        self._snapshot = None
+        self._journal = None
+        self._histories = None
+        self._metrics = None
+        self._dedup = None
+        self._control_policy = None
+        self._updater = None
+        self._mac_resolver = None
+        self._profiler = None
+        self._socket_tasks = {}
         self._redirect_logging()
 
     def _redirect_logging(self):
@@ -100,10 +219,34 @@ class QolsysGateway(Mqtt):
         rlogger.setLevel(logging.DEBUG)
 
     async def initialize(self):
+        started_at = time.monotonic()
         LOGGER.info('Starting')
         self._is_terminated = False
 
         cfg = self._cfg = QolsysGatewayConfig(self.args)
+        if cfg.startup_profile:
+            self._profiler = QolsysStartupProfiler(started_at)
+
+        # If the app was restarted because its configuration changed, we
+        # might be able to take over the connection and state of the
+        # previous instance
+        runtime = _RUNTIMES.pop(self.name, None)
+        if runtime is not None:
+            runtime.handle.cancel()
+            changed = runtime.cfg.changed_keys(cfg)
+            if changed & set(self._RECONNECT_KEYS):
+                LOGGER.info('Panel connection configuration changed, '
+                            'reconnecting')
+                runtime.teardown()
+                runtime = None
+
+        # Resolve the classes used to parse and publish the events now,
+        # instead of when the first events are received
+        QolsysEvent.warm_up()
+        QolsysSensor.warm_up()
+        QolsysControl.warm_up()
+        MqttWrapperFactory.warm_up()
+        self._profile('warm_up')
 
         mqtt_plugin_cfg = await self.get_plugin_config(namespace=cfg.mqtt_namespace)
         if mqtt_plugin_cfg is None:
@@ -111,26 +254,96 @@ class QolsysGateway(Mqtt):
                 'Unable to load the MQTT Plugin from AppDaemon, have you '
                 'configured the MQTT plugin properly in appdaemon.yaml?')
 
-        self._session_token = str(uuid.uuid4())
+        if runtime:
+            # Keep the session token, as it is part of the discovery of
+            # the partitions
+            self._session_token = runtime.session_token
+        else:
+            self._session_token = str(uuid.uuid4())
+
+        self._metrics = QolsysMetrics()
+
+        self._scheduler = MqttPublishScheduler(
+            mqtt_publish=self._timed_mqtt_publish,
+            attributes_interval=cfg.mqtt_attributes_interval,
+            metrics=self._metrics,
+        )
+
+        # The mac address of the panel is only resolved once connected, so
+        # that resolving it does not delay the start; if it was resolved
+        # before, it is already in the cache though
+        panel_mac = cfg.panel_mac
+        if panel_mac is None and runtime:
+            panel_mac = runtime.panel_mac
+        if panel_mac is None:
+            self._mac_resolver = QolsysMacResolver(
+                host=cfg.panel_host,
+                cache_path=cfg.panel_mac_cache_path,
+            )
+            panel_mac = self._mac_resolver.cached()
 
         self._factory = MqttWrapperFactory(
-            mqtt_publish=self.mqtt_publish,
+            mqtt_publish=self._timed_mqtt_publish,
             cfg=cfg,
             mqtt_plugin_cfg=mqtt_plugin_cfg,
             session_token=self._session_token,
+            scheduler=self._scheduler,
+            panel_mac=panel_mac,
         )
 
-        self._state = QolsysState()
-        try:
-            self._factory.wrap(self._state).set_unavailable()
-        except:  # noqa: E722
-            LOGGER.exception('Error setting state unavailable; pursuing')
+        if runtime:
+            self._state = runtime.state
+        else:
+            self._state = QolsysState()
+            try:
+                self._factory.wrap(self._state).set_unavailable()
+            except:  # noqa: E722
+                LOGGER.exception('Error setting state unavailable; pursuing')
+
+        self._coalescer = QolsysZoneCoalescer(
+            state=self._state,
+            windows=cfg.coalesce_window,
+        )
 
-        MqttUpdater(
+        self._updater = MqttUpdater(
             state=self._state,
-            factory=self._factory
+            factory=self._factory,
+            scheduler=self._scheduler,
         )
 
+        if cfg.zone_history_size:
+            self._histories = QolsysZoneHistories(
+                state=self._state,
+                size=cfg.zone_history_size,
+                attributes=cfg.zone_history_attributes,
+            )
+
+        # Restore the last known state, if any, so that the entities are
+        # ready before the panel sends its summary; the journal is written
+        # more often than the snapshot, so it is preferred when available
+        restored = False
+        if cfg.journal_path:
+            self._journal = QolsysJournal(
+                state=self._state,
+                path=cfg.journal_path,
+                retention=cfg.journal_retention,
+            )
+            if not runtime:
+                restored = await self._journal.restore()
+            self.create_task(self._journal.run())
+
+        if cfg.state_snapshot_path:
+            self._snapshot = QolsysStateSnapshot(
+                state=self._state,
+                path=cfg.state_snapshot_path,
+            )
+            if not restored and not runtime:
+                await self._snapshot.restore()
+
+        # Built after the restore, so that the restored secure arm of the
+        # partitions applies until the panel sends its summary
+        self._update_control_policy()
+
         MqttQolsysEventListener(
             app=self,
             namespace=cfg.mqtt_namespace,
@@ -138,6 +351,10 @@ class QolsysGateway(Mqtt):
             callback=self.mqtt_event_callback,
         )
 
+        self._dedup = QolsysControlDeduplicator(
+            window=cfg.control_dedup_window,
+        )
+
         MqttQolsysControlListener(
             app=self,
             namespace=cfg.mqtt_namespace,
@@ -145,19 +362,71 @@ class QolsysGateway(Mqtt):
             callback=self.mqtt_control_callback,
         )
 
-        self._qolsys_socket = QolsysSocket(
-            hostname=cfg.panel_host,
-            port=cfg.panel_port,
-            token=cfg.panel_token,
-            callback=self.qolsys_event_callback,
-            connected_callback=self.qolsys_connected_callback,
-            disconnected_callback=self.qolsys_disconnected_callback,
-        )
-        self.create_task(self._qolsys_socket.listen())
-        self.create_task(self._qolsys_socket.keep_alive())
+        if runtime:
+            self._take_over(runtime, changed)
+        else:
+            self._qolsys_socket = QolsysSocket(
+                hostname=cfg.panel_host,
+                port=cfg.panel_port,
+                token=cfg.panel_token,
+                callback=self.qolsys_event_callback,
+                connected_callback=self.qolsys_connected_callback,
+                disconnected_callback=self.qolsys_disconnected_callback,
+                ack_timeout=cfg.panel_ack_timeout,
+                metrics=self._metrics,
+            )
+
+            # The connection can outlive this instance of the app if its
+            # configuration is reloaded, so the tasks are not attached to
+            # the app, and cancelled on our side when tearing down
+            self._socket_tasks = self._qolsys_socket.create_tasks(
+                asyncio.get_running_loop())
+
+        if cfg.metrics_interval:
+            self.create_task(self._publish_metrics())
+
+        if cfg.diagnostics_interval:
+            self.create_task(self._publish_diagnostics())
+
+        if cfg.metrics_port:
+            try:
+                await self._metrics.serve(port=cfg.metrics_port,
+                                          host=cfg.metrics_host)
+            except OSError:
+                LOGGER.exception('Unable to serve the metrics on '
+                                 f'{cfg.metrics_host}:{cfg.metrics_port}; '
+                                 'pursuing')
+
+        self._profile('initialized')
+        if self._profiler:
+            self.create_task(self._profile_imports())
 
         LOGGER.info('Started')
 
+    def _profile(self, stage: str):
+        if not self._profiler:
+            return False
+
+        elapsed = self._profiler.mark(stage)
+        if elapsed is None:
+            return False
+
+        LOGGER.info(f'Startup profile: {stage} reached after '
+                    f'{elapsed * 1000:.1f}ms')
+        return True
+
+    async def _profile_imports(self, limit: int = 10):
+        times = await import_times('gateway')
+        if not times:
+            return
+
+        app_times = sorted((t for t in times if is_app_module(t[0])),
+                           key=lambda t: t[2], reverse=True)
+        for module, self_us, cumulative_us in app_times[:limit]:
+            LOGGER.info(f'Startup profile: import {module} took '
+                        f'{cumulative_us / 1000:.1f}ms '
+                        f'({self_us / 1000:.1f}ms excluding dependencies)')
+
     async def terminate(self):
         LOGGER.info('Terminating')
 
@@ -165,29 +434,241 @@ class QolsysGateway(Mqtt):
             LOGGER.info('No state or factory, nothing to terminate.')
             return
 
+        # Do not lose the final status of the zones still in a window
+        if self._coalescer:
+            self._coalescer.flush()
+
+        if self._snapshot:
+            await self._snapshot.save()
+
+        if self._journal:
+            await self._journal.close()
+
+        if self._metrics:
+            self._metrics.close()
+
+        self._is_terminated = True
+
+        if self._cfg.reload_grace_period and self._qolsys_socket:
+            self._park()
+        else:
+            self._teardown()
+
+        LOGGER.info('Terminated')
+
+    def _park(self):
+        # Publishing the discovery or attributes that are still queued
+        # would make the entities available again after this instance
+        # stopped handling them, drop those and let the next instance
+        # publish the discovery of all the entities instead
+        incomplete = self._scheduler.cancel()
+
+        # The app is probably being restarted because of a configuration
+        # change, keep the connection and state for the next instance for
+        # a while, and only tear them down if it does not take them over
+        for observable in self._observables():
+            observable.unregister_all()
+
+        runtime = _QolsysGatewayRuntime(
+            cfg=self._cfg,
+            socket=self._qolsys_socket,
+            tasks=self._socket_tasks,
+            state=self._state,
+            session_token=self._session_token,
+            panel_mac=self._factory.panel_mac,
+            teardown=self._teardown,
+        )
+        runtime.incomplete = incomplete
+
+        # This instance is terminated, so it must not handle the events of
+        # the panel anymore; they are kept for the next instance instead
+        self._qolsys_socket.set_callbacks(
+            callback=runtime.parked_callback('qolsys_event_callback'),
+            connected_callback=runtime.parked_callback(
+                'qolsys_connected_callback'),
+            disconnected_callback=runtime.parked_callback(
+                'qolsys_disconnected_callback'),
+        )
+
+        def expire():
+            if _RUNTIMES.get(self.name) is runtime:
+                del _RUNTIMES[self.name]
+                LOGGER.info('Connection to the panel not taken over, '
+                            'tearing it down')
+                runtime.teardown()
+
+        runtime.handle = asyncio.get_running_loop().call_later(
+            self._cfg.reload_grace_period, expire)
+
+        previous = _RUNTIMES.pop(self.name, None)
+        if previous is not None:
+            previous.handle.cancel()
+            previous.teardown()
+        _RUNTIMES[self.name] = runtime
+
+    def _teardown(self):
+        self._scheduler.cancel()
+
+        for task in self._socket_tasks.values():
+            task.cancel()
+        self._socket_tasks = {}
+
         self._factory.wrap(self._state).set_unavailable()
 
+        # Sensors depend on the availability of their partition, so there
+        # is no need to mark them unavailable one by one
         for partition in self._state.partitions:
-            for sensor in partition.sensors:
-                try:
-                    self._factory.wrap(sensor).set_unavailable()
-                except:  # noqa: E722
-                    LOGGER.exception(f"Error setting sensor '{sensor.id}' "
-                                     f"({sensor.name}) unavailable")
-
             try:
                 self._factory.wrap(partition).set_unavailable()
             except:  # noqa: E722
                 LOGGER.exception(f"Error setting partition '{partition.id}' "
                                  f"({partition.name}) unavailable")
 
-        self._is_terminated = True
-        LOGGER.info('Terminated')
+    def _observables(self):
+        yield self._state
+        for partition in self._state.partitions:
+            yield partition
+            yield from partition.sensors
+
+    def _take_over(self, runtime: _QolsysGatewayRuntime, changed: set):
+        LOGGER.info('Taking over the connection to the panel, configuration '
+                    f"changes: {', '.join(sorted(changed)) or 'none'}")
+
+        self._qolsys_socket = runtime.socket
+        self._socket_tasks = runtime.tasks
+        self._qolsys_socket.ack_timeout = self._cfg.panel_ack_timeout
+
+        # Only publish the discovery of the entities that depend on the
+        # changed configuration keys
+        affected = set()
+        for k in changed:
+            affected.update(self._RELOAD_KEYS.get(k, ('all', )))
+
+        # The previous instance stopped before publishing everything
+        if runtime.incomplete:
+            affected.add('all')
+
+        if 'all' in affected:
+            affected.update(('state', 'partitions', 'sensors', 'metrics'))
+        if 'state' in affected:
+            self._factory.wrap(self._state).configure()
+        if 'metrics' in affected and self._cfg.diagnostics_interval:
+            self._factory.wrap(self._metrics).configure()
+
+        self._updater.register_partitions(
+            self._state,
+            configure_partitions='partitions' in affected,
+            configure_sensors='sensors' in affected,
+        )
+
+        # The events received while reloading are handled before the next
+        # ones, so the socket is only handed over once they are replayed
+        if runtime.pending:
+            self.create_task(self._replay(runtime.pending))
+        else:
+            self._bind_socket()
+
+        # The connection was established by the previous instance, so the
+        # connected callback, which resolves the mac address, does not run
+        if self._factory.panel_mac is None and self._mac_resolver:
+            self.create_task(self._resolve_panel_mac())
+
+    async def _replay(self, pending: list):
+        LOGGER.info(f'Replaying {len(pending)} event(s) received while '
+                    'the app was reloading')
+        while pending:
+            name, args = pending.pop(0)
+            await getattr(self, name)(*args)
+
+        self._bind_socket()
+
+    def _bind_socket(self):
+        self._qolsys_socket.set_callbacks(
+            callback=self.qolsys_event_callback,
+            connected_callback=self.qolsys_connected_callback,
+            disconnected_callback=self.qolsys_disconnected_callback,
+            metrics=self._metrics,
+        )
+
+    @property
+    def journal(self):
+        return self._journal
+
+    @property
+    def metrics(self):
+        return self._metrics
+
+    def _timed_mqtt_publish(self, **kwargs):
+        started_at = time.monotonic()
+        try:
+            result = self.mqtt_publish(**kwargs)
+        finally:
+            self._metrics.observe('publish', time.monotonic() - started_at)
+            self._metrics.increment('publishes')
+
+        # When called from the event loop, AppDaemon returns the task that
+        # will actually publish the message
+        if isinstance(result, asyncio.Future):
+            self._metrics.track_publish(result)
+        return result
+
+    async def _publish_metrics(self):
+        while 'we need to publish the metrics':
+            await asyncio.sleep(self._cfg.metrics_interval)
+            try:
+                await self.mqtt_publish(
+                    namespace=self._cfg.mqtt_namespace,
+                    topic=self._cfg.metrics_topic,
+                    payload=json.dumps(self._metrics.to_dict()),
+                )
+            except:  # noqa: E722
+                LOGGER.exception('Error publishing the metrics')
+
+    async def _publish_diagnostics(self):
+        while 'we need to publish the diagnostics':
+            await asyncio.sleep(self._cfg.diagnostics_interval)
+            try:
+                self._factory.wrap(self._metrics).update_state()
+            except:  # noqa: E722
+                LOGGER.exception('Error publishing the diagnostics')
+
+    def zone_history(self, zone_id: int):
+        if self._histories is None:
+            return None
+        return self._histories.history(zone_id)
 
     async def qolsys_connected_callback(self):
         LOGGER.debug('Qolsys callback for connection event')
+        self._profile('connected')
         self._factory.wrap(self._state).configure()
 
+        if self._cfg.diagnostics_interval:
+            self._factory.wrap(self._metrics).configure()
+
+        if self._factory.panel_mac is None and self._mac_resolver:
+            self.create_task(self._resolve_panel_mac())
+
+    async def _resolve_panel_mac(self):
+        # Only try once, as we would not find it the next time either
+        resolver, self._mac_resolver = self._mac_resolver, None
+
+        try:
+            mac = await resolver.resolve()
+        except:  # noqa: E722
+            LOGGER.exception('Error resolving the mac address of the panel')
+            return
+
+        if not mac:
+            return
+
+        # The mac address is part of the device of all the entities, so
+        # their discovery configuration needs to be published again
+        self._factory.panel_mac = mac
+        self._updater.configure_all(self._state)
+
+        if self._cfg.diagnostics_interval:
+            self._factory.wrap(self._metrics).configure()
+
     async def qolsys_disconnected_callback(self):
         if self._is_terminated:
             return
@@ -197,17 +678,47 @@ class QolsysGateway(Mqtt):
 
     async def qolsys_event_callback(self, event: QolsysEvent):
         LOGGER.debug(f'Qolsys callback for event: {event}')
+        payload = event.raw_str
+
+        # The event goes through the broker before being applied, so keep
+        # its trace until we receive it back
+        trace = current_trace()
+        if trace is not None:
+            self._metrics.track(payload, trace)
+
         await self.mqtt_publish(
             namespace=self._cfg.mqtt_namespace,
             topic=self._cfg.event_topic,
-            payload=event.raw_str,
+            payload=payload,
         )
 
     async def mqtt_event_callback(self, event: QolsysEvent):
         LOGGER.debug(f'MQTT callback for event: {event}')
-
+        self._metrics.increment('events')
+
+        trace = None
+        if self._metrics.pending:
+            trace = self._metrics.resume(event.raw_str)
+            if trace is not None:
+                trace.mark('broker')
+
+        # Apply all the changes of the event at once, so that each entity
+        # is only published once per event
+        with self._state.batch():
+            self._apply_event(event)
+            if trace is not None:
+                trace.mark('mutate')
+
+        if trace is not None:
+            trace.mark('notify')
+            trace.finish()
+
+    def _apply_event(self, event: QolsysEvent):
         if isinstance(event, QolsysEventInfoSummary):
             self._state.update(event)
+            self._update_control_policy()
+            if self._profile('first_summary'):
+                LOGGER.info(f'Startup profile: {self._profiler}')
 
         elif isinstance(event, QolsysEventInfoSecureArm):
             LOGGER.debug(f'INFO SecureArm partition_id={event.partition_id} '
@@ -219,14 +730,15 @@ class QolsysGateway(Mqtt):
                 return
 
             partition.secure_arm = event.value
+            self._update_control_policy()
 
         elif isinstance(event, QolsysEventZoneEventActive):
             LOGGER.debug(f'ACTIVE zone={event.zone}')
 
-            if event.zone.status.lower() == 'open':
-                self._state.zone_open(event.zone.id)
+            if event.zone.status is SENSOR_STATUS.OPEN:
+                self._coalescer.zone_open(event.zone.id)
             else:
-                self._state.zone_closed(event.zone.id)
+                self._coalescer.zone_closed(event.zone.id)
 
         elif isinstance(event, QolsysEventZoneEventUpdate):
             LOGGER.debug(f'UPDATE zone={event.zone}')
@@ -296,18 +808,111 @@ class QolsysGateway(Mqtt):
             LOGGER.error(f'invalid session token for {control}')
             return
 
-        if control.requires_config:
-            control.configure(self._cfg, self._state)
-
         try:
-            control.check()
-        except (MissingUserCodeException, InvalidUserCodeException) as e:
+            await self._send_control(control)
+        except (MissingUserCodeException, InvalidUserCodeException,
+                UnknownQolsysPartitionException) as e:
             LOGGER.error(f'{e} for control event {control}')
-            return
+        except QolsysControlTimeoutException as e:
+            LOGGER.warning(str(e))
+
+    def _update_control_policy(self):
+        # The controls only need the configuration and the secure arm of
+        # the partitions, so we only compute those when they change
+        self._control_policy = QolsysControlPolicy(self._cfg, self._state)
+
+    async def _send_control(self, control: QolsysControl) -> bool:
+        partition = self._state.partition(control.partition_id)
+        if partition is None:
+            raise UnknownQolsysPartitionException(
+                f'Partition {control.partition_id} not found')
+
+        if control.requires_config:
+            control.configure(self._control_policy)
+
+        control.check()
 
         action = control.action
         if action is None:
             LOGGER.info(f'Action missing for control event {control}')
-            return
+            return False
+
+        if isinstance(action, QolsysActionArm) and \
+                PARTITION_STATUS(action.arming_type) is partition.status:
+            LOGGER.info(f'Partition {partition.id} already in status '
+                        f'{partition.status}, skipping {control}')
+            return False
+
+        # Identical actions are collapsed, so that repeated commands only
+        # reach the panel once
+        return await self._dedup.run(
+            key=str(action),
+            send=functools.partial(self._send_action, action, control),
+            label=str(control),
+            group=partition.id,
+        )
 
-        await self._qolsys_socket.send(action)
+    async def _send_action(self, action: QolsysAction,
+                           control: QolsysControl):
+        ack = await self._qolsys_socket.send(action)
+
+        timeout = self._cfg.panel_ack_timeout
+        if timeout:
+            try:
+                await asyncio.wait_for(ack, timeout)
+            except asyncio.TimeoutError:
+                raise QolsysControlTimeoutException(
+                    f'Panel did not acknowledge {control} after '
+                    f'{timeout} second(s)')
+
+    async def _control(self, klass, action: str, partition_id: int,
+                       **params) -> bool:
+        # The controls sent from the same process are trusted, they do not
+        # need a session token, but go through the same checks as the ones
+        # received from MQTT
+        params = {k: v for k, v in params.items() if v is not None}
+        control = klass(
+            partition_id=partition_id,
+            raw={
+                'action': action,
+                'partition_id': partition_id,
+                **params,
+            },
+            **params,
+        )
+        return await self._send_control(control)
+
+    async def arm_away(self, partition_id: int, code: str = None,
+                       delay: int = None, bypass: bool = None) -> bool:
+        """Arm the partition in away mode, and wait for the panel to
+        acknowledge the command. Return whether the command was sent, or
+        skipped as a duplicate or for a status the partition is in."""
+        return await self._control(
+            QolsysControlArmAway, 'ARM_AWAY', partition_id,
+            code=code, delay=delay, bypass=bypass)
+
+    async def arm_stay(self, partition_id: int, code: str = None,
+                       delay: int = None, bypass: bool = None) -> bool:
+        """Arm the partition in stay mode, and wait for the panel to
+        acknowledge the command. Return whether the command was sent, or
+        skipped as a duplicate or for a status the partition is in."""
+        return await self._control(
+            QolsysControlArmHome, 'ARM_HOME', partition_id,
+            code=code, delay=delay, bypass=bypass)
+
+    async def disarm(self, partition_id: int, code: str = None) -> bool:
+        """Disarm the partition, and wait for the panel to acknowledge
+        the command. Return whether the command was sent, or skipped as a
+        duplicate or for a partition already disarmed."""
+        return await self._control(
+            QolsysControlDisarm, 'DISARM', partition_id,
+            code=code)
+
+    async def trigger(self, partition_id: int, alarm_type: str = None,
+                      code: str = None) -> bool:
+        """Trigger the alarm of the partition, and wait for the panel to
+        acknowledge the command. Return whether the command was sent, or
+        skipped as a duplicate."""
+        return await self._control(
+            QolsysControlTrigger, 'TRIGGER', partition_id,
+            alarm_type=alarm_type, code=code)
@@ -5,6 +5,8 @@ from appdaemon.plugins.mqtt.mqttapi import Mqtt
 
 from qolsys.control import QolsysControl
 from qolsys.events import QolsysEvent
+from qolsys.exceptions import InvalidQolsysEventException
+from qolsys.exceptions import InvalidQolsysSensorException
 from qolsys.exceptions import UnknownQolsysControlException
 from qolsys.exceptions import UnknownQolsysEventException
 from qolsys.utils import defaultLoggerCallback
@@ -42,6 +44,10 @@ class MqttQolsysEventListener(MqttListener):
         except UnknownQolsysEventException:
             self._logger.debug(f'Unknown Qolsys event: {data}')
             return
+        except (InvalidQolsysEventException,
+                InvalidQolsysSensorException) as e:
+            self._logger.warning(f'Rejected Qolsys event: {e}')
+            return
 
         try:
             await self._callback(event)
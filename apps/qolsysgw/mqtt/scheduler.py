@@ -0,0 +1,132 @@
+import asyncio
+import logging
+
+
+LOGGER = logging.getLogger(__name__)
+
+
+class MqttPublishScheduler(object):
+    """Schedule the MQTT publishes in lanes of different priorities.
+
+    State and availability messages are published right away. Attributes
+    are rate-limited per topic, only the last value being published at
+    the end of the interval, and are skipped if identical to the last
+    payload published on their topic. Discovery configurations are run in the
+    background, one entity per iteration of the event loop, so that they
+    do not delay the other messages.
+    """
+
+    def __init__(self, mqtt_publish: callable,
+                 attributes_interval: float = 0, metrics=None) -> None:
+        self._mqtt_publish = mqtt_publish
+        self._attributes_interval = attributes_interval
+        self._metrics = metrics
+
+        self._attributes_payloads = {}
+        self._attributes_published_at = {}
+        self._attributes_pending = {}
+        self._attributes_handles = {}
+
+        self._background = {}
+        self._background_handle = None
+
+    def publish(self, **kwargs):
+        return self._mqtt_publish(**kwargs)
+
+    def publish_attributes(self, topic: str, **kwargs):
+        # A publish is already planned for that topic, it will use the
+        # last value we received
+        if topic in self._attributes_pending:
+            self._attributes_pending[topic] = kwargs
+            return
+
+        if self._unchanged_attributes(topic, kwargs):
+            return
+
+        if not self._attributes_interval:
+            return self._publish_attributes(topic, kwargs)
+
+        loop = asyncio.get_running_loop()
+        now = loop.time()
+        published_at = self._attributes_published_at.get(topic)
+        if published_at is None or \
+                now - published_at >= self._attributes_interval:
+            self._attributes_published_at[topic] = now
+            return self._publish_attributes(topic, kwargs)
+
+        self._attributes_pending[topic] = kwargs
+        self._attributes_handles[topic] = loop.call_at(
+            published_at + self._attributes_interval,
+            self._flush_attributes, topic)
+
+    def _flush_attributes(self, topic: str):
+        self._attributes_handles.pop(topic, None)
+        kwargs = self._attributes_pending.pop(topic, None)
+        if kwargs is None:
+            return
+
+        if self._unchanged_attributes(topic, kwargs):
+            return
+
+        self._attributes_published_at[topic] = \
+            asyncio.get_running_loop().time()
+        self._publish_attributes(topic, kwargs)
+
+    def _unchanged_attributes(self, topic: str, kwargs: dict):
+        if self._attributes_payloads.get(topic) != kwargs.get('payload'):
+            return False
+
+        LOGGER.debug(f"Skipping unchanged attributes for '{topic}'")
+        if self._metrics:
+            self._metrics.increment('attributes_skipped')
+        return True
+
+    def _publish_attributes(self, topic: str, kwargs: dict):
+        self._attributes_payloads[topic] = kwargs.get('payload')
+        return self._mqtt_publish(topic=topic, **kwargs)
+
+    def forget_attributes(self, topic: str):
+        """Forget the last payload published on the topic, so that the
+        next attributes are published even if they did not change."""
+        self._attributes_payloads.pop(topic, None)
+
+    def background(self, key: str, callback: callable):
+        """Run the callback in the background; if a callback is already
+        waiting for the same key, it is replaced by this one."""
+        self._background[key] = callback
+
+        if self._background_handle is None:
+            self._background_handle = asyncio.get_running_loop().call_soon(
+                self._run_background)
+
+    def _run_background(self):
+        key = next(iter(self._background))
+        callback = self._background.pop(key)
+
+        try:
+            callback()
+        except:  # noqa: E722
+            LOGGER.exception(f"Error running background task for '{key}'")
+
+        if self._background:
+            self._background_handle = asyncio.get_running_loop().call_soon(
+                self._run_background)
+        else:
+            self._background_handle = None
+
+    def cancel(self):
+        """Drop the attributes waiting to be published and the background
+        callbacks waiting to run, and return whether there were any."""
+        dropped = bool(self._attributes_pending or self._background)
+
+        for handle in self._attributes_handles.values():
+            handle.cancel()
+        self._attributes_handles = {}
+        self._attributes_pending = {}
+
+        if self._background_handle is not None:
+            self._background_handle.cancel()
+            self._background_handle = None
+        self._background = {}
+
+        return dropped
@@ -2,106 +2,183 @@ import json
 import logging
 import posixpath
 
+from datetime import datetime, timezone
+
 from mqtt.exceptions import UnknownDeviceClassException
 from mqtt.exceptions import UnknownMqttWrapperException
+from mqtt.scheduler import MqttPublishScheduler
 from mqtt.utils import normalize_name_to_id
 
+from qolsys.coalescer import QolsysZoneCoalescer
 from qolsys.config import QolsysGatewayConfig
+from qolsys.metrics import QolsysMetrics
+from qolsys.observable import QolsysChangeset
 from qolsys.partition import QolsysPartition
-from qolsys.sensors import QolsysSensor
-from qolsys.sensors import QolsysSensorAuxiliaryPendant
-from qolsys.sensors import QolsysSensorBluetooth
-from qolsys.sensors import QolsysSensorCODetector
-from qolsys.sensors import QolsysSensorDoorWindow
-from qolsys.sensors import QolsysSensorDoorbell
-from qolsys.sensors import QolsysSensorFreeze
-from qolsys.sensors import QolsysSensorGlassBreak
-from qolsys.sensors import QolsysSensorHeat
-from qolsys.sensors import QolsysSensorKeyFob
-from qolsys.sensors import QolsysSensorKeypad
-from qolsys.sensors import QolsysSensorMotion
-from qolsys.sensors import QolsysSensorShock
-from qolsys.sensors import QolsysSensorSiren
-from qolsys.sensors import QolsysSensorSmokeDetector
-from qolsys.sensors import QolsysSensorTakeoverModule
-from qolsys.sensors import QolsysSensorTemperature
-from qolsys.sensors import QolsysSensorTilt
-from qolsys.sensors import QolsysSensorTranslator
-from qolsys.sensors import QolsysSensorWater
-from qolsys.sensors import _QolsysSensorWithoutUpdates
+from qolsys import sensors
 from qolsys.state import QolsysState
 from qolsys.utils import defaultLoggerCallback
+from qolsys.utils import all_subclasses
 from qolsys.utils import find_subclass
+from qolsys.utils import subclasses_index
+from qolsys.vocabulary import SENSOR_STATUS
 
 
 LOGGER = logging.getLogger(__name__)
 
 
 class MqttUpdater(object):
+    STATE_CHANGES = (
+        QolsysState.NOTIFY_UPDATE_PARTITIONS,
+        QolsysState.NOTIFY_UPDATE_ERROR,
+    )
+    PARTITION_CHANGES = (
+        QolsysPartition.NOTIFY_ADD_SENSOR,
+        QolsysPartition.NOTIFY_UPDATE_STATUS,
+        QolsysPartition.NOTIFY_UPDATE_SECURE_ARM,
+        QolsysPartition.NOTIFY_UPDATE_ALARM_TYPE,
+        QolsysPartition.NOTIFY_UPDATE_ATTRIBUTES,
+    )
+    SENSOR_CHANGES = (
+        sensors.QolsysSensor.NOTIFY_UPDATE_STATUS,
+        sensors.QolsysSensor.NOTIFY_UPDATE_ATTRIBUTES,
+    )
+
     def __init__(self, state: QolsysState, factory: 'MqttWrapperFactory',
-                 callback: callable = None, logger=None):
+                 callback: callable = None, logger=None,
+                 scheduler: MqttPublishScheduler = None):
         self._factory = factory
+        self._scheduler = scheduler
         self._callback = callback or defaultLoggerCallback
         self._logger = logger or LOGGER
 
-        state.register(self, callback=self._state_update)
-
-    def _state_update(self, state: QolsysState, change, prev_value=None, new_value=None):
-        self._logger.debug(f"Received update from state for CHANGE={change}")
-
-        if change == QolsysState.NOTIFY_UPDATE_PARTITIONS:
+        state.register(self, callback=self._state_update,
+                       changes=self.STATE_CHANGES)
+
+    def _register_sensor(self, sensor: sensors.QolsysSensor,
+                         partition: QolsysPartition, configure: bool = True):
+        sensor.register(self, callback=self._sensor_update,
+                        changes=self.SENSOR_CHANGES)
+        if configure:
+            self._configure(sensor, partition=partition)
+
+    def _register_partition(self, partition: QolsysPartition,
+                            configure: bool = True,
+                            configure_sensors: bool = True):
+        partition.register(self, callback=self._partition_update,
+                           changes=self.PARTITION_CHANGES)
+        if configure:
+            self._configure(partition)
+
+        # The partition might already have sensors on it, so register
+        # for each sensor individually too
+        for sensor in partition.sensors:
+            self._register_sensor(sensor, partition,
+                                  configure=configure_sensors)
+
+    def register_partitions(self, state: QolsysState,
+                            configure_partitions: bool = True,
+                            configure_sensors: bool = True):
+        """Register for the updates of the partitions and sensors already
+        in the state, only publishing the discovery configuration of those
+        requested."""
+        for partition in state.partitions:
+            self._register_partition(partition,
+                                     configure=configure_partitions,
+                                     configure_sensors=configure_sensors)
+
+    def _configure(self, obj, **kwargs):
+        wrapped = self._factory.wrap(obj)
+
+        # The discovery configuration can wait, it is published in the
+        # background so that it does not delay the state updates; as the
+        # configuration also publishes the state of the entity, it will
+        # be up to date when it is done
+        if self._scheduler:
+            self._scheduler.background(
+                wrapped.config_topic,
+                lambda: wrapped.configure(**kwargs))
+        else:
+            wrapped.configure(**kwargs)
+
+    def configure_all(self, state: QolsysState):
+        """Publish again the discovery configuration of the state and of
+        all its partitions and sensors."""
+        self._configure(state)
+        for partition in state.partitions:
+            self._configure(partition)
+            for sensor in partition.sensors:
+                self._configure(sensor, partition=partition)
+
+    def _state_update(self, state: QolsysState, changeset: QolsysChangeset):
+        self._logger.debug(f"Received update from state for "
+                           f"CHANGES={list(changeset)}")
+
+        if QolsysState.NOTIFY_UPDATE_PARTITIONS in changeset:
             # The partitions have been updated, make sure we are registered for
             # all those partitions
-            for partition in state.partitions:
-                partition.register(self, callback=self._partition_update)
-                self._factory.wrap(partition).configure()
-                # The partition might already have sensors on it, so register
-                # for each sensor individually too
-                for sensor in partition.sensors:
-                    sensor.register(self, callback=self._sensor_update)
-                    self._factory.wrap(sensor).configure(partition=partition)
-        elif change == QolsysState.NOTIFY_UPDATE_ERROR:
+            self.register_partitions(state)
+
+        if QolsysState.NOTIFY_UPDATE_ERROR in changeset:
             # An error has happened on qolsysgw, so we want to update the
             # state sensor
             wrapped_state = self._factory.wrap(state)
             wrapped_state.update_state()
             wrapped_state.update_attributes()
 
-    def _partition_update(self, partition: QolsysPartition, change, prev_value=None, new_value=None):
+    def _partition_update(self, partition: QolsysPartition,
+                          changeset: QolsysChangeset):
         self._logger.debug(f"Received update from partition "
-                           f"'{partition.name}' for CHANGE={change}, from "
-                           f"prev_value={prev_value} to new_value={new_value}")
-
-        if change == QolsysPartition.NOTIFY_ADD_SENSOR:
-            sensor = new_value
-            sensor.register(self, callback=self._sensor_update)
-            self._factory.wrap(sensor).configure(partition=partition)
-        elif change == QolsysPartition.NOTIFY_UPDATE_STATUS:
+                           f"'{partition.name}' for CHANGES={changeset}")
+
+        change = changeset.get(QolsysPartition.NOTIFY_ADD_SENSOR)
+        if change is not None:
+            for sensor in change.new_value:
+                self._register_sensor(sensor, partition)
+
+        # Configuring the partition also updates its state and attributes,
+        # so there is no need to do anything else if the secure arm changed
+        if QolsysPartition.NOTIFY_UPDATE_SECURE_ARM in changeset:
+            self._configure(partition)
+            return
+
+        if QolsysPartition.NOTIFY_UPDATE_STATUS in changeset:
             self._factory.wrap(partition).update_state()
-        elif change == QolsysPartition.NOTIFY_UPDATE_SECURE_ARM:
-            self._factory.wrap(partition).configure()
-        elif change == QolsysPartition.NOTIFY_UPDATE_ALARM_TYPE or \
-                change == QolsysPartition.NOTIFY_UPDATE_ATTRIBUTES:
+
+        if QolsysPartition.NOTIFY_UPDATE_ALARM_TYPE in changeset or \
+                QolsysPartition.NOTIFY_UPDATE_ATTRIBUTES in changeset:
             self._factory.wrap(partition).update_attributes()
 
-    def _sensor_update(self, sensor: QolsysSensor, change, prev_value=None, new_value=None):
+    def _sensor_update(self, sensor: sensors.QolsysSensor,
+                       changeset: QolsysChangeset):
         self._logger.debug(f"Received update from sensor '{sensor.name}' for "
-                           f"CHANGE={change}, from prev_value={prev_value} to "
-                           f"new_value={new_value}")
+                           f"CHANGES={changeset}")
 
-        if change == QolsysSensor.NOTIFY_UPDATE_STATUS:
+        if sensors.QolsysSensor.NOTIFY_UPDATE_STATUS in changeset:
             self._factory.wrap(sensor).update_state()
-        elif change == QolsysSensor.NOTIFY_UPDATE_ATTRIBUTES:
+
+        if sensors.QolsysSensor.NOTIFY_UPDATE_ATTRIBUTES in changeset:
             self._factory.wrap(sensor).update_attributes()
 
 
 class MqttWrapper(object):
 
     def __init__(self, mqtt_publish: callable, cfg: QolsysGatewayConfig,
-                 mqtt_plugin_cfg, session_token: str) -> None:
+                 mqtt_plugin_cfg, session_token: str,
+                 fragments: dict = None,
+                 scheduler: MqttPublishScheduler = None,
+                 panel_mac: str = None) -> None:
         self._mqtt_publish = mqtt_publish
+        self._scheduler = scheduler
         self._cfg = cfg
 
+        # The mac address can be resolved after the configuration is
+        # loaded, in which case it is provided here
+        self._panel_mac = panel_mac or cfg.panel_mac
+
+        # Fragments shared by the discovery payloads of all the entities
+        # of the same configuration
+        self._fragments = fragments if fragments is not None else {}
+
         self._birth_topic = mqtt_plugin_cfg.get('birth_topic')
         self._will_topic = mqtt_plugin_cfg.get('will_topic')
         self._birth_payload = mqtt_plugin_cfg.get('birth_payload')
@@ -149,6 +226,13 @@ class MqttWrapper(object):
                               self._cfg.panel_unique_id,
                               'availability')
 
+    def partition_topic_path(self, partition: QolsysPartition):
+        return posixpath.join(
+            'alarm_control_panel',
+            self._cfg.panel_unique_id,
+            normalize_name_to_id(partition.name),
+        )
+
     @property
     def payload_available(self):
         return 'online'
@@ -170,50 +254,93 @@ class MqttWrapper(object):
 
         # If we have the mac address, this will allow to link the device
         # to other related elements in home assistant
-        if self._cfg.panel_mac:
+        if self._panel_mac:
             payload['connections'] = [
-                ['mac', self._cfg.panel_mac],
+                ['mac', self._panel_mac],
             ]
 
         return payload
 
     @property
-    def configure_availability(self):
-        availability = [
-            {
-                'topic': self.device_availability_topic,
-                'payload_available': self.payload_available,
-                'payload_not_available': self.payload_unavailable,
-            },
-        ]
-
-        if self.availability_topic != self.device_availability_topic:
-            availability.append({
-                'topic': self.availability_topic,
-                'payload_available': self.payload_available,
-                'payload_not_available': self.payload_unavailable,
-            })
+    def device_availability(self):
+        return {
+            'topic': self.device_availability_topic,
+            'payload_available': self.payload_available,
+            'payload_not_available': self.payload_unavailable,
+        }
+
+    @property
+    def entity_availability(self):
+        if self.availability_topic == self.device_availability_topic:
+            return None
+
+        return {
+            'topic': self.availability_topic,
+            'payload_available': self.payload_available,
+            'payload_not_available': self.payload_unavailable,
+        }
 
+    @property
+    def plugin_availability(self):
         # If we the birth and will topic of the MQTT plugin are the same,
         # we can take advantage of this to consider that the panel is offline
         # when AppDaemon is (since updates won't work at this point)
-        if self._will_topic == self._birth_topic:
-            availability.append({
-                'topic': self._will_topic,
-                'payload_available': self._birth_payload,
-                'payload_not_available': self._will_payload,
-            })
+        if self._will_topic != self._birth_topic:
+            return None
 
-        return availability
+        return {
+            'topic': self._will_topic,
+            'payload_available': self._birth_payload,
+            'payload_not_available': self._will_payload,
+        }
+
+    def _fragment(self, name, build: callable):
+        if name not in self._fragments:
+            self._fragments[name] = build()
+        return self._fragments[name]
+
+    def configure_entity_payload(self, **kwargs):
+        return {}
+
+    def configure_payload(self, **kwargs):
+        """Return the discovery payload of the entity, in which only the
+        fields that are specific to the entity are built, the device and
+        the availability entries shared by all entities being built once."""
+        availability = [self._fragment('device_availability',
+                                       lambda: self.device_availability)]
+
+        entity_availability = self.entity_availability
+        if entity_availability is not None:
+            availability.append(entity_availability)
+
+        plugin_availability = self._fragment('plugin_availability',
+                                             lambda: self.plugin_availability)
+        if plugin_availability is not None:
+            availability.append(plugin_availability)
+
+        payload = self.configure_entity_payload(**kwargs)
+        payload['availability'] = availability
+        payload['device'] = self._fragment('device',
+                                           lambda: self.device_payload)
+        return payload
+
+    def configure_json(self, **kwargs):
+        return json.dumps(self.configure_payload(**kwargs))
 
     def configure(self, **kwargs):
         self._mqtt_publish(
             namespace=self._cfg.mqtt_namespace,
             topic=self.config_topic,
             retain=True,
-            payload=json.dumps(self.configure_payload(**kwargs)),
+            payload=self.configure_json(**kwargs),
         )
 
+        # The entity is (re)configured, which might be because Home
+        # Assistant restarted, so we need to publish the attributes even
+        # if they did not change since the last time
+        if self._scheduler:
+            self._scheduler.forget_attributes(self.attributes_topic)
+
         self.set_available()
         self.update_state()
         self.update_attributes()
@@ -224,6 +351,21 @@ class MqttWrapper(object):
     def update_state(self):
         pass
 
+    def publish_attributes(self, payload: str):
+        kwargs = {
+            'namespace': self._cfg.mqtt_namespace,
+            'topic': self.attributes_topic,
+            'retain': self._mqtt_retain,
+            'payload': payload,
+        }
+
+        # Attributes are rate-limited by the scheduler, if any, so that
+        # they do not compete with the state updates
+        if self._scheduler:
+            self._scheduler.publish_attributes(**kwargs)
+        else:
+            self._mqtt_publish(**kwargs)
+
     def set_available(self):
         self._mqtt_publish(
             namespace=self._cfg.mqtt_namespace,
@@ -266,18 +408,16 @@ class MqttWrapperQolsysState(MqttWrapper):
             self.entity_id,
         )
 
-    def configure_payload(self, **kwargs):
+    def configure_entity_payload(self, **kwargs):
         payload = {
             'name': 'Last Error',
             'device_class': 'timestamp',
             'state_topic': self.state_topic,
             'availability_mode': 'all',
-            'availability': self.configure_availability,
             'json_attributes_topic': self.attributes_topic,
         }
 
         payload['unique_id'] = f"{self._cfg.panel_unique_id}_last_error"
-        payload['device'] = self.device_payload
 
         return payload
 
@@ -289,10 +429,7 @@ class MqttWrapperQolsysState(MqttWrapper):
             exc_type = None
             exc_desc = None
 
-        self._mqtt_publish(
-            namespace=self._cfg.mqtt_namespace,
-            topic=self.attributes_topic,
-            retain=self._mqtt_retain,
+        self.publish_attributes(
             payload=json.dumps({
                 'type': exc_type,
                 'desc': exc_desc,
@@ -310,6 +447,90 @@ class MqttWrapperQolsysState(MqttWrapper):
         )
 
 
+class MqttWrapperQolsysMetrics(MqttWrapper):
+
+    # The diagnostic entities, as (key, name, unit, device class); they
+    # all read their value from the same state message
+    DIAGNOSTICS = (
+        ('events_per_second', 'Events Rate', 'events/s', None),
+        ('publish_queue_depth', 'Publish Queue Depth', 'messages', None),
+        ('reconnects', 'Reconnects', None, None),
+        ('last_frame_age', 'Last Frame Age', 's', 'duration'),
+        ('decode_failures', 'Decode Failures', None, None),
+        ('latency_avg', 'Average Latency', 'ms', 'duration'),
+        ('latency_p99', 'P99 Latency', 'ms', 'duration'),
+        ('memory_rss', 'Memory Usage', 'MiB', 'data_size'),
+    )
+
+    def __init__(self, metrics: QolsysMetrics, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+
+        self._metrics = metrics
+
+    @property
+    def name(self):
+        return self._cfg.panel_unique_id
+
+    @property
+    def entity_id(self):
+        return f'{self.name}_diagnostics'
+
+    @property
+    def availability_topic(self):
+        return self.device_availability_topic
+
+    @property
+    def topic_path(self):
+        return posixpath.join(
+            'sensor',
+            self.entity_id,
+        )
+
+    def diagnostic_config_topic(self, key: str):
+        return posixpath.join(self._cfg.discovery_topic, 'sensor',
+                              f'{self.name}_{key}', 'config')
+
+    def configure_entity_payload(self, key: str, name: str, unit: str,
+                                 device_class: str, **kwargs):
+        payload = {
+            'name': name,
+            'state_topic': self.state_topic,
+            'value_template': f'{{{{ value_json.{key} }}}}',
+            'state_class': 'measurement',
+            'entity_category': 'diagnostic',
+            'availability_mode': 'all',
+        }
+
+        if unit:
+            payload['unit_of_measurement'] = unit
+        if device_class:
+            payload['device_class'] = device_class
+
+        payload['unique_id'] = f'{self._cfg.panel_unique_id}_{key}'
+
+        return payload
+
+    def configure(self, **kwargs):
+        for key, name, unit, device_class in self.DIAGNOSTICS:
+            self._mqtt_publish(
+                namespace=self._cfg.mqtt_namespace,
+                topic=self.diagnostic_config_topic(key),
+                retain=True,
+                payload=self.configure_json(key=key, name=name, unit=unit,
+                                            device_class=device_class),
+            )
+
+        self.update_state()
+
+    def update_state(self):
+        self._mqtt_publish(
+            namespace=self._cfg.mqtt_namespace,
+            topic=self.state_topic,
+            retain=self._mqtt_retain,
+            payload=json.dumps(self._metrics.diagnostics()),
+        )
+
+
 class MqttWrapperQolsysPartition(MqttWrapper):
 
     QOLSYS_TO_HA_STATUS = {
@@ -346,13 +567,9 @@ class MqttWrapperQolsysPartition(MqttWrapper):
 
     @property
     def topic_path(self):
-        return posixpath.join(
-            'alarm_control_panel',
-            self._cfg.panel_unique_id,
-            self.entity_id,
-        )
+        return self.partition_topic_path(self._partition)
 
-    def configure_payload(self, **kwargs):
+    def configure_entity_payload(self, **kwargs):
         command_template = {
             'partition_id': str(self._partition.id),
             'action': '{{ action }}',
@@ -378,7 +595,6 @@ class MqttWrapperQolsysPartition(MqttWrapper):
             'command_topic': self._cfg.control_topic,
             'command_template': json.dumps(command_template),
             'availability_mode': 'all',
-            'availability': self.configure_availability,
             'json_attributes_topic': self.attributes_topic,
         }
 
@@ -387,7 +603,6 @@ class MqttWrapperQolsysPartition(MqttWrapper):
         # together; this will also allow to interact with the partition in
         # the UI, change it's name, assign it to areas, etc.
         payload['unique_id'] = f"{self._cfg.panel_unique_id}_p{self._partition.id}"
-        payload['device'] = self.device_payload
 
         if self._cfg.default_trigger_command:
             payload['payload_trigger'] = self._cfg.default_trigger_command
@@ -404,10 +619,7 @@ class MqttWrapperQolsysPartition(MqttWrapper):
         return payload
 
     def update_attributes(self):
-        self._mqtt_publish(
-            namespace=self._cfg.mqtt_namespace,
-            topic=self.attributes_topic,
-            retain=self._mqtt_retain,
+        self.publish_attributes(
             payload=json.dumps({
                 'secure_arm': self._partition.secure_arm,
                 'alarm_type': self._partition.alarm_type,
@@ -433,28 +645,32 @@ class MqttWrapperQolsysSensor(MqttWrapper):
     PAYLOAD_OFF = 'Closed'
 
     QOLSYS_TO_HA_DEVICE_CLASS = {
-        QolsysSensorAuxiliaryPendant: 'safety',
-        QolsysSensorBluetooth: 'presence',
-        QolsysSensorCODetector: 'gas',
-        QolsysSensorDoorWindow: 'door',
-        QolsysSensorDoorbell: 'sound',
-        QolsysSensorFreeze: 'cold',
-        QolsysSensorGlassBreak: 'vibration',
-        QolsysSensorHeat: 'heat',
-        QolsysSensorKeyFob: 'safety',
-        QolsysSensorKeypad: 'safety',
-        QolsysSensorMotion: 'motion',
-        QolsysSensorShock: 'vibration',
-        QolsysSensorSiren: 'safety',
-        QolsysSensorSmokeDetector: 'smoke',
-        QolsysSensorTakeoverModule: 'safety',
-        QolsysSensorTemperature: 'heat',
-        QolsysSensorTilt: 'garage_door',
-        QolsysSensorTranslator: 'safety',
-        QolsysSensorWater: 'moisture',
+        sensors.QolsysSensorAuxiliaryPendant: 'safety',
+        sensors.QolsysSensorBluetooth: 'presence',
+        sensors.QolsysSensorCODetector: 'gas',
+        sensors.QolsysSensorDoorWindow: 'door',
+        sensors.QolsysSensorDoorbell: 'sound',
+        sensors.QolsysSensorFreeze: 'cold',
+        sensors.QolsysSensorGlassBreak: 'vibration',
+        sensors.QolsysSensorHeat: 'heat',
+        sensors.QolsysSensorKeyFob: 'safety',
+        sensors.QolsysSensorKeypad: 'safety',
+        sensors.QolsysSensorMotion: 'motion',
+        sensors.QolsysSensorShock: 'vibration',
+        sensors.QolsysSensorSiren: 'safety',
+        sensors.QolsysSensorSmokeDetector: 'smoke',
+        sensors.QolsysSensorTakeoverModule: 'safety',
+        sensors.QolsysSensorTemperature: 'heat',
+        sensors.QolsysSensorTilt: 'garage_door',
+        sensors.QolsysSensorTranslator: 'safety',
+        sensors.QolsysSensorWater: 'moisture',
     }
 
-    def __init__(self, sensor: QolsysSensor, *args, **kwargs):
+    # Device classes resolved from QOLSYS_TO_HA_DEVICE_CLASS for each sensor
+    # class, None if the sensor class is not mapped
+    __DEVICECLASSES_CACHE = {}
+
+    def __init__(self, sensor: sensors.QolsysSensor, *args, **kwargs):
         super().__init__(*args, **kwargs)
 
         self._sensor = sensor
@@ -463,22 +679,48 @@ class MqttWrapperQolsysSensor(MqttWrapper):
     def name(self):
         return self._sensor.name
 
+    @classmethod
+    def _resolve_device_class(cls, sensor_class):
+        try:
+            return cls.__DEVICECLASSES_CACHE[sensor_class]
+        except KeyError:
+            pass
+
+        device_class = None
+        for base in sensor_class.mro():
+            device_class = cls.QOLSYS_TO_HA_DEVICE_CLASS.get(base)
+            if device_class:
+                break
+
+        cls.__DEVICECLASSES_CACHE[sensor_class] = device_class
+        if device_class is None:
+            LOGGER.warning('Unable to find a device class to map for '
+                           f"sensor type {sensor_class.__name__}")
+
+        return device_class
+
     @property
     def ha_device_class(self):
-        for base in type(self._sensor).mro():
-            device_class = self.QOLSYS_TO_HA_DEVICE_CLASS.get(base)
+        overrides = self._cfg.sensor_device_class
+        if overrides:
+            device_class = (
+                overrides.get(self._sensor.zone_id) or
+                overrides.get(self._sensor.group) or
+                overrides.get(self._sensor.type)
+            )
             if device_class:
                 return device_class
 
-        errormsg = 'Unable to find a device class to map for '\
-                   f"sensor type {type(self._sensor).__name__}"
+        device_class = self._resolve_device_class(type(self._sensor))
+        if device_class:
+            return device_class
+
         if self._cfg.default_sensor_device_class:
-            LOGGER.warning(f"{errormsg}, defaulting to "
-                           f"'{self._cfg.default_sensor_device_class}' "
-                           "device class.")
             return self._cfg.default_sensor_device_class
         else:
-            raise UnknownDeviceClassException(errormsg)
+            raise UnknownDeviceClassException(
+                'Unable to find a device class to map for '
+                f"sensor type {type(self._sensor).__name__}")
 
     @property
     def topic_path(self):
@@ -487,7 +729,24 @@ class MqttWrapperQolsysSensor(MqttWrapper):
             self.entity_id,
         )
 
-    def configure_payload(self, partition: QolsysPartition, **kwargs):
+    @property
+    def availability_topic(self):
+        # Sensors are available when their partition is, so that changing
+        # the availability of the whole panel only requires one message
+        # per partition, whatever the number of sensors
+        if self._sensor.partition is None:
+            return self.device_availability_topic
+        return posixpath.join(self._cfg.discovery_topic,
+                              self.partition_topic_path(self._sensor.partition),
+                              'availability')
+
+    def set_available(self):
+        pass
+
+    def set_unavailable(self):
+        pass
+
+    def configure_entity_payload(self, partition: QolsysPartition, **kwargs):
         payload = {
             'name': self.name,
             'device_class': self.ha_device_class,
@@ -495,11 +754,10 @@ class MqttWrapperQolsysSensor(MqttWrapper):
             'payload_on': self.PAYLOAD_ON,
             'payload_off': self.PAYLOAD_OFF,
             'availability_mode': 'all',
-            'availability': self.configure_availability,
             'json_attributes_topic': self.attributes_topic,
             'enabled_by_default': (
                 self._cfg.enable_static_sensors_by_default or
-                not isinstance(self._sensor, _QolsysSensorWithoutUpdates)
+                not isinstance(self._sensor, sensors._QolsysSensorWithoutUpdates)
             ),
         }
 
@@ -509,7 +767,6 @@ class MqttWrapperQolsysSensor(MqttWrapper):
         # the UI, change it's name, assign it to areas, etc.
         payload['unique_id'] = f"{self._cfg.panel_unique_id}_"\
                                f"s{normalize_name_to_id(self._sensor.unique_id)}"
-        payload['device'] = self.device_payload
 
         return payload
 
@@ -519,10 +776,24 @@ class MqttWrapperQolsysSensor(MqttWrapper):
             for k in self._sensor.ATTRIBUTES
         }
 
-        self._mqtt_publish(
-            namespace=self._cfg.mqtt_namespace,
-            topic=self.attributes_topic,
-            retain=self._mqtt_retain,
+        # The flaps are only relevant if transitions of that sensor are
+        # being coalesced
+        if QolsysZoneCoalescer.window_for(self._cfg.coalesce_window,
+                                          self._sensor):
+            attributes['flaps'] = self._sensor.flaps
+
+        history = self._sensor.history
+        if self._cfg.zone_history_attributes and history is not None:
+            last_open = history.last_status_at(SENSOR_STATUS.OPEN)
+            attributes.update({
+                'open_duration_1h': round(history.open_duration(3600)),
+                'flaps_1h': history.flaps(3600),
+                'last_open_at': last_open and datetime.fromtimestamp(
+                    history.to_timestamp(last_open),
+                    timezone.utc).isoformat(),
+            })
+
+        self.publish_attributes(
             payload=json.dumps(attributes),
         )
 
@@ -543,17 +814,48 @@ class MqttWrapperFactory(object):
         self._args = args
         self._kwargs = kwargs
 
-    def wrap(self, obj):
+        # The discovery fragments only depend on the configuration, so they
+        # are shared by all the wrappers created by this factory
+        self._kwargs.setdefault('fragments', {})
+
+    @property
+    def panel_mac(self):
+        return self._kwargs.get('panel_mac')
+
+    @panel_mac.setter
+    def panel_mac(self, value: str):
+        self._kwargs['panel_mac'] = value
+
+        # The device fragment includes the mac address, so the fragments
+        # need to be built again
+        self._kwargs['fragments'] = {}
+
+    @classmethod
+    def warm_up(cls):
+        """Resolve the wrappers of the known object types in advance, so
+        that the first objects wrapped do not have to search for them."""
+        subclasses_index(MqttWrapper, refresh=True)
+
+        for obj_class in (QolsysState, QolsysPartition, QolsysMetrics,
+                          *all_subclasses(sensors.QolsysSensor)):
+            cls._wrapper_class(obj_class)
+
+    @classmethod
+    def _wrapper_class(cls, obj_class):
         # Search the class that corresponds to that type, and use all the
         # parents (in order, thanks to the call to mro()) to try and find
         # one that works by inheritance
-        for base in type(obj).mro():
+        for base in obj_class.mro():
             klass = find_subclass(MqttWrapper, base.__name__,
-                                  cache=self.__WRAPPERCLASSES_CACHE,
+                                  cache=cls.__WRAPPERCLASSES_CACHE,
                                   normalize=False)
             if klass:
-                break
+                return klass
 
+        return None
+
+    def wrap(self, obj):
+        klass = self._wrapper_class(type(obj))
         if not klass:
             raise UnknownMqttWrapperException(
                 f'Unable to wrap object type {type(obj).__name__}'
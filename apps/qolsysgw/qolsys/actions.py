@@ -61,6 +61,10 @@ class QolsysActionArm(QolsysAction):
         if panel_code:
             self._data['usercode'] = str(panel_code)
 
+    @property
+    def arming_type(self) -> str:
+        return self._data['arming_type']
+
 
 class QolsysActionArmWithDelayAndBypass(QolsysActionArm):
     def __init__(self, delay: int = None, bypass: bool = None,
@@ -0,0 +1,120 @@
+import asyncio
+import logging
+
+from qolsys.sensors import QolsysSensor
+from qolsys.state import QolsysState
+from qolsys.vocabulary import PARTITION_STATUS
+from qolsys.vocabulary import SENSOR_STATUS
+
+
+LOGGER = logging.getLogger(__name__)
+
+
+class _QolsysZoneWindow(object):
+    def __init__(self, status: str, handle) -> None:
+        self.status = status
+        self.handle = handle
+        self.flaps = 0
+
+
+class QolsysZoneCoalescer(object):
+    """Collapse rapid open/closed transitions of a zone.
+
+    The first transition of a zone is always applied immediately, and
+    opens a coalescing window for that zone if one is configured for its
+    group or sensor type. The transitions received during the window are
+    collapsed into the final status, applied when the window closes, and
+    counted in the flaps attribute of the sensor.
+
+    A repeated status (which is what the tamper detection relies on) always
+    flushes the window and goes through to the sensor, and zones of a
+    partition that is not disarmed are never delayed.
+    """
+
+    def __init__(self, state: QolsysState, windows: dict = None) -> None:
+        self._state = state
+        self._windows = windows or {}
+        self._pending = {}
+
+    @staticmethod
+    def window_for(windows: dict, sensor: QolsysSensor):
+        if not windows:
+            return None
+        return windows.get(sensor.group) or windows.get(sensor.type)
+
+    def zone_open(self, zone_id):
+        self._zone_active(zone_id, SENSOR_STATUS.OPEN)
+
+    def zone_closed(self, zone_id):
+        self._zone_active(zone_id, SENSOR_STATUS.CLOSED)
+
+    def cancel(self):
+        for window in self._pending.values():
+            window.handle.cancel()
+        self._pending = {}
+
+    def flush(self):
+        """Apply the final status of all the zones in a window right away,
+        instead of waiting for their windows to close."""
+        with self._state.batch():
+            for zone_id in list(self._pending):
+                self._flush(zone_id)
+
+    def _is_alarm_relevant(self, zone):
+        partition = zone.partition
+        return (zone.tampered or partition is None or
+                partition.status is not PARTITION_STATUS.DISARM)
+
+    def _zone_active(self, zone_id, status):
+        zone = self._state.zone(zone_id)
+        if zone is None:
+            return
+
+        window = self._pending.get(zone_id)
+        if window is not None:
+            if status is not window.status and \
+                    not self._is_alarm_relevant(zone):
+                window.status = status
+                window.flaps += 1
+                return
+
+            # Repeated status or alarm-relevant zone, we need to get the
+            # sensor in its current state before applying this transition
+            self._flush(zone_id)
+        else:
+            delay = self.window_for(self._windows, zone)
+            if delay and status is not zone.status and \
+                    not self._is_alarm_relevant(zone):
+                loop = asyncio.get_running_loop()
+                self._pending[zone_id] = _QolsysZoneWindow(
+                    status=status,
+                    handle=loop.call_later(delay, self._flush, zone_id),
+                )
+
+        self._apply(zone, status)
+
+    def _flush(self, zone_id):
+        window = self._pending.pop(zone_id, None)
+        if window is None:
+            return
+
+        window.handle.cancel()
+
+        zone = self._state.zone(zone_id)
+        if zone is None:
+            return
+
+        with self._state.batch():
+            if window.flaps:
+                LOGGER.debug(f"Zone '{zone_id}' coalesced {window.flaps} "
+                             f"transition(s) into '{window.status}'")
+                zone.flaps += window.flaps
+
+            if window.status is not zone.status:
+                self._apply(zone, window.status)
+
+    def _apply(self, zone, status):
+        if status is SENSOR_STATUS.OPEN:
+            zone.open()
+        else:
+            zone.closed()
@@ -1,8 +1,10 @@
 import logging
 
+from collections.abc import Mapping
+from types import MappingProxyType
+
 from qolsys.exceptions import QolsysGwConfigIncomplete
 from qolsys.exceptions import QolsysGwConfigError
-from qolsys.utils import get_mac_from_host
 
 
 LOGGER = logging.getLogger(__name__)
@@ -15,10 +17,13 @@ class QolsysGatewayConfig(object):
         'panel_host': _SENTINEL,
         'panel_port': None,
         'panel_mac': None,
+        'panel_mac_cache_path': None,
         'panel_token': _SENTINEL,
         'panel_user_code': None,
         'panel_unique_id': 'qolsys_panel',
         'panel_device_name': 'Qolsys Panel',
+        'panel_ack_timeout': 10,
+        'reload_grace_period': 0,
         'arm_away_exit_delay': None,
         'arm_stay_exit_delay': None,
         'arm_away_bypass': None,
@@ -27,10 +32,18 @@ class QolsysGatewayConfig(object):
 
         'mqtt_namespace': 'mqtt',
         'mqtt_retain': True,
+        'mqtt_attributes_interval': 0,
         'discovery_topic': 'homeassistant',
         'control_topic': '{discovery_topic}/alarm_control_panel/{panel_unique_id}/set',
         'event_topic': 'qolsys/{panel_unique_id}/event',
+        'metrics_topic': 'qolsys/{panel_unique_id}/metrics',
+        'metrics_interval': 0,
+        'metrics_port': None,
+        'metrics_host': '127.0.0.1',
+        'diagnostics_interval': 0,
+        'startup_profile': False,
         'user_control_token': None,
+        'control_dedup_window': 2,
 
         'ha_check_user_code': True,
         'ha_user_code': None,
@@ -40,9 +53,18 @@ class QolsysGatewayConfig(object):
         'default_trigger_command': None,
         'default_sensor_device_class': 'safety',
         'enable_static_sensors_by_default': False,
+        'sensor_device_class': None,
+        'coalesce_window': None,
+        'state_snapshot_path': None,
+        'journal_path': None,
+        'journal_retention': 30,
+        'zone_history_size': 0,
+        'zone_history_attributes': False,
     }
 
     def __init__(self, args=None, check=True):
+        self._frozen = False
+        self._canonical = None
         self._override_config = {}
 
         if args:
@@ -52,11 +74,17 @@ class QolsysGatewayConfig(object):
             self.check()
 
     def load(self, args):
+        if self._frozen:
+            raise AttributeError('Cannot load a checked configuration')
+
         for k, v in args.items():
             if v is not None and k in self._DEFAULT_CONFIG:
                 self._override_config[k] = v
 
     def check(self):
+        if self._frozen:
+            return
+
         errors = 0
         for k in self._DEFAULT_CONFIG.keys():
             if self.get(k) is self._SENTINEL:
@@ -114,26 +142,181 @@ class QolsysGatewayConfig(object):
                 f"one of {', '.join(valid_arm_type)}")
         self._override_config['arm_type_custom_bypass'] = arm_type
 
-        if self.get('panel_mac') is None:
-            mac = get_mac_from_host(self.get('panel_host'))
-            if mac:
-                self._override_config['panel_mac'] = mac
-
         # Apply a template to the control and event topics if the unique id
         # is part of the requested topics
-        for k in ('control_topic', 'event_topic'):
+        for k in ('control_topic', 'event_topic', 'metrics_topic'):
             v = self.get(k)
             if v:
                 self._override_config[k] = v.format(
                     panel_unique_id=self.get('panel_unique_id'),
                     discovery_topic=self.get('discovery_topic'))
 
+        sensor_device_class = self.get('sensor_device_class')
+        if sensor_device_class is not None:
+            if not isinstance(sensor_device_class, dict):
+                raise QolsysGwConfigError(
+                    "Invalid value for 'sensor_device_class'; must be a "
+                    "mapping of zone ids, sensor groups or sensor types to "
+                    "a device class")
+
+            # Zone ids are stored as integers so they can be matched
+            # directly against the sensors, and do not collide with the
+            # groups and types
+            overrides = {}
+            for k, v in sensor_device_class.items():
+                if not v or not isinstance(v, str):
+                    raise QolsysGwConfigError(
+                        f"Invalid device class '{v}' for '{k}'; must be "
+                        "a string")
+                if isinstance(k, int) or str(k).isdigit():
+                    k = int(k)
+                else:
+                    k = str(k)
+                overrides[k] = v
+            self._override_config['sensor_device_class'] = overrides
+
+        coalesce_window = self.get('coalesce_window')
+        if coalesce_window is not None:
+            if not isinstance(coalesce_window, dict):
+                raise QolsysGwConfigError(
+                    "Invalid value for 'coalesce_window'; must be a mapping "
+                    "of sensor groups or types to a number of seconds")
+
+            windows = {}
+            for k, v in coalesce_window.items():
+                try:
+                    v = float(v)
+                except (TypeError, ValueError):
+                    v = -1
+                if v < 0:
+                    raise QolsysGwConfigError(
+                        f"Invalid coalescing window '{coalesce_window[k]}' "
+                        f"for '{k}'; must be a non-negative number of "
+                        "seconds, 0 disabling the coalescing")
+                if v > 0:
+                    windows[str(k)] = v
+            self._override_config['coalesce_window'] = windows
+
+        for k in ('metrics_interval', 'diagnostics_interval',
+                  'mqtt_attributes_interval', 'panel_ack_timeout',
+                  'control_dedup_window', 'reload_grace_period'):
+            interval = self.get(k)
+            try:
+                interval = float(interval)
+            except (TypeError, ValueError):
+                interval = -1
+            if interval < 0:
+                raise QolsysGwConfigError(
+                    f"Invalid value '{self.get(k)}' for '{k}'; must be a "
+                    "non-negative number of seconds, 0 disabling it")
+            self._override_config[k] = interval
+
+        metrics_port = self.get('metrics_port')
+        if metrics_port is not None:
+            try:
+                metrics_port = int(metrics_port)
+            except (TypeError, ValueError):
+                metrics_port = -1
+            if not 0 < metrics_port < 65536:
+                raise QolsysGwConfigError(
+                    f"Invalid metrics port '{self.get('metrics_port')}'")
+            self._override_config['metrics_port'] = metrics_port
+
+        journal_retention = self.get('journal_retention')
+        try:
+            journal_retention = float(journal_retention)
+        except (TypeError, ValueError):
+            journal_retention = -1
+        if journal_retention <= 0:
+            raise QolsysGwConfigError(
+                f"Invalid journal retention '{self.get('journal_retention')}'"
+                "; must be a positive number of days")
+        self._override_config['journal_retention'] = journal_retention
+
+        zone_history_size = self.get('zone_history_size')
+        try:
+            zone_history_size = int(zone_history_size)
+        except (TypeError, ValueError):
+            zone_history_size = -1
+        if zone_history_size < 0:
+            raise QolsysGwConfigError(
+                f"Invalid zone history size '{self.get('zone_history_size')}'"
+                "; must be a non-negative number of transitions, 0 "
+                "disabling the history")
+        self._override_config['zone_history_size'] = zone_history_size
+
         # Make sure that user codes are stored as strings
         for k in ('panel_user_code', 'ha_user_code'):
             v = self.get(k)
             if v and not isinstance(v, str):
                 self._override_config[k] = str(v)
 
+        self._freeze()
+
+    def _freeze(self):
+        # Once checked, the mappings of the configuration are replaced by
+        # read-only copies, so that the configuration cannot be changed
+        # through them either
+        object.__setattr__(self, '_override_config',
+                           self._frozen_value(self._override_config))
+
+        # The values are also stored as plain attributes of the object, so
+        # that reading them does not go through __getattr__
+        for k in self._DEFAULT_CONFIG:
+            object.__setattr__(self, k, self.get(k))
+
+        object.__setattr__(self, '_canonical', self._canonical_repr())
+        object.__setattr__(self, '_frozen', True)
+
+    @classmethod
+    def _frozen_value(cls, value):
+        if isinstance(value, Mapping):
+            return MappingProxyType({
+                k: cls._frozen_value(v) for k, v in value.items()
+            })
+        return value
+
+    @classmethod
+    def _canonical_value(cls, value):
+        if isinstance(value, Mapping):
+            return repr(sorted(
+                ((cls._canonical_value(k), cls._canonical_value(v))
+                 for k, v in value.items()),
+                key=repr))
+        return repr(value)
+
+    def _canonical_repr(self):
+        return ';'.join(
+            f'{k}={self._canonical_value(self.get(k))}'
+            for k in sorted(self._DEFAULT_CONFIG)
+        )
+
+    def changed_keys(self, other: 'QolsysGatewayConfig'):
+        """Return the set of keys whose value differs between this and the
+        other configuration."""
+        return {
+            k for k in self._DEFAULT_CONFIG
+            if self._canonical_value(self.get(k)) !=
+            self._canonical_value(other.get(k))
+        }
+
+    def __setattr__(self, name, value):
+        if self.__dict__.get('_frozen'):
+            raise AttributeError(f'Cannot set `{name}` on a checked '
+                                 'configuration')
+        super().__setattr__(name, value)
+
+    def __eq__(self, other):
+        if not isinstance(other, QolsysGatewayConfig):
+            return NotImplemented
+        return (self._canonical or self._canonical_repr()) == \
+            (other._canonical or other._canonical_repr())
+
+    def __hash__(self):
+        if not self._frozen:
+            raise TypeError('Cannot hash a configuration before checking it')
+        return hash(self._canonical)
+
     def get(self, name):
         value = self._override_config.get(name, self._SENTINEL)
         if value is self._SENTINEL:
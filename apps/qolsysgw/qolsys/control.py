@@ -1,3 +1,4 @@
+import hmac
 import json
 import logging
 
@@ -9,11 +10,58 @@ from qolsys.exceptions import UnknownQolsysControlException
 from qolsys.exceptions import MissingUserCodeException
 from qolsys.exceptions import InvalidUserCodeException
 from qolsys.utils import find_subclass
+from qolsys.utils import subtype_names
+from qolsys.utils import warm_subclass_cache
 
 
 LOGGER = logging.getLogger(__name__)
 
 
+class QolsysControlPolicy(object):
+    """Values of the configuration and state needed to validate the
+    control commands, computed once so that validating a command only
+    reads attributes of this object.
+
+    The policy is immutable, a new one needs to be built when the
+    configuration is loaded or the secure arm of a partition changes.
+    """
+
+    __slots__ = (
+        'panel_user_code',
+        'valid_code',
+        'ha_check_user_code',
+        'code_arm_required',
+        'code_disarm_required',
+        'code_trigger_required',
+        'arm_away_exit_delay',
+        'arm_stay_exit_delay',
+        'arm_away_bypass',
+        'arm_stay_bypass',
+        'arm_type_custom_bypass',
+        'secure_arm_partitions',
+    )
+
+    def __init__(self, cfg, state=None) -> None:
+        values = {
+            k: cfg.get(k) for k in self.__slots__
+            if k not in ('valid_code', 'secure_arm_partitions')
+        }
+        values['valid_code'] = cfg.ha_user_code or cfg.panel_user_code
+        values['secure_arm_partitions'] = frozenset(
+            partition.id for partition in (state.partitions if state else [])
+            if partition.secure_arm
+        )
+
+        for k, v in values.items():
+            object.__setattr__(self, k, v)
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f'{type(self).__name__} is immutable')
+
+    def __delattr__(self, name):
+        raise AttributeError(f'{type(self).__name__} is immutable')
+
+
 class QolsysControl(object):
 
     __SUBCLASSES_CACHE = {}
@@ -21,6 +69,11 @@ class QolsysControl(object):
     def __init__(self, raw: dict, partition_id: int, code: str = None,
                  session_token: str = None):
         self._raw = raw
+
+        # Home Assistant sends the partition id as a string, while the
+        # panel and the state identify the partitions by integer
+        if isinstance(partition_id, str) and partition_id.isdigit():
+            partition_id = int(partition_id)
         self._partition_id = partition_id
         self._session_token = session_token
 
@@ -54,7 +107,7 @@ class QolsysControl(object):
     def requires_config(self):
         return self._requires_config
 
-    def configure(self, cfg, state):
+    def configure(self, policy: QolsysControlPolicy):
         pass
 
     def check(self):
@@ -69,6 +122,15 @@ class QolsysControl(object):
                 f"code={'<redacted>' if self._code else self._code} "
                 f"session_token={self.session_token}>")
 
+    @classmethod
+    def warm_up(cls):
+        """Resolve the classes of the known actions in advance, so that the
+        first control commands received do not have to search for them."""
+        warm_subclass_cache(
+            QolsysControl, QolsysControl.__SUBCLASSES_CACHE,
+            subtypes=subtype_names(QolsysControl),
+        )
+
     @classmethod
     def from_json(cls, data):
         if isinstance(data, str):
@@ -111,19 +173,20 @@ class _QolsysControlCheckCode(QolsysControl):
         self._requires_config = True
         self._panel_code = None
 
-    def configure(self, cfg, state):
+    def configure(self, policy: QolsysControlPolicy):
         self._secure_arm = hasattr(self, '_partition_id') and \
-            state.partition(self._partition_id).secure_arm
+            self._partition_id in policy.secure_arm_partitions
 
         if self._PANEL_CODE_REQUIRED == 'secure_arm':
             self._PANEL_CODE_REQUIRED = self._secure_arm
 
-        self._panel_code = cfg.panel_user_code
+        self._panel_code = policy.panel_user_code
 
-        code_required_from_ha = getattr(cfg, self._CODE_REQUIRED_ATTR)
-        self._check_code = code_required_from_ha and not cfg.ha_check_user_code
+        code_required_from_ha = getattr(policy, self._CODE_REQUIRED_ATTR)
+        self._check_code = code_required_from_ha and \
+            not policy.ha_check_user_code
         if self._check_code:
-            self._valid_code = cfg.ha_user_code or cfg.panel_user_code
+            self._valid_code = policy.valid_code
 
     def check(self):
         super().check()
@@ -134,7 +197,8 @@ class _QolsysControlCheckCode(QolsysControl):
             # the disarm process; in which case, we don't want to raise
             # an exception, as we want to try and use that provided code
             # to disarm the alarm
-            if self._valid_code and self._code != self._valid_code:
+            if self._valid_code and not hmac.compare_digest(
+                    (self._code or '').encode(), self._valid_code.encode()):
                 raise InvalidUserCodeException(
                     'Code received in the control command invalid')
 
@@ -182,14 +246,14 @@ class QolsysControlArm(_QolsysControlCheckCode):
                                  delay is None or
                                  bypass is None)
 
-    def configure(self, cfg, state):
-        super().configure(cfg, state)
+    def configure(self, policy: QolsysControlPolicy):
+        super().configure(policy)
 
         if self._delay is None:
-            self._delay = getattr(cfg, f'{self._ATTR_PREFIX}_exit_delay')
+            self._delay = getattr(policy, f'{self._ATTR_PREFIX}_exit_delay')
 
         if self._bypass is None:
-            self._bypass = getattr(cfg, f'{self._ATTR_PREFIX}_bypass')
+            self._bypass = getattr(policy, f'{self._ATTR_PREFIX}_bypass')
 
     @property
     def action(self):
@@ -231,11 +295,11 @@ class QolsysControlArmCustomBypass(QolsysControlArm):
 
         self._require_config = True
 
-    def configure(self, cfg, state):
-        self._ATTR_PREFIX = cfg.arm_type_custom_bypass.lower()
+    def configure(self, policy: QolsysControlPolicy):
+        self._ATTR_PREFIX = policy.arm_type_custom_bypass
         self._ACTION_CLASS = self._ACTION_CLASSES[self._ATTR_PREFIX]
 
-        super().configure(cfg, state)
+        super().configure(policy)
 
 
 # This depends on https://github.com/home-assistant/core/pull/60525, which
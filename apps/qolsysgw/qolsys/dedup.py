@@ -0,0 +1,64 @@
+import asyncio
+import functools
+import logging
+
+
+LOGGER = logging.getLogger(__name__)
+
+
+class QolsysControlDeduplicator(object):
+    """Collapse identical control commands sent in a short time.
+
+    Commands are identified by a key, which is expected to represent the
+    partition, action and parameters of the command, and belong to a group,
+    the partition they control. A command sent while an identical one is
+    still in flight waits for that one and shares its outcome, and a command
+    sent less than ``window`` seconds after an identical one succeeded is
+    skipped, unless a different command of the same group was sent in the
+    meantime. Failed commands are forgotten right away, so they can be
+    retried.
+    """
+
+    def __init__(self, window: float = 0) -> None:
+        self._window = window
+        self._inflight = {}
+        self._recent = {}
+
+    async def run(self, key: str, send: callable, label: str = None,
+                  group=None) -> bool:
+        """Send the command unless it is a duplicate, and return whether
+        it was sent, by this call or by the identical one in flight."""
+        # The key might contain secrets, such as the user code, so we
+        # only log the label of the command
+        label = label or 'command'
+
+        inflight = self._inflight.get(key)
+        if inflight is not None:
+            LOGGER.info(f'Collapsing {label} with the one in flight')
+            await asyncio.shield(inflight)
+            return True
+
+        now = asyncio.get_running_loop().time()
+        recent = self._recent.pop(group, None)
+        if recent is not None and recent[0] == key and \
+                now - recent[1] < self._window:
+            self._recent[group] = recent
+            LOGGER.info(f'Skipping {label}, already sent less than '
+                        f'{self._window} second(s) ago')
+            return False
+
+        task = asyncio.ensure_future(send())
+        self._inflight[key] = task
+        task.add_done_callback(functools.partial(self._done, key, group))
+
+        # The callers waiting for the command might be cancelled, but the
+        # command itself is still shared with the other callers
+        await asyncio.shield(task)
+        return True
+
+    def _done(self, key: str, group, task: asyncio.Future):
+        del self._inflight[key]
+
+        if self._window and not task.cancelled() and \
+                task.exception() is None:
+            self._recent[group] = (key, asyncio.get_running_loop().time())
@@ -1,14 +1,29 @@
 import json
 import logging
 
+from collections import Counter
 from types import SimpleNamespace
 
+from qolsys.exceptions import InvalidQolsysEventException
+from qolsys.exceptions import InvalidQolsysSensorException
 from qolsys.exceptions import UnableToParseEventException
 from qolsys.exceptions import UnknownQolsysEventException
 from qolsys.exceptions import UnknownQolsysSensorException
 from qolsys.partition import QolsysPartition
+from qolsys.schema import QolsysField
+from qolsys.schema import compile_schema
+from qolsys.schema import to_bool
+from qolsys.schema import to_int
+from qolsys.schema import to_list
+from qolsys.schema import to_str
 from qolsys.utils import find_subclass
+from qolsys.utils import subtype_names
+from qolsys.utils import warm_subclass_cache
 from qolsys.sensors import QolsysSensor
+from qolsys.vocabulary import ALARM_TYPE
+from qolsys.vocabulary import ARMING_TYPE
+from qolsys.vocabulary import PARTITION_STATUS
+from qolsys.vocabulary import SENSOR_STATUS
 
 LOGGER = logging.getLogger(__name__)
 
@@ -17,10 +32,44 @@ class QolsysEvent(object):
 
     __SUBCLASSES_CACHE = {}
 
+    # Number of frames that have been rejected at decode time because they
+    # did not match the schema of their event type, per event type
+    REJECTED = Counter()
+
+    # Fields common to all events, and that will be prepended to the
+    # fields defined in _FIELDS by the subclasses
+    _COMMON_FIELDS = (
+        QolsysField('request_id', key='requestID', coerce=to_str,
+                    required=False),
+    )
+
     def __init__(self, request_id: str, raw_event: dict) -> None:
         self._request_id = request_id
         self._raw_event = raw_event
 
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+
+        # Compile the schema of the event once, when the class is defined,
+        # so that decoding an event is a single pass over its fields
+        fields = cls.__dict__.get('_FIELDS')
+        if fields is not None:
+            cls._decode = staticmethod(compile_schema(
+                QolsysEvent._COMMON_FIELDS + tuple(fields),
+                exception=InvalidQolsysEventException,
+            ))
+
+    @classmethod
+    def warm_up(cls):
+        """Resolve the classes of the known event types in advance, so that
+        the first events received do not have to search for them."""
+        warm_subclass_cache(
+            QolsysEvent, QolsysEvent.__SUBCLASSES_CACHE,
+            subtypes=subtype_names(QolsysEvent, QolsysEvent.__subclasses__()),
+        )
+        QolsysEventInfo.warm_up()
+        QolsysEventZoneEvent.warm_up()
+
     @property
     def request_id(self):
         return self._request_id
@@ -38,25 +87,45 @@ class QolsysEvent(object):
         if isinstance(data, str):
             data = json.loads(data)
 
-        event_type = data.get('event')
+        event_type = data.get('event') if isinstance(data, dict) else None
         if not event_type:
             raise UnknownQolsysEventException(
                 f'Event type not found for event {data}'
             )
 
+        if not isinstance(event_type, str):
+            QolsysEvent.REJECTED[str(event_type)] += 1
+            raise InvalidQolsysEventException(
+                f'Invalid event type {event_type!r} for event {data}')
+
         klass = find_subclass(cls, event_type, cache=cls.__SUBCLASSES_CACHE)
         if not klass:
             raise UnknownQolsysEventException(
                 f"Event type '{event_type}' unsupported for event {data}"
             )
 
-        return klass.from_json(data)
+        try:
+            return klass.from_json(data)
+        except (InvalidQolsysEventException, InvalidQolsysSensorException):
+            QolsysEvent.REJECTED[event_type] += 1
+            raise
+
+    @classmethod
+    def _from_fields(cls, data):
+        return cls(raw_event=data, **cls._decode(data))
 
 
 class QolsysEventInfo(QolsysEvent):
 
     __INFOCLASSES_CACHE = {}
 
+    @classmethod
+    def warm_up(cls):
+        warm_subclass_cache(
+            QolsysEventInfo, QolsysEventInfo.__INFOCLASSES_CACHE,
+            subtypes=subtype_names(QolsysEventInfo),
+        )
+
     @classmethod
     def from_json(cls, data):
         event_type = data.get('event')
@@ -64,6 +133,10 @@ class QolsysEventInfo(QolsysEvent):
             raise UnableToParseEventException(f"Cannot parse event '{event_type}'")
 
         info_type = data.get('info_type')
+        if not isinstance(info_type, str):
+            raise InvalidQolsysEventException(
+                f'Invalid INFO subtype {info_type!r} for event {data}')
+
         klass = find_subclass(cls, info_type, cache=cls.__INFOCLASSES_CACHE)
         if not klass:
             raise UnknownQolsysEventException(
@@ -76,6 +149,19 @@ class QolsysEventInfo(QolsysEvent):
 
 class QolsysEventInfoSummary(QolsysEventInfo):
 
+    _FIELDS = (
+        QolsysField('partitions', key='partition_list', coerce=to_list),
+    )
+
+    _PARTITION_SCHEMA = staticmethod(compile_schema([
+        QolsysField('partition_id', coerce=to_int),
+        QolsysField('name', coerce=to_str),
+        QolsysField('status', coerce=PARTITION_STATUS),
+        QolsysField('secure_arm', coerce=to_bool, required=False,
+                    default=False),
+        QolsysField('zone_list', coerce=to_list),
+    ], exception=InvalidQolsysEventException))
+
     def __init__(self, partitions: list = None, *args, **kwargs) -> None:
         super().__init__(*args, **kwargs)
 
@@ -104,31 +190,28 @@ class QolsysEventInfoSummary(QolsysEventInfo):
             raise UnableToParseEventException(
                 f"Cannot parse event with info type '{info_type}'")
 
-        return QolsysEventInfoSummary(
-            partitions=cls._parse_partitions(data),
-            request_id=data.get('requestID'),
-            raw_event=data,
-        )
+        values = cls._decode(data)
+        values['partitions'] = cls._parse_partitions(values['partitions'])
+
+        return QolsysEventInfoSummary(raw_event=data, **values)
 
     @classmethod
-    def _parse_partitions(cls, data):
+    def _parse_partitions(cls, partition_list):
         partitions = []
 
-        partition_list = data['partition_list']
         for partition_info in partition_list:
-            partition = QolsysPartition(
-                partition_id=partition_info.get('partition_id'),
-                name=partition_info.get('name'),
-                status=partition_info.get('status'),
-                secure_arm=partition_info.get('secure_arm'),
-            )
+            values = cls._PARTITION_SCHEMA(partition_info)
+            zone_list = values.pop('zone_list')
+
+            partition = QolsysPartition(**values)
 
-            zone_list = partition_info['zone_list']
             for sensor_info in zone_list:
                 try:
                     partition.add_sensor(QolsysSensor.from_json(sensor_info, partition))
                 except UnknownQolsysSensorException:
                     LOGGER.warning(f"sensor of unknown type: {sensor_info}")
+                except InvalidQolsysSensorException as e:
+                    LOGGER.warning(f"invalid sensor: {e}")
 
             partitions.append(partition)
 
@@ -137,6 +220,12 @@ class QolsysEventInfoSummary(QolsysEventInfo):
 
 class QolsysEventInfoSecureArm(QolsysEventInfo):
 
+    _FIELDS = (
+        QolsysField('partition_id', coerce=to_int),
+        QolsysField('value', coerce=to_bool),
+        QolsysField('version', coerce=to_int, required=False),
+    )
+
     def __init__(self, partition_id: int, value: bool, version: int,
                  *args, **kwargs) -> None:
         super().__init__(*args, **kwargs)
@@ -167,19 +256,20 @@ class QolsysEventInfoSecureArm(QolsysEventInfo):
             raise UnableToParseEventException(
                 f"Cannot parse event with info type '{info_type}'")
 
-        return QolsysEventInfoSecureArm(
-            partition_id=data.get('partition_id'),
-            value=data.get('value'),
-            version=data.get('version'),
-            request_id=data.get('requestID'),
-            raw_event=data,
-        )
+        return cls._from_fields(data)
 
 
 class QolsysEventZoneEvent(QolsysEvent):
 
     __ZONEEVENTCLASSES_CACHE = {}
 
+    @classmethod
+    def warm_up(cls):
+        warm_subclass_cache(
+            QolsysEventZoneEvent, QolsysEventZoneEvent.__ZONEEVENTCLASSES_CACHE,
+            subtypes=subtype_names(QolsysEventZoneEvent),
+        )
+
     def __init__(self, version: int, *args, **kwargs) -> None:
         super().__init__(*args, **kwargs)
 
@@ -201,6 +291,11 @@ class QolsysEventZoneEvent(QolsysEvent):
             raise UnableToParseEventException(f"Cannot parse event '{event_type}'")
 
         zone_event_type = data.get('zone_event_type')
+        if not isinstance(zone_event_type, str):
+            raise InvalidQolsysEventException(
+                f'Invalid ZONE_EVENT subtype {zone_event_type!r} '
+                f'for event {data}')
+
         if zone_event_type.startswith('ZONE_'):
             zone_event_type = zone_event_type[5:]
         klass = find_subclass(cls, zone_event_type, cache=cls.__ZONEEVENTCLASSES_CACHE)
@@ -215,6 +310,13 @@ class QolsysEventZoneEvent(QolsysEvent):
 
 class QolsysEventZoneEventActive(QolsysEventZoneEvent):
 
+    _FIELDS = (
+        QolsysField('version', coerce=to_int, required=False),
+        QolsysField('zone_id', key=('zone', 'zone_id'), coerce=to_int),
+        QolsysField('zone_status', key=('zone', 'status'),
+                    coerce=SENSOR_STATUS.strict),
+    )
+
     def __init__(self, zone_id: int, zone_status: str, *args, **kwargs) -> None:
         super().__init__(*args, **kwargs)
 
@@ -235,17 +337,15 @@ class QolsysEventZoneEventActive(QolsysEventZoneEvent):
             raise UnableToParseEventException(
                 f"Cannot parse zone event '{zone_event_type}'")
 
-        return QolsysEventZoneEventActive(
-            request_id=data.get('requestID'),
-            version=data.get('version'),
-            zone_id=data.get('zone', {}).get('zone_id'),
-            zone_status=data.get('zone', {}).get('status'),
-            raw_event=data,
-        )
+        return cls._from_fields(data)
 
 
 class _QolsysEventZoneEventFullZone(QolsysEventZoneEvent):
 
+    _FIELDS = (
+        QolsysField('version', coerce=to_int, required=False),
+    )
+
     def __init__(self, zone: QolsysSensor, *args, **kwargs) -> None:
         if self.__class__ == _QolsysEventZoneEventFullZone:
             raise RuntimeError('Should not instantiate this class directly')
@@ -265,20 +365,17 @@ class _QolsysEventZoneEventFullZone(QolsysEventZoneEvent):
             raise UnableToParseEventException(
                 f"Cannot parse zone event '{zone_event_type}'")
 
+        values = cls._decode(data)
+
         zone = data.get('zone')
         try:
             sensor = QolsysSensor.from_json(zone, None)
-
-            return cls(
-                request_id=data.get('requestID'),
-                version=data.get('version'),
-                zone=sensor,
-                raw_event=data,
-            )
         except UnknownQolsysSensorException:
             LOGGER.warning(f"sensor of unknown type: {zone}")
             raise
 
+        return cls(zone=sensor, raw_event=data, **values)
+
 
 class QolsysEventZoneEventUpdate(_QolsysEventZoneEventFullZone):
     _ZONE_EVENT_TYPE = 'ZONE_UPDATE'
@@ -290,6 +387,13 @@ class QolsysEventZoneEventAdd(_QolsysEventZoneEventFullZone):
 
 class QolsysEventArming(QolsysEvent):
 
+    _FIELDS = (
+        QolsysField('version', coerce=to_int, required=False),
+        QolsysField('partition_id', coerce=to_int),
+        QolsysField('arming_type', coerce=ARMING_TYPE),
+        QolsysField('delay', coerce=to_int, required=False),
+    )
+
     def __init__(self, partition_id: int, arming_type: str, version: int,
                  delay: int = None, *args, **kwargs) -> None:
         super().__init__(*args, **kwargs)
@@ -324,18 +428,17 @@ class QolsysEventArming(QolsysEvent):
         if event_type != 'ARMING':
             raise UnableToParseEventException(f"Cannot parse event '{event_type}'")
 
-        return QolsysEventArming(
-            request_id=data.get('requestID'),
-            version=data.get('version'),
-            partition_id=data.get('partition_id'),
-            arming_type=data.get('arming_type'),
-            delay=data.get('delay'),
-            raw_event=data,
-        )
+        return cls._from_fields(data)
 
 
 class QolsysEventAlarm(QolsysEvent):
 
+    _FIELDS = (
+        QolsysField('version', coerce=to_int, required=False),
+        QolsysField('partition_id', coerce=to_int),
+        QolsysField('alarm_type', coerce=ALARM_TYPE, required=False),
+    )
+
     def __init__(self, partition_id: int, alarm_type: str, version: int,
                  *args, **kwargs) -> None:
         super().__init__(*args, **kwargs)
@@ -368,17 +471,18 @@ class QolsysEventAlarm(QolsysEvent):
         if event_type != 'ALARM':
             raise UnableToParseEventException(f"Cannot parse event '{event_type}'")
 
-        return QolsysEventAlarm(
-            request_id=data.get('requestID'),
-            version=data.get('version'),
-            partition_id=data.get('partition_id'),
-            alarm_type=data.get('alarm_type'),
-            raw_event=data,
-        )
+        return cls._from_fields(data)
 
 
 class QolsysEventError(QolsysEvent):
 
+    _FIELDS = (
+        QolsysField('version', coerce=to_int, required=False),
+        QolsysField('partition_id', coerce=to_int),
+        QolsysField('error_type', coerce=to_str),
+        QolsysField('description', coerce=to_str, required=False),
+    )
+
     def __init__(self, partition_id: int, error_type: str, description: str,
                  version: int, *args, **kwargs) -> None:
         super().__init__(*args, **kwargs)
@@ -413,11 +517,4 @@ class QolsysEventError(QolsysEvent):
         if event_type != 'ERROR':
             raise UnableToParseEventException(f"Cannot parse event '{event_type}'")
 
-        return QolsysEventError(
-            request_id=data.get('requestID'),
-            version=data.get('version'),
-            partition_id=data.get('partition_id'),
-            error_type=data.get('error_type'),
-            description=data.get('description'),
-            raw_event=data,
-        )
+        return cls._from_fields(data)
@@ -33,10 +33,26 @@ class UnableToParseSensorException(QolsysException):
     pass
 
 
+class InvalidQolsysEventException(UnableToParseEventException):
+    pass
+
+
+class InvalidQolsysSensorException(UnableToParseSensorException):
+    pass
+
+
 class UnknownQolsysControlException(QolsysException):
     pass
 
 
+class UnknownQolsysPartitionException(QolsysException):
+    pass
+
+
+class QolsysControlTimeoutException(QolsysException):
+    pass
+
+
 class UnknownQolsysEventException(QolsysException):
     pass
 
@@ -0,0 +1,202 @@
+import logging
+import time
+
+from array import array
+from bisect import bisect_right
+
+from qolsys.observable import QolsysChangeset
+from qolsys.partition import QolsysPartition
+from qolsys.sensors import QolsysSensor
+from qolsys.state import QolsysState
+from qolsys.vocabulary import SENSOR_STATUS
+
+
+LOGGER = logging.getLogger(__name__)
+
+
+class QolsysZoneHistory(object):
+    """Ring buffer of the last status transitions of a zone.
+
+    The timestamps and statuses are stored in two fixed-size arrays, so
+    the memory used by a zone does not depend on the uptime; the oldest
+    transitions are overwritten once the buffer is full. The timestamps
+    come from the monotonic clock, so that they stay ordered when the
+    system clock changes; ``to_timestamp`` converts them for display.
+    """
+
+    def __init__(self, size: int, status: str = None) -> None:
+        self._size = size
+        self._times = array('d', bytes(8 * size))
+        self._opens = array('b', bytes(size))
+        self._next = 0
+        self._count = 0
+
+        # Whether the zone was open before the oldest transition we know
+        self._initial = int(status is SENSOR_STATUS.OPEN)
+
+    def __len__(self):
+        return self._count
+
+    @staticmethod
+    def to_timestamp(monotonic: float):
+        """Convert a time of the history to a timestamp of the system
+        clock."""
+        return time.time() - (time.monotonic() - monotonic)
+
+    def append(self, monotonic: float, status: str):
+        if self._count == self._size:
+            # The status of the transition we overwrite is the status the
+            # zone had before the oldest transition we keep
+            self._initial = self._opens[self._next]
+        else:
+            self._count += 1
+
+        self._times[self._next] = monotonic
+        self._opens[self._next] = int(SENSOR_STATUS(status) is
+                                      SENSOR_STATUS.OPEN)
+        self._next = (self._next + 1) % self._size
+
+    def last(self, n: int = None):
+        """Return the last n transitions as (time, status) tuples, from the
+        oldest to the most recent."""
+        first = 0 if n is None else max(self._count - n, 0)
+        transitions = []
+        for i in range(first, self._count):
+            i = self._index(i)
+            transitions.append((
+                self._times[i],
+                SENSOR_STATUS.OPEN if self._opens[i] else SENSOR_STATUS.CLOSED,
+            ))
+        return transitions
+
+    def last_status_at(self, status: str):
+        """Return the time of the most recent transition to the status, or
+        None if there is none in the history."""
+        is_open = int(SENSOR_STATUS(status) is SENSOR_STATUS.OPEN)
+        for i in range(self._count - 1, -1, -1):
+            i = self._index(i)
+            if self._opens[i] == is_open:
+                return self._times[i]
+        return None
+
+    def flaps(self, window: float, now: float = None):
+        """Return the number of transitions during the last window
+        seconds."""
+        now = time.monotonic() if now is None else now
+        return self._bisect(now) - self._bisect(now - window)
+
+    def flaps_per_hour(self, window: float = 3600, now: float = None):
+        return self.flaps(window, now) * 3600 / window
+
+    def open_duration(self, window: float, now: float = None):
+        """Return the number of seconds the zone was open during the last
+        window seconds."""
+        now = time.monotonic() if now is None else now
+        start = now - window
+
+        first = self._bisect(start)
+        end = self._bisect(now)
+
+        is_open = self._opens[self._index(first - 1)] if first \
+            else self._initial
+        since = start
+        duration = 0.
+        for i in range(first, end):
+            i = self._index(i)
+            if is_open:
+                duration += self._times[i] - since
+            since = self._times[i]
+            is_open = self._opens[i]
+
+        if is_open:
+            duration += now - since
+        return duration
+
+    def _index(self, i: int):
+        # Position in the arrays of the i-th oldest transition
+        if self._count < self._size:
+            return i
+        return (self._next + i) % self._size
+
+    def _bisect(self, t: float):
+        # Number of transitions at or before t; once the buffer is full,
+        # the arrays hold two sorted runs, the oldest transitions from the
+        # next position to the end, and the most recent ones before it
+        if self._count < self._size:
+            return bisect_right(self._times, t, 0, self._count)
+        return (bisect_right(self._times, t, self._next, self._size) -
+                self._next + bisect_right(self._times, t, 0, self._next))
+
+
+class QolsysZoneHistories(object):
+    """Keep the history of the status transitions of each zone of the
+    state, available through the ``history`` property of the sensors."""
+
+    def __init__(self, state: QolsysState, size: int,
+                 attributes: bool = False) -> None:
+        self._state = state
+        self._size = size
+        self._attributes = attributes
+        self._histories = {}
+
+        state.register(self, callback=self._state_update,
+                       changes=[QolsysState.NOTIFY_UPDATE_PARTITIONS])
+        self._track_all()
+
+    def history(self, zone_id: int):
+        return self._histories.get(zone_id)
+
+    def _track_all(self):
+        zone_ids = set()
+        for partition in self._state.partitions:
+            partition.register(self, callback=self._partition_update,
+                               changes=[QolsysPartition.NOTIFY_ADD_SENSOR,
+                                        QolsysPartition.NOTIFY_REMOVE_SENSOR])
+            for sensor in partition.sensors:
+                self._track(sensor)
+                zone_ids.add(sensor.zone_id)
+
+        # Forget about the zones that do not exist anymore
+        for zone_id in set(self._histories) - zone_ids:
+            del self._histories[zone_id]
+
+    def _track(self, sensor: QolsysSensor):
+        history = self._histories.get(sensor.zone_id)
+        if history is None:
+            history = QolsysZoneHistory(self._size, status=sensor.status)
+            self._histories[sensor.zone_id] = history
+
+        sensor.history = history
+
+        # Registered first, so that the transition is recorded before the
+        # other observers handle the status change
+        sensor.register(self, callback=self._sensor_update,
+                        changes=[QolsysSensor.NOTIFY_UPDATE_STATUS],
+                        first=True)
+
+    def _state_update(self, state: QolsysState, changeset: QolsysChangeset):
+        self._track_all()
+
+    def _partition_update(self, partition: QolsysPartition,
+                          changeset: QolsysChangeset):
+        # Removals are handled first, as a zone might have been removed
+        # and added again with a different sensor
+        change = changeset.get(QolsysPartition.NOTIFY_REMOVE_SENSOR)
+        if change is not None:
+            for sensor in change.prev_value:
+                self._histories.pop(sensor.zone_id, None)
+
+        change = changeset.get(QolsysPartition.NOTIFY_ADD_SENSOR)
+        if change is not None:
+            for sensor in change.new_value:
+                self._track(sensor)
+
+    def _sensor_update(self, sensor: QolsysSensor,
+                       changeset: QolsysChangeset):
+        sensor.history.append(time.monotonic(), sensor.status)
+
+        # The attributes computed from the history change with the status,
+        # they are published with it by adding them to the same changeset
+        if self._attributes and \
+                QolsysSensor.NOTIFY_UPDATE_ATTRIBUTES not in changeset:
+            changeset.add(QolsysSensor.NOTIFY_UPDATE_ATTRIBUTES)
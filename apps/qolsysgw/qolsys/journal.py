@@ -0,0 +1,333 @@
+import asyncio
+import itertools
+import json
+import logging
+import os
+import time
+
+from qolsys.exceptions import QolsysException
+from qolsys.observable import QolsysChangeset
+from qolsys.partition import QolsysPartition
+from qolsys.sensors import QolsysSensor
+from qolsys.snapshot import summary_from_snapshot
+from qolsys.state import QolsysState
+
+
+LOGGER = logging.getLogger(__name__)
+
+
+class QolsysJournal(object):
+    """Append-only journal of the changes applied to the state.
+
+    Each change is written as a JSON line by a background writer, and
+    the journal is compacted by dropping the records older than the
+    retention period every few thousand records, or every hour on a quiet
+    system. Compacting also appends a snapshot of the state, so that the
+    state can be rebuilt from the last snapshot and the records that
+    follow it.
+    """
+
+    RECORD_SNAPSHOT = 'snapshot'
+    RECORD_ZONE = 'zone'
+    RECORD_TAMPERED = 'tampered'
+    RECORD_PARTITION = 'partition'
+    RECORD_ERROR = 'error'
+
+    _COMPACT_EVERY = 5000
+    _COMPACT_INTERVAL = 3600
+
+    _PARTITION_CHANGES = (
+        QolsysPartition.NOTIFY_ADD_SENSOR,
+        QolsysPartition.NOTIFY_REMOVE_SENSOR,
+        QolsysPartition.NOTIFY_UPDATE_STATUS,
+        QolsysPartition.NOTIFY_UPDATE_ALARM_TYPE,
+        QolsysPartition.NOTIFY_UPDATE_ERROR,
+    )
+    _SENSOR_CHANGES = (
+        QolsysSensor.NOTIFY_UPDATE_STATUS,
+        QolsysSensor.NOTIFY_UPDATE_PATTERN.format(attr='tampered'),
+    )
+
+    def __init__(self, state: QolsysState, path: str,
+                 retention: float = 30) -> None:
+        self._state = state
+        self._path = path
+        self._retention = retention * 86400
+
+        self._queue = []
+        self._wakeup = asyncio.Event()
+        # Only one write at a time runs in the executor, so that the lines
+        # are written in order and never to a file being compacted
+        self._writing = asyncio.Lock()
+        self._closed = False
+        self._written = 0
+        self._compacted_at = time.monotonic()
+        self._last_status = {}
+
+        state.register(self, callback=self._state_update,
+                       changes=[QolsysState.NOTIFY_UPDATE_PARTITIONS])
+        for partition in state.partitions:
+            self._register_partition(partition)
+
+    async def restore(self):
+        """Load the journal and rebuild the state from its last snapshot
+        and the records that follow it. Returns whether the state was
+        restored. The journal is read in the executor, so that it does not
+        block the event loop."""
+        records = await asyncio.get_running_loop().run_in_executor(
+            None, lambda: list(self._read()))
+        self._written = len(records)
+
+        snapshot_at = None
+        for i, record in enumerate(records):
+            if record['k'] == self.RECORD_ZONE:
+                self._last_status[(record['zone_id'], record['status'])] = \
+                    record['t']
+            elif record['k'] == self.RECORD_SNAPSHOT:
+                snapshot_at = i
+
+        if snapshot_at is None:
+            return False
+
+        try:
+            event = summary_from_snapshot(
+                records[snapshot_at].get('partition_list'))
+        except QolsysException as e:
+            LOGGER.warning(f"Invalid snapshot in journal '{self._path}': {e}")
+            return False
+
+        partitions = {p.id: p for p in event.partitions}
+        for record in records[snapshot_at + 1:]:
+            try:
+                self._replay(partitions, record)
+            except (AttributeError, KeyError, TypeError, ValueError) as e:
+                LOGGER.warning(f"Skipping invalid journal record {record}: "
+                               f"{e}")
+
+        LOGGER.info(f"Restoring state from journal '{self._path}'")
+        self._state.update(event)
+        self._state.restore_snapshot(records[snapshot_at])
+        return True
+
+    async def records(self, kind: str = None, since: float = None,
+                      **match):
+        """Return the records of the journal, optionally filtered by kind,
+        time (as a timestamp), and values of the record. The journal is
+        read in the executor, so that it does not block the event loop."""
+        pending = list(self._queue)
+        return await asyncio.get_running_loop().run_in_executor(
+            None, self._filter, kind, since, match, pending)
+
+    async def count(self, kind: str, since: float = None, **match):
+        return len(await self.records(kind, since, **match))
+
+    def _filter(self, kind, since, match, pending):
+        records = []
+        for record in itertools.chain(self._read(), pending):
+            if kind is not None and record['k'] != kind:
+                continue
+            if since is not None and record['t'] < since:
+                continue
+            if any(record.get(k) != v for k, v in match.items()):
+                continue
+            records.append(record)
+        return records
+
+    def last_status_at(self, zone_id: int, status: str):
+        """Return the timestamp at which the zone last took the status, or
+        None if it is not in the journal."""
+        return self._last_status.get((zone_id, status))
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+
+        while not self._closed:
+            # Wake up at least once per compaction interval, so that the
+            # records past the retention period are dropped even if
+            # nothing is written
+            timeout = self._compacted_at + self._COMPACT_INTERVAL - \
+                time.monotonic()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), max(timeout, 0))
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+
+            async with self._writing:
+                if self._closed:
+                    break
+
+                # The records and the snapshot are taken at the same point
+                # in time, so that the snapshot follows all the written
+                # records
+                lines = self._drain()
+                snapshot = None
+                if self._written + len(lines) >= self._COMPACT_EVERY or \
+                        time.monotonic() - self._compacted_at >= \
+                        self._COMPACT_INTERVAL:
+                    snapshot = self._dumps(self._snapshot_record())
+                    self._compacted_at = time.monotonic()
+
+                await loop.run_in_executor(None, self._write, lines, snapshot)
+
+    async def close(self):
+        """Stop the background writer, once the write in progress, if any,
+        and the pending records are written."""
+        self._closed = True
+        self._wakeup.set()
+
+        async with self._writing:
+            await asyncio.get_running_loop().run_in_executor(
+                None, self._write, self._drain())
+
+    def _append(self, kind: str, **values):
+        record = {'t': round(time.time(), 3), 'k': kind}
+        record.update(values)
+
+        if kind == self.RECORD_ZONE:
+            self._last_status[(values['zone_id'], values['status'])] = \
+                record['t']
+
+        self._queue.append(record)
+        self._wakeup.set()
+
+    def _append_snapshot(self):
+        self._queue.append(self._snapshot_record())
+        self._wakeup.set()
+
+    def _drain(self):
+        lines = [self._dumps(r) for r in self._queue]
+        self._queue = []
+        return lines
+
+    def _snapshot_record(self):
+        record = {'t': round(time.time(), 3), 'k': self.RECORD_SNAPSHOT}
+        record.update(self._state.to_snapshot())
+        return record
+
+    @staticmethod
+    def _dumps(record):
+        return json.dumps(record, separators=(',', ':'))
+
+    def _write(self, lines, snapshot=None):
+        try:
+            if lines:
+                with open(self._path, 'a') as f:
+                    f.write('\n'.join(lines) + '\n')
+                self._written += len(lines)
+
+            if snapshot is not None:
+                self._compact(snapshot)
+        except OSError as e:
+            LOGGER.warning(f"Unable to write journal '{self._path}': {e}")
+
+    def _compact(self, snapshot):
+        # Keep the records within the retention period, without the
+        # previous snapshots, and end with the current snapshot
+        since = time.time() - self._retention
+        tmp_path = f'{self._path}.tmp'
+        with open(tmp_path, 'w') as f:
+            for record in self._read():
+                if record['t'] >= since and \
+                        record['k'] != self.RECORD_SNAPSHOT:
+                    f.write(self._dumps(record) + '\n')
+            f.write(snapshot + '\n')
+        os.replace(tmp_path, self._path)
+
+        self._written = 0
+        LOGGER.debug(f"Journal '{self._path}' compacted")
+
+    def _read(self):
+        try:
+            with open(self._path) as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        # The last line might be incomplete after a crash
+                        continue
+                    if isinstance(record, dict) and 't' in record and \
+                            'k' in record:
+                        yield record
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            LOGGER.warning(f"Unable to read journal '{self._path}': {e}")
+
+    def _replay(self, partitions, record):
+        kind = record['k']
+        if kind in (self.RECORD_ZONE, self.RECORD_TAMPERED):
+            for partition in partitions.values():
+                zone = partition.zone(record['zone_id'])
+                if zone is None:
+                    continue
+                if kind == self.RECORD_ZONE:
+                    zone.status = record['status']
+                else:
+                    zone.tampered = record['value']
+            return
+
+        partition = partitions.get(record.get('partition_id'))
+        if partition is None:
+            return
+
+        if kind == self.RECORD_PARTITION:
+            partition.status = record['status']
+            partition.alarm_type = record.get('alarm_type')
+        elif kind == self.RECORD_ERROR:
+            partition.errored(error_type=record['error_type'],
+                              error_description=record['description'],
+                              error_at=record.get('error_at'))
+
+    def _register_partition(self, partition: QolsysPartition):
+        partition.register(self, callback=self._partition_update,
+                           changes=self._PARTITION_CHANGES)
+        for sensor in partition.sensors:
+            sensor.register(self, callback=self._sensor_update,
+                            changes=self._SENSOR_CHANGES)
+
+    def _state_update(self, state: QolsysState, changeset: QolsysChangeset):
+        for partition in state.partitions:
+            self._register_partition(partition)
+
+        # The partitions changed, so we need a new starting point
+        self._append_snapshot()
+
+    def _partition_update(self, partition: QolsysPartition,
+                          changeset: QolsysChangeset):
+        change = changeset.get(QolsysPartition.NOTIFY_ADD_SENSOR)
+        if change is not None:
+            for sensor in change.new_value:
+                sensor.register(self, callback=self._sensor_update,
+                                changes=self._SENSOR_CHANGES)
+
+        if QolsysPartition.NOTIFY_ADD_SENSOR in changeset or \
+                QolsysPartition.NOTIFY_REMOVE_SENSOR in changeset:
+            self._append_snapshot()
+
+        if QolsysPartition.NOTIFY_UPDATE_STATUS in changeset or \
+                QolsysPartition.NOTIFY_UPDATE_ALARM_TYPE in changeset:
+            self._append(self.RECORD_PARTITION,
+                         partition_id=partition.id,
+                         status=partition.status,
+                         alarm_type=partition.alarm_type)
+
+        if QolsysPartition.NOTIFY_UPDATE_ERROR in changeset:
+            self._append(self.RECORD_ERROR,
+                         partition_id=partition.id,
+                         error_type=partition.last_error_type,
+                         description=partition.last_error_desc,
+                         error_at=partition.last_error_at)
+
+    def _sensor_update(self, sensor: QolsysSensor,
+                       changeset: QolsysChangeset):
+        if QolsysSensor.NOTIFY_UPDATE_STATUS in changeset:
+            self._append(self.RECORD_ZONE,
+                         zone_id=sensor.zone_id,
+                         status=sensor.status)
+
+        tampered = QolsysSensor.NOTIFY_UPDATE_PATTERN.format(attr='tampered')
+        if tampered in changeset:
+            self._append(self.RECORD_TAMPERED,
+                         zone_id=sensor.zone_id,
+                         value=sensor.tampered)
@@ -0,0 +1,148 @@
+import asyncio
+import json
+import logging
+import os
+import re
+import socket
+
+
+LOGGER = logging.getLogger(__name__)
+
+
+MAC_ADDRESS_RE = re.compile(r'(([a-f\d]{1,2}:){5}[a-f\d]{1,2})', re.IGNORECASE)
+
+
+def mac_from_proc_arp(ip: str, path: str = '/proc/net/arp'):
+    """Return the mac address of the IP address in the ARP table of the
+    kernel, or None if it is not available."""
+    try:
+        with open(path) as f:
+            lines = f.readlines()
+    except OSError:
+        return None
+
+    # IP address  HW type  Flags  HW address  Mask  Device
+    for line in lines[1:]:
+        fields = line.split()
+        if len(fields) >= 4 and fields[0] == ip and \
+                fields[3] != '00:00:00:00:00:00':
+            return fields[3].lower()
+
+    return None
+
+
+async def mac_from_arp_command(ip_or_host: str, timeout: float = 5):
+    """Return the mac address found by the arp command, or None if it is
+    not available or does not answer in time."""
+    try:
+        # The arp command will automatically resolve the hostname to an
+        # IP address for us if needed
+        process = await asyncio.create_subprocess_exec(
+            'arp', ip_or_host,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.DEVNULL)
+    except OSError as e:
+        LOGGER.debug(f'Unable to run the arp command: {e}')
+        return None
+
+    try:
+        stdout, _ = await asyncio.wait_for(process.communicate(), timeout)
+    except asyncio.TimeoutError:
+        LOGGER.warning(f"Timeout running the arp command for '{ip_or_host}'")
+        process.kill()
+        await process.wait()
+        return None
+
+    m = MAC_ADDRESS_RE.search(stdout.decode('utf-8', errors='replace'))
+    return m[0].lower() if m else None
+
+
+class QolsysMacResolver(object):
+    """Resolve the mac address of the panel without blocking the event loop.
+
+    The ARP table of the kernel is read directly if available, and the
+    arp command is only used as a fallback. Resolved addresses are kept in
+    an optional cache file, so that they are known right away on the next
+    start, even when ARP is not available.
+    """
+
+    def __init__(self, host: str, cache_path: str = None,
+                 timeout: float = 5) -> None:
+        self._host = host
+        self._cache_path = cache_path
+        self._timeout = timeout
+
+    def cached(self):
+        if not self._cache_path:
+            return None
+
+        try:
+            with open(self._cache_path) as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            LOGGER.warning(f"Unable to read mac address cache "
+                           f"'{self._cache_path}': {e}")
+            return None
+
+        if not isinstance(data, dict):
+            return None
+        return data.get(self._host)
+
+    async def resolve(self):
+        mac = self.cached()
+        if mac:
+            LOGGER.debug(f"Found cached mac address '{mac}' for "
+                         f"'{self._host}'")
+            return mac
+
+        ip = await self._resolve_ip()
+        if ip:
+            mac = mac_from_proc_arp(ip)
+        if not mac:
+            mac = await mac_from_arp_command(ip or self._host,
+                                             timeout=self._timeout)
+
+        if not mac:
+            LOGGER.warning(f"No mac address found for '{self._host}'")
+            return None
+
+        LOGGER.debug(f"Found mac address '{mac}' for '{self._host}'")
+        self._save(mac)
+        return mac
+
+    async def _resolve_ip(self):
+        try:
+            infos = await asyncio.wait_for(
+                asyncio.get_running_loop().getaddrinfo(
+                    self._host, None, family=socket.AF_INET),
+                self._timeout)
+        except (OSError, asyncio.TimeoutError) as e:
+            LOGGER.debug(f"Unable to resolve '{self._host}': {e}")
+            return None
+
+        return infos[0][4][0] if infos else None
+
+    def _save(self, mac: str):
+        if not self._cache_path:
+            return
+
+        data = {}
+        try:
+            with open(self._cache_path) as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            pass
+        if not isinstance(data, dict):
+            data = {}
+        data[self._host] = mac
+
+        tmp_path = f'{self._cache_path}.tmp'
+        try:
+            with open(tmp_path, 'w') as f:
+                json.dump(data, f)
+            os.replace(tmp_path, self._cache_path)
+        except OSError as e:
+            LOGGER.warning(f"Unable to write mac address cache "
+                           f"'{self._cache_path}': {e}")
@@ -0,0 +1,342 @@
+import asyncio
+import contextvars
+import logging
+import os
+import time
+
+from bisect import bisect_left
+from collections import deque
+
+
+LOGGER = logging.getLogger(__name__)
+
+
+# Trace of the panel frame currently being processed, if any
+CURRENT_TRACE = contextvars.ContextVar('qolsys_trace', default=None)
+
+
+def current_trace():
+    return CURRENT_TRACE.get()
+
+
+def process_rss():
+    """Return the resident set size of the process in bytes, or None if
+    it cannot be read on this system."""
+    try:
+        with open('/proc/self/statm') as f:
+            pages = int(f.read().split()[1])
+    except (OSError, IndexError, ValueError):
+        return None
+    return pages * os.sysconf('SC_PAGE_SIZE')
+
+
+class QolsysHistogram(object):
+    """Histogram of durations with fixed buckets, in seconds.
+
+    Recording a value is a bisection over the bucket boundaries, and the
+    memory used does not depend on the number of recorded values; the
+    percentiles are approximated by the upper bound of their bucket.
+    """
+
+    BUCKETS = (
+        .0001, .00025, .0005,
+        .001, .0025, .005,
+        .01, .025, .05,
+        .1, .25, .5,
+        1, 2.5, 5, 10,
+    )
+
+    def __init__(self, buckets: tuple = None) -> None:
+        self._buckets = tuple(buckets or self.BUCKETS)
+        self._counts = [0] * (len(self._buckets) + 1)
+        self._count = 0
+        self._sum = 0.
+        self._max = 0.
+
+    @property
+    def count(self):
+        return self._count
+
+    @property
+    def sum(self):
+        return self._sum
+
+    @property
+    def max(self):
+        return self._max
+
+    def observe(self, value: float):
+        self._counts[bisect_left(self._buckets, value)] += 1
+        self._count += 1
+        self._sum += value
+        if value > self._max:
+            self._max = value
+
+    def percentile(self, p: float):
+        if not self._count:
+            return None
+
+        rank = p * self._count
+        seen = 0
+        for bound, count in zip(self._buckets, self._counts):
+            seen += count
+            if seen >= rank:
+                return min(bound, self._max)
+        return self._max
+
+    def cumulative(self):
+        """Return the (upper bound, cumulative count) of each bucket, the
+        last one being (inf, count)."""
+        seen = 0
+        for bound, count in zip(self._buckets + (float('inf'), ),
+                                self._counts):
+            seen += count
+            yield bound, seen
+
+    def to_dict(self):
+        def ms(value):
+            return None if value is None else round(value * 1000, 3)
+
+        return {
+            'count': self._count,
+            'avg_ms': ms(self._sum / self._count if self._count else None),
+            'p50_ms': ms(self.percentile(.5)),
+            'p99_ms': ms(self.percentile(.99)),
+            'max_ms': ms(self._max),
+        }
+
+
+class QolsysTrace(object):
+    """Timings of a panel frame through the stages of the gateway, from
+    the moment it is received until the resulting messages are published.
+
+    Each call to ``mark`` records the time elapsed since the previous
+    mark in the histogram of the given stage.
+    """
+
+    __slots__ = ('_metrics', '_started_at', '_last_at')
+
+    def __init__(self, metrics: 'QolsysMetrics',
+                 started_at: float = None) -> None:
+        self._metrics = metrics
+        self._started_at = started_at or time.monotonic()
+        self._last_at = self._started_at
+
+    def mark(self, stage: str):
+        now = time.monotonic()
+        self._metrics.observe(stage, now - self._last_at)
+        self._last_at = now
+
+    def finish(self):
+        self._metrics.observe('total', time.monotonic() - self._started_at)
+
+
+class QolsysMetrics(object):
+
+    STAGES = (
+        'decode',
+        'broker',
+        'mutate',
+        'notify',
+        'publish',
+        'total',
+    )
+
+    # Minimum number of seconds over which the rates are computed
+    RATE_WINDOW = 60
+
+    def __init__(self, max_pending: int = 1000) -> None:
+        self._histograms = {stage: QolsysHistogram() for stage in self.STAGES}
+        self._counters = {}
+        self._gauges = {}
+        self._last_frame_at = None
+        self._rates = {}
+        self._max_pending = max_pending
+        self._pending = {}
+        self._server = None
+        self._request_timeout = None
+
+    @property
+    def pending(self):
+        return bool(self._pending)
+
+    def histogram(self, stage: str):
+        return self._histograms[stage]
+
+    def counter(self, name: str):
+        return self._counters.get(name, 0)
+
+    def increment(self, name: str, value: int = 1):
+        self._counters[name] = self._counters.get(name, 0) + value
+
+    def gauge(self, name: str):
+        return self._gauges.get(name, 0)
+
+    def frame_received(self, received_at: float = None):
+        self._last_frame_at = received_at or time.monotonic()
+        self.increment('frames')
+
+    def track_publish(self, future: asyncio.Future):
+        """Count a publish as queued until its future is done."""
+        self._gauges['publish_queue_depth'] = \
+            self._gauges.get('publish_queue_depth', 0) + 1
+        future.add_done_callback(self._publish_done)
+
+    def _publish_done(self, future):
+        self._gauges['publish_queue_depth'] -= 1
+
+    def rate(self, name: str, now: float = None):
+        """Return the number of times the counter was incremented per
+        second over at least the last RATE_WINDOW seconds, or since the
+        first time the rate was read.
+
+        Reading the rate samples the counter, at most once per second, and
+        the rate is computed from the most recent sample that is old enough,
+        so how often the rate is read does not change its value.
+        """
+        now = time.monotonic() if now is None else now
+        value = self.counter(name)
+
+        samples = self._rates.get(name)
+        if samples is None:
+            samples = self._rates[name] = deque()
+
+        # Keep the most recent sample that is at least RATE_WINDOW seconds
+        # old, and drop the ones before it
+        while len(samples) > 1 and samples[1][0] <= now - self.RATE_WINDOW:
+            samples.popleft()
+
+        rate = None
+        if samples and now > samples[0][0]:
+            rate = (value - samples[0][1]) / (now - samples[0][0])
+
+        if not samples or now - samples[-1][0] >= 1:
+            samples.append((now, value))
+
+        return rate
+
+    def diagnostics(self, now: float = None):
+        """Return the values of the diagnostics of the gateway, computed
+        from the counters and histograms."""
+        now = time.monotonic() if now is None else now
+
+        def ms(value):
+            return None if value is None else round(value * 1000, 3)
+
+        total = self._histograms['total']
+        events_rate = self.rate('events', now=now)
+        rss = process_rss()
+
+        return {
+            'events_per_second': (None if events_rate is None
+                                  else round(events_rate, 3)),
+            'publish_queue_depth': self.gauge('publish_queue_depth'),
+            'reconnects': self.counter('reconnects'),
+            'last_frame_age': (None if self._last_frame_at is None
+                               else round(now - self._last_frame_at, 1)),
+            'decode_failures': self.counter('decode_failures'),
+            'latency_avg': ms(total.sum / total.count
+                              if total.count else None),
+            'latency_p99': ms(total.percentile(.99)),
+            'memory_rss': (None if rss is None
+                           else round(rss / 1024 / 1024, 1)),
+        }
+
+    def observe(self, stage: str, duration: float):
+        self._histograms[stage].observe(duration)
+
+    def trace(self, started_at: float = None):
+        return QolsysTrace(self, started_at=started_at)
+
+    def track(self, key: str, trace: QolsysTrace):
+        """Keep a trace until the event it is for comes back from the
+        broker, identified by its payload."""
+        if len(self._pending) >= self._max_pending:
+            # Drop the oldest trace, its event was probably lost
+            del self._pending[next(iter(self._pending))]
+        self._pending.setdefault(key, []).append(trace)
+
+    def resume(self, key: str):
+        traces = self._pending.get(key)
+        if not traces:
+            return None
+
+        trace = traces.pop(0)
+        if not traces:
+            del self._pending[key]
+        return trace
+
+    def to_dict(self):
+        return {
+            'counters': dict(self._counters),
+            'gauges': dict(self._gauges),
+            'latency': {
+                stage: histogram.to_dict()
+                for stage, histogram in self._histograms.items()
+            },
+        }
+
+    def to_prometheus(self, prefix: str = 'qolsysgw'):
+        lines = []
+
+        for name, value in sorted(self._counters.items()):
+            lines.append(f'# TYPE {prefix}_{name}_total counter')
+            lines.append(f'{prefix}_{name}_total {value}')
+
+        for name, value in sorted(self._gauges.items()):
+            lines.append(f'# TYPE {prefix}_{name} gauge')
+            lines.append(f'{prefix}_{name} {value}')
+
+        metric = f'{prefix}_stage_duration_seconds'
+        lines.append(f'# TYPE {metric} histogram')
+        for stage, histogram in self._histograms.items():
+            for bound, count in histogram.cumulative():
+                le = '+Inf' if bound == float('inf') else repr(bound)
+                lines.append(f'{metric}_bucket{{stage="{stage}",le="{le}"}} '
+                             f'{count}')
+            lines.append(f'{metric}_sum{{stage="{stage}"}} {histogram.sum}')
+            lines.append(f'{metric}_count{{stage="{stage}"}} '
+                         f'{histogram.count}')
+
+        return '\n'.join(lines) + '\n'
+
+    async def serve(self, port: int, host: str = '127.0.0.1',
+                    timeout: float = 10):
+        """Serve the metrics in the Prometheus text format over HTTP; the
+        clients have ``timeout`` seconds to send their request."""
+        self._request_timeout = timeout
+        self._server = await asyncio.start_server(
+            self._handle_request, host=host, port=port)
+        LOGGER.info(f'Serving metrics on {host or "all interfaces"}, '
+                    f'port {port}')
+
+    def close(self):
+        if self._server is not None:
+            self._server.close()
+            self._server = None
+
+    async def _handle_request(self, reader, writer):
+        try:
+            # We serve the same page whatever the request, but we still
+            # need to read the request before answering it
+            await asyncio.wait_for(self._read_request(reader),
+                                   self._request_timeout)
+
+            body = self.to_prometheus().encode()
+            writer.write(
+                b'HTTP/1.0 200 OK\r\n'
+                b'Content-Type: text/plain; version=0.0.4\r\n' +
+                f'Content-Length: {len(body)}\r\n\r\n'.encode() +
+                body)
+            await writer.drain()
+        except asyncio.TimeoutError:
+            LOGGER.debug('Metrics client did not send its request in time')
+        except ConnectionError:
+            LOGGER.debug('Metrics client disconnected')
+        finally:
+            writer.close()
+
+    @staticmethod
+    async def _read_request(reader):
+        while (await reader.readline()).strip():
+            pass
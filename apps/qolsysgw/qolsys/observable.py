@@ -1,23 +1,205 @@
+import contextlib
 import logging
 
 LOGGER = logging.getLogger(__name__)
 
 
+class QolsysChange(object):
+    __slots__ = ('prev_value', 'new_value')
+
+    def __init__(self, prev_value=None, new_value=None):
+        self.prev_value = prev_value
+        self.new_value = new_value
+
+    def copy(self):
+        return type(self)(prev_value=self.prev_value,
+                          new_value=self.new_value)
+
+    def merge(self, other: 'QolsysChange'):
+        """Merge a later change of the same type, and return whether the
+        value went back to what it was, in which case there is nothing left
+        to notify; changes without values are never reverted."""
+        # When a change happens multiple times, we keep the value from
+        # before the first change, and the value after the last change
+        changed = self.prev_value != self.new_value
+        self.new_value = other.new_value
+        return changed and self.prev_value == self.new_value
+
+    def __eq__(self, other):
+        return type(other) is type(self) and \
+            self.prev_value == other.prev_value and \
+            self.new_value == other.new_value
+
+    def __repr__(self):
+        return (f'<{type(self).__name__} prev_value={self.prev_value!r} '
+                f'new_value={self.new_value!r}>')
+
+
+class QolsysItemsChange(QolsysChange):
+    """Change of the items of a collection, where the previous value is
+    the list of items removed, and the new value the list of items added;
+    merging such changes accumulates the items."""
+
+    __slots__ = ()
+
+    def copy(self):
+        return QolsysItemsChange(prev_value=list(self.prev_value),
+                                 new_value=list(self.new_value))
+
+    def merge(self, other: 'QolsysItemsChange'):
+        self.prev_value.extend(other.prev_value)
+        self.new_value.extend(other.new_value)
+        return False
+
+
+class QolsysChangeset(dict):
+    """Changes of an observable, keyed by change type, delivered at once
+    to the observers."""
+
+    def add(self, change, prev_value=None, new_value=None):
+        self[change] = QolsysChange(prev_value=prev_value, new_value=new_value)
+        return self
+
+    def add_items(self, change, removed=None, added=None):
+        self[change] = QolsysItemsChange(prev_value=list(removed or ()),
+                                         new_value=list(added or ()))
+        return self
+
+    def merge(self, changeset: 'QolsysChangeset'):
+        for change, values in changeset.items():
+            current = self.get(change)
+            if current is None:
+                self[change] = values.copy()
+            elif current.merge(values):
+                del self[change]
+        return self
+
+
 class QolsysObservable(object):
+    # Changesets waiting for the current batch to be committed, shared by
+    # all the observables so a batch can span the whole state
+    _BATCH = None
+
     def __init__(self):
         self._observers = dict()
+        self._dispatch = dict()
+        self._wildcard = ()
+        self._order = dict()
+
+    def register(self, observer, callback=None, changes=None, first=False):
+        """Register an observer to be called with ``(observable, changeset)``
+        for changesets containing at least one of the requested changes, or
+        for all changesets if no changes are provided.
 
-    def register(self, observer, callback=None):
+        Observers are called in the order in which they registered, unless
+        registered ``first``. An observer can add changes to the changeset
+        it receives, which are then notified to the observers after it."""
         LOGGER.debug(f"Registering {repr(observer)} to {self} updates")
         if callback is None:
             callback = getattr(observer, 'update')
-        self._observers[observer] = callback
+        entry = (callback,
+                 frozenset(changes) if changes is not None else None)
+        if first:
+            observers = self._observers
+            self._observers = {observer: entry}
+            self._observers.update(
+                (k, v) for k, v in observers.items() if k is not observer)
+        else:
+            self._observers[observer] = entry
+        self._rebuild_dispatch()
 
     def unregister(self, observer):
         LOGGER.debug(f"Unregistering {repr(observer)} from {self} updates")
         del self._observers[observer]
+        self._rebuild_dispatch()
+
+    def unregister_all(self):
+        LOGGER.debug(f"Unregistering all observers from {self} updates")
+        self._observers.clear()
+        self._rebuild_dispatch()
+
+    def _rebuild_dispatch(self):
+        dispatch = {}
+        wildcard = []
+        order = {}
+        for callback, changes in self._observers.values():
+            order.setdefault(callback, len(order))
+            if changes is None:
+                wildcard.append(callback)
+                continue
+            for change in changes:
+                dispatch.setdefault(change, []).append(callback)
+
+        self._dispatch = {k: tuple(v) for k, v in dispatch.items()}
+        self._wildcard = tuple(wildcard)
+        self._order = order
+
+    def observes(self, change):
+        return bool(self._wildcard) or change in self._dispatch
+
+    def notify(self, change, prev_value=None, new_value=None):
+        if not self.observes(change):
+            return
+
+        self.notify_changeset(QolsysChangeset().add(
+            change, prev_value=prev_value, new_value=new_value))
+
+    @contextlib.contextmanager
+    def batch(self):
+        """Collect the changes happening on any observable within the block,
+        and notify the observers only once per observable when leaving the
+        outermost block."""
+        if QolsysObservable._BATCH is not None:
+            yield
+            return
+
+        QolsysObservable._BATCH = pending = {}
+        try:
+            yield
+        finally:
+            QolsysObservable._BATCH = None
+            for observable, changeset in pending.items():
+                # All the changes of the observable might have been reverted
+                if changeset:
+                    observable._dispatch_changeset(changeset)
+
+    def notify_changeset(self, changeset: QolsysChangeset):
+        pending = QolsysObservable._BATCH
+        if pending is not None:
+            current = pending.get(self)
+            if current is None:
+                pending[self] = current = QolsysChangeset()
+            current.merge(changeset)
+            return
+
+        self._dispatch_changeset(changeset)
+
+    def _callbacks(self, changeset: QolsysChangeset):
+        if len(changeset) == 1 and not self._wildcard:
+            return list(self._dispatch.get(next(iter(changeset)), ()))
+
+        callbacks = set(self._wildcard)
+        for change in changeset:
+            callbacks.update(self._dispatch.get(change, ()))
+        return sorted(callbacks, key=self._order.__getitem__)
+
+    def _dispatch_changeset(self, changeset: QolsysChangeset):
+        callbacks = self._callbacks(changeset)
+        if not callbacks:
+            return
+
+        LOGGER.debug(f"Notifying {self} observers with: {changeset}")
+        size = len(changeset)
+        notified = 0
+        while notified < len(callbacks):
+            callback = callbacks[notified]
+            notified += 1
+            callback(self, changeset)
 
-    def notify(self, **payload):
-        LOGGER.debug(f"Notifying {self} observers with: {payload}")
-        for observer, callback in self._observers.items():
-            callback(self, **payload)
+            # The observer added changes, which might concern observers
+            # that were not going to be notified
+            if len(changeset) != size:
+                size = len(changeset)
+                done = callbacks[:notified]
+                callbacks = done + [c for c in self._callbacks(changeset)
+                                    if c not in done]
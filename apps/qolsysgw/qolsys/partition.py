@@ -2,7 +2,10 @@ import logging
 
 from datetime import datetime, timezone
 
+from qolsys.observable import QolsysChangeset
 from qolsys.observable import QolsysObservable
+from qolsys.vocabulary import ALARM_TYPE
+from qolsys.vocabulary import PARTITION_STATUS
 
 
 LOGGER = logging.getLogger(__name__)
@@ -14,6 +17,7 @@ class QolsysPartition(QolsysObservable):
     NOTIFY_REMOVE_SENSOR = 'remove_sensor'
     NOTIFY_UPDATE_ALARM_TYPE = 'update_alarm_type'
     NOTIFY_UPDATE_ATTRIBUTES = 'update_attributes'
+    NOTIFY_UPDATE_ERROR = 'update_error'
     NOTIFY_UPDATE_SECURE_ARM = 'update_secure_arm'
     NOTIFY_UPDATE_STATUS = 'update_status'
 
@@ -23,7 +27,7 @@ class QolsysPartition(QolsysObservable):
 
         self._id = partition_id
         self._name = name
-        self._status = status
+        self._status = PARTITION_STATUS(status)
         self._secure_arm = secure_arm
         self._sensors = {}
         self._alarm_type = None
@@ -75,8 +79,8 @@ class QolsysPartition(QolsysObservable):
 
     @status.setter
     def status(self, value):
-        new_value = value.upper()
-        if self._status != new_value:
+        new_value = PARTITION_STATUS(value)
+        if self._status is not new_value:
             LOGGER.debug(f"Partition '{self.id}' ({self.name}) status updated to '{new_value}'")
             prev_value = self._status
 
@@ -86,7 +90,7 @@ class QolsysPartition(QolsysObservable):
                         prev_value=prev_value, new_value=new_value)
 
         # If the panel is disarmed, we can reset the failed disarm attempts
-        if new_value.upper() == 'DISARM':
+        if new_value is PARTITION_STATUS.DISARM:
             self.disarm_failed = 0
 
         self.alarm_type = None
@@ -105,9 +109,9 @@ class QolsysPartition(QolsysObservable):
     @alarm_type.setter
     def alarm_type(self, value):
         if value is not None:
-            value = value.upper()
+            value = ALARM_TYPE(value)
 
-        if self._alarm_type != value:
+        if self._alarm_type is not value:
             LOGGER.debug(f"Partition '{self.id}' ({self.name}) alarm type updated to '{value}'")
             prev_value = self._alarm_type
             self._alarm_type = value
@@ -126,19 +130,74 @@ class QolsysPartition(QolsysObservable):
             self.notify(change=self.NOTIFY_UPDATE_ATTRIBUTES)
 
     def triggered(self, alarm_type: str = None):
-        self.status = 'ALARM'
+        self.status = PARTITION_STATUS.ALARM
         self.alarm_type = alarm_type
 
-    def errored(self, error_type: str, error_description: str):
+    def errored(self, error_type: str, error_description: str,
+                error_at: str = None):
+        prev_value = (self._last_error_type, self._last_error_desc,
+                      self._last_error_at)
+
         self._last_error_type = error_type
         self._last_error_desc = error_description
-        self._last_error_at = datetime.now(timezone.utc).isoformat()
+        self._last_error_at = error_at or \
+            datetime.now(timezone.utc).isoformat()
 
         # If this is a failed disarm attempt, let's increase the counter
         if error_type.upper() == 'DISARM_FAILED':
             self._disarm_failed += 1
 
-        self.notify(change=self.NOTIFY_UPDATE_ATTRIBUTES)
+        self.notify_changeset(
+            QolsysChangeset()
+            .add(self.NOTIFY_UPDATE_ERROR, prev_value=prev_value,
+                 new_value=(self._last_error_type, self._last_error_desc,
+                            self._last_error_at))
+            .add(self.NOTIFY_UPDATE_ATTRIBUTES))
+
+    def update(self, partition: 'QolsysPartition'):
+        # Only set the status if it changed, as setting it resets the
+        # alarm type
+        if self._status is not partition.status:
+            self.status = partition.status
+        self.secure_arm = partition.secure_arm
+
+        for zone_id in list(self._sensors):
+            if partition.zone(zone_id) is None:
+                self.remove_zone(zone_id)
+
+        for sensor in partition.sensors:
+            psensor = self._sensors.get(sensor.zone_id)
+            if psensor is not None and type(psensor) is not type(sensor):
+                self.remove_zone(sensor.zone_id)
+                psensor = None
+
+            if psensor is None:
+                sensor.partition = self
+                self.add_sensor(sensor)
+            else:
+                psensor.update(sensor)
+
+    def to_snapshot(self):
+        return {
+            'partition_id': self.id,
+            'name': self.name,
+            'status': self.status,
+            'secure_arm': self.secure_arm,
+            'alarm_type': self.alarm_type,
+            'last_error_type': self.last_error_type,
+            'last_error_desc': self.last_error_desc,
+            'last_error_at': self.last_error_at,
+            'disarm_failed': self.disarm_failed,
+            'zone_list': [s.to_snapshot() for s in self.sensors],
+        }
+
+    def restore_snapshot(self, data: dict):
+        self._alarm_type = data.get('alarm_type') and \
+            ALARM_TYPE(data['alarm_type'])
+        self._last_error_type = data.get('last_error_type')
+        self._last_error_desc = data.get('last_error_desc')
+        self._last_error_at = data.get('last_error_at')
+        self._disarm_failed = int(data.get('disarm_failed') or 0)
 
     def zone(self, zone_id, default=None):
         return self._sensors.get(zone_id, default)
@@ -160,7 +219,8 @@ class QolsysPartition(QolsysObservable):
             return
 
         self._sensors[sensor.zone_id] = sensor
-        self.notify(change=self.NOTIFY_ADD_SENSOR, new_value=sensor)
+        self.notify_changeset(QolsysChangeset().add_items(
+            self.NOTIFY_ADD_SENSOR, added=[sensor]))
 
     def update_sensor(self, sensor):
         psensor = self._sensors.get(sensor.zone_id)
@@ -177,8 +237,8 @@ class QolsysPartition(QolsysObservable):
 
         del self._sensors[zone_id]
 
-        self.notify(change=self.NOTIFY_REMOVE_SENSOR,
-                    prev_value=zone)
+        self.notify_changeset(QolsysChangeset().add_items(
+            self.NOTIFY_REMOVE_SENSOR, removed=[zone]))
 
     def __str__(self):
         return (f"<QolsysPartition id={self.id} name={self.name} "
@@ -0,0 +1,121 @@
+import asyncio
+import logging
+import os
+import re
+import sys
+import time
+
+
+LOGGER = logging.getLogger(__name__)
+
+
+# import time: self [us] | cumulative | imported package
+IMPORT_TIME_RE = re.compile(
+    r'^import time:\s+(?P<self>\d+)\s+\|\s+(?P<cumulative>\d+)\s+\|'
+    r'(?P<indent>\s*)(?P<module>\S+)\s*$')
+
+# The packages of the gateway itself, to tell them apart from their
+# dependencies in the import times
+APP_MODULES = ('gateway', 'mqtt', 'qolsys')
+
+
+def parse_import_times(output: str):
+    """Parse the output of ``python -X importtime`` into a list of
+    ``(module, self_us, cumulative_us)`` tuples, in import order."""
+    times = []
+    for line in output.splitlines():
+        m = IMPORT_TIME_RE.match(line)
+        if m:
+            times.append((m['module'], int(m['self']),
+                          int(m['cumulative'])))
+    return times
+
+
+def is_app_module(module: str):
+    return module.split('.', 1)[0] in APP_MODULES
+
+
+async def import_times(module: str = 'gateway', timeout: float = 30):
+    """Import the module in a new interpreter with ``-X importtime``, and
+    return the time spent importing each module, or None if the import
+    could not be profiled."""
+    env = dict(os.environ)
+    env['PYTHONPATH'] = os.pathsep.join(p for p in sys.path if p)
+
+    try:
+        process = await asyncio.create_subprocess_exec(
+            sys.executable, '-X', 'importtime', '-c', f'import {module}',
+            stdout=asyncio.subprocess.DEVNULL,
+            stderr=asyncio.subprocess.PIPE,
+            env=env)
+    except OSError as e:
+        LOGGER.warning(f'Unable to profile the import of {module}: {e}')
+        return None
+
+    try:
+        _, stderr = await asyncio.wait_for(process.communicate(), timeout)
+    except asyncio.TimeoutError:
+        LOGGER.warning(f'Timeout profiling the import of {module}')
+        process.kill()
+        await process.wait()
+        return None
+
+    if process.returncode != 0:
+        LOGGER.warning(f'Unable to profile the import of {module}, '
+                       f'exited with code {process.returncode}')
+        return None
+
+    return parse_import_times(stderr.decode('utf-8', errors='replace'))
+
+
+class QolsysStartupProfiler(object):
+    """Record the time at which each stage of the startup of the gateway
+    is first reached, relative to the start of the gateway."""
+
+    def __init__(self, started_at: float = None, clock: callable = None):
+        self._clock = clock or time.monotonic
+        self._started_at = started_at if started_at is not None \
+            else self._clock()
+        self._stages = {}
+
+    @property
+    def stages(self):
+        return dict(self._stages)
+
+    def mark(self, stage: str):
+        """Record the stage if it was not reached before, and return the
+        time elapsed since the start in seconds, or None if the stage was
+        already recorded."""
+        if stage in self._stages:
+            return None
+
+        elapsed = self._clock() - self._started_at
+        self._stages[stage] = elapsed
+        return elapsed
+
+    def __str__(self):
+        return ' '.join(f'{stage}={elapsed * 1000:.1f}ms'
+                        for stage, elapsed in self._stages.items())
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    module = argv[0] if argv else 'gateway'
+
+    times = asyncio.run(import_times(module))
+    if times is None:
+        return 1
+
+    app_times = [t for t in times if is_app_module(t[0])]
+    for name, self_us, cumulative_us in sorted(
+            app_times, key=lambda t: t[2], reverse=True):
+        print(f'{cumulative_us / 1000:10.1f}ms {self_us / 1000:10.1f}ms  '
+              f'{name}')
+
+    total_us = next((t[2] for t in times if t[0] == module), 0)
+    print(f'{total_us / 1000:10.1f}ms total for {module}')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,91 @@
+class QolsysField(object):
+    """Description of a single field to extract from a Qolsys payload.
+
+    The key can either be a string, or a tuple of strings to reach into
+    nested dictionaries (e.g. ``('zone', 'zone_id')``). The value found
+    is passed through ``coerce`` if provided, which must raise ValueError
+    or TypeError if the value is invalid.
+    """
+
+    def __init__(self, name: str, key=None, coerce: callable = None,
+                 required: bool = True, default=None) -> None:
+        self.name = name
+        self.path = key if isinstance(key, tuple) else (key or name,)
+        self.coerce = coerce
+        self.required = required
+        self.default = default
+
+
+def compile_schema(fields, exception):
+    """Compile a list of fields into a decoding function.
+
+    The returned function takes a dictionary and returns a dictionary of
+    the decoded and coerced values, keyed by field name, in a single pass.
+    If a required field is missing or a value cannot be coerced, the
+    provided exception class is raised.
+    """
+    compiled = tuple(
+        (f.name, f.path, '.'.join(f.path), f.coerce, f.required, f.default)
+        for f in fields
+    )
+
+    def decode(data):
+        if not isinstance(data, dict):
+            raise exception(f'Expected an object, got {type(data).__name__}')
+
+        values = {}
+        for name, path, dotted, coerce, required, default in compiled:
+            value = data
+            for key in path:
+                value = value.get(key) if isinstance(value, dict) else None
+
+            if value is None:
+                if required:
+                    raise exception(f"Missing field '{dotted}' in {data}")
+                values[name] = default
+                continue
+
+            if coerce is not None:
+                try:
+                    value = coerce(value)
+                except (TypeError, ValueError) as e:
+                    raise exception(
+                        f"Invalid value {value!r} for field '{dotted}': {e}")
+
+            values[name] = value
+
+        return values
+
+    return decode
+
+
+def to_int(value):
+    if isinstance(value, bool):
+        raise TypeError('boolean is not an integer')
+    return int(value)
+
+
+def to_bool(value):
+    if isinstance(value, bool):
+        return value
+    if isinstance(value, str):
+        lvalue = value.lower()
+        if lvalue in ('true', '1'):
+            return True
+        if lvalue in ('false', '0'):
+            return False
+    if isinstance(value, int):
+        return bool(value)
+    raise ValueError('not a boolean')
+
+
+def to_str(value):
+    if not isinstance(value, (str, int, float)) or isinstance(value, bool):
+        raise TypeError(f'{type(value).__name__} is not a string')
+    return str(value)
+
+
+def to_list(value):
+    if not isinstance(value, list):
+        raise TypeError(f'{type(value).__name__} is not a list')
+    return value
@@ -2,11 +2,23 @@ import json
 import logging
 import time
 
+from qolsys.exceptions import InvalidQolsysSensorException
 from qolsys.exceptions import UnableToParseSensorException
 from qolsys.exceptions import UnknownQolsysSensorException
+from qolsys.observable import QolsysChangeset
 from qolsys.observable import QolsysObservable
 from qolsys.partition import QolsysPartition
+from qolsys.schema import QolsysField
+from qolsys.schema import compile_schema
+from qolsys.schema import to_int
+from qolsys.schema import to_str
 from qolsys.utils import find_subclass
+from qolsys.utils import subtype_names
+from qolsys.utils import warm_subclass_cache
+from qolsys.vocabulary import SENSOR_GROUP
+from qolsys.vocabulary import SENSOR_STATE
+from qolsys.vocabulary import SENSOR_STATUS
+from qolsys.vocabulary import SENSOR_TYPE
 
 
 LOGGER = logging.getLogger(__name__)
@@ -33,17 +45,35 @@ class QolsysSensor(QolsysObservable):
         'tampered',
     ]
 
+    # Decoder for the fields that are common to all sensors, compiled
+    # once so that sensors are validated and typed in a single pass
+    _SCHEMA = staticmethod(compile_schema([
+        QolsysField('sensor_id', key='id', coerce=to_str),
+        QolsysField('sensor_type', key='type', coerce=SENSOR_TYPE),
+        QolsysField('name', coerce=to_str),
+        QolsysField('group', coerce=SENSOR_GROUP, required=False),
+        QolsysField('status', coerce=SENSOR_STATUS),
+        QolsysField('state', coerce=SENSOR_STATE, required=False),
+        QolsysField('zone_id', coerce=to_int),
+        QolsysField('zone_type', coerce=to_int, required=False),
+        QolsysField('zone_physical_type', coerce=to_int, required=False),
+        QolsysField('zone_alarm_type', coerce=to_int, required=False),
+        QolsysField('partition_id', coerce=to_int),
+    ], exception=InvalidQolsysSensorException))
+
     def __init__(self, sensor_id: str, name: str, group: str, status: str,
                  state: str, zone_id: int, zone_type: int,
                  zone_physical_type: int, zone_alarm_type: int,
-                 partition_id: int, partition: QolsysPartition) -> None:
+                 partition_id: int, partition: QolsysPartition,
+                 sensor_type: str = None) -> None:
         super().__init__()
 
         self._id = sensor_id
+        self._type = sensor_type and SENSOR_TYPE(sensor_type)
         self._name = name
-        self._group = group
-        self._status = status
-        self._state = state
+        self._group = group and SENSOR_GROUP(group)
+        self._status = status and SENSOR_STATUS(status)
+        self._state = state and SENSOR_STATE(state)
         self._zone_id = zone_id
         self._zone_type = zone_type
         self._zone_physical_type = zone_physical_type
@@ -52,6 +82,8 @@ class QolsysSensor(QolsysObservable):
         self._partition = partition
 
         self._tampered = False
+        self._flaps = 0
+        self._history = None
         self._last_open_tampered_at = None
         self._last_closed_tampered_at = None
 
@@ -68,24 +100,24 @@ class QolsysSensor(QolsysObservable):
             LOGGER.warning(f"Updating sensor '{self.id}' ({self.name}) with "
                            f"sensor '{sensor.id}' (different id)")
 
-        # Because any of the attributes might have changed and we want to
-        # be able to notify of all of those changes separately and only if they
-        # happened, we have to add a bit of smart in there
-        attributes_updated = False
+        # Any of the attributes might have changed, we gather all the changes
+        # that happened in a single changeset so observers are only notified
+        # once per update
+        changeset = QolsysChangeset()
         for attr in ['id'] + self._common_keys + self.ATTRIBUTES:
             local_attr = f'_{attr}'
             prev_value = getattr(self, local_attr)
             new_value = getattr(sensor, attr)
             if prev_value != new_value:
                 setattr(self, local_attr, new_value)
-                self.notify(change=self.NOTIFY_UPDATE_PATTERN.format(attr=attr),
-                            prev_value=prev_value, new_value=new_value)
+                changeset.add(self.NOTIFY_UPDATE_PATTERN.format(attr=attr),
+                              prev_value=prev_value, new_value=new_value)
 
                 if attr in self.ATTRIBUTES:
-                    attributes_updated = True
+                    changeset.add(self.NOTIFY_UPDATE_ATTRIBUTES)
 
-        if attributes_updated:
-            self.notify(change=self.NOTIFY_UPDATE_ATTRIBUTES)
+        if changeset:
+            self.notify_changeset(changeset)
 
     @property
     def id(self):
@@ -105,6 +137,10 @@ class QolsysSensor(QolsysObservable):
             return f"{self._id}_{self._zone_id}"
         return self.id
 
+    @property
+    def type(self):
+        return self._type
+
     @property
     def name(self):
         return self._name
@@ -145,21 +181,34 @@ class QolsysSensor(QolsysObservable):
     def tampered(self):
         return self._tampered
 
+    @property
+    def flaps(self):
+        return self._flaps
+
+    @property
+    def history(self):
+        return self._history
+
+    @history.setter
+    def history(self, history):
+        self._history = history
+
     @property
     def is_open(self):
-        return self._status == 'Open'
+        return self._status is SENSOR_STATUS.OPEN
 
     @property
     def is_closed(self):
-        return self._status == 'Closed'
+        return self._status is SENSOR_STATUS.CLOSED
 
     @status.setter
     def status(self, value):
-        new_value = value.capitalize()
-        if new_value not in ['Open', 'Closed']:
+        new_value = SENSOR_STATUS(value)
+        if new_value is not SENSOR_STATUS.OPEN and \
+                new_value is not SENSOR_STATUS.CLOSED:
             raise AttributeError(f"Invalid value '{value}' for attribute 'status'")
 
-        if self._status != new_value:
+        if self._status is not new_value:
             LOGGER.debug(f"Sensor '{self.id}' ({self.name}) status updated to '{new_value}'")
             prev_value = self._status
 
@@ -178,8 +227,20 @@ class QolsysSensor(QolsysObservable):
 
             self._tampered = new_value
 
-            self.notify(change=self.NOTIFY_UPDATE_PATTERN.format(attr='tampered'),
-                        prev_value=prev_value, new_value=new_value)
+            self.notify_changeset(
+                QolsysChangeset()
+                .add(self.NOTIFY_UPDATE_PATTERN.format(attr='tampered'),
+                     prev_value=prev_value, new_value=new_value)
+                .add(self.NOTIFY_UPDATE_ATTRIBUTES))
+
+    @flaps.setter
+    def flaps(self, value):
+        new_value = int(value)
+
+        if self._flaps != new_value:
+            LOGGER.debug(f"Sensor '{self.id}' ({self.name}) flaps updated to '{new_value}'")
+            self._flaps = new_value
+
             self.notify(change=self.NOTIFY_UPDATE_ATTRIBUTES)
 
     def _next_status_update_is_status(self):
@@ -194,14 +255,35 @@ class QolsysSensor(QolsysObservable):
             self._last_open_tampered_at = time.time()
             self.tampered = True
         else:
-            self.status = 'Open'
+            self.status = SENSOR_STATUS.OPEN
 
     def closed(self):
         if self.tampered:
             self._last_closed_tampered_at = time.time()
             self.tampered = False
         else:
-            self.status = 'Closed'
+            self.status = SENSOR_STATUS.CLOSED
+
+    def to_snapshot(self):
+        return {
+            'id': self.id,
+            'type': self.type,
+            'name': self.name,
+            'group': self.group,
+            'status': self.status,
+            'state': self.state,
+            'zone_id': self.zone_id,
+            'zone_type': self.zone_type,
+            'zone_physical_type': self.zone_physical_type,
+            'zone_alarm_type': self.zone_alarm_type,
+            'partition_id': self.partition_id,
+            'tampered': self.tampered,
+            'flaps': self.flaps,
+        }
+
+    def restore_snapshot(self, data: dict):
+        self._tampered = bool(data.get('tampered'))
+        self._flaps = int(data.get('flaps') or 0)
 
     def __str__(self):
         return (f"<{type(self).__name__} id={self.id} name={self.name} "
@@ -212,13 +294,26 @@ class QolsysSensor(QolsysObservable):
                 f"zone_alarm_type={self.zone_alarm_type} "
                 f"partition_id={self.partition_id}>")
 
+    @classmethod
+    def warm_up(cls):
+        """Resolve the classes of the known sensor types in advance, so
+        that the first sensors received do not have to search for them."""
+        warm_subclass_cache(
+            QolsysSensor, QolsysSensor.__SUBCLASSES_CACHE,
+            subtypes=subtype_names(QolsysSensor, separator='', upper=False),
+            preserve_capitals=True,
+        )
+
     @classmethod
     def from_json(cls, data, partition):
         if isinstance(data, str):
             data = json.loads(data)
 
+        if not isinstance(data, dict):
+            raise InvalidQolsysSensorException(f'Invalid sensor {data}')
+
         sensor_type = data.get('type')
-        if not sensor_type:
+        if not sensor_type or not isinstance(sensor_type, str):
             raise UnknownQolsysSensorException(
                 f'Sensor type not found for sensor {data}'
             )
@@ -234,10 +329,7 @@ class QolsysSensor(QolsysObservable):
 
     @classmethod
     def from_json_common_data(cls, data):
-        common_data = {k: v for k, v in data.items()
-                       if k in cls._common_keys or k in cls.ATTRIBUTES}
-        common_data['sensor_id'] = data['id']
-        return common_data
+        return cls._SCHEMA(data)
 
     @classmethod
     def from_json_subclass(cls, subtype, data, partition, common=None):
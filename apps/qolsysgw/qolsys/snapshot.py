@@ -0,0 +1,168 @@
+import asyncio
+import json
+import logging
+import os
+
+from qolsys.events import QolsysEvent
+from qolsys.events import QolsysEventInfoSummary
+from qolsys.exceptions import QolsysException
+from qolsys.observable import QolsysChangeset
+from qolsys.partition import QolsysPartition
+from qolsys.sensors import QolsysSensor
+from qolsys.state import QolsysState
+
+
+LOGGER = logging.getLogger(__name__)
+
+
+def summary_from_snapshot(partition_list) -> QolsysEventInfoSummary:
+    """Build a summary event from the partitions of a state snapshot,
+    including the values that we are tracking on our side and that the
+    panel does not send in its summaries."""
+    event = QolsysEvent.from_json({
+        'event': 'INFO',
+        'info_type': 'SUMMARY',
+        'partition_list': partition_list,
+    })
+
+    partitions_data = {p['partition_id']: p for p in partition_list}
+    for partition in event.partitions:
+        partition_data = partitions_data[partition.id]
+        partition.restore_snapshot(partition_data)
+
+        sensors_data = {s.get('zone_id'): s
+                        for s in partition_data['zone_list']
+                        if isinstance(s, dict)}
+        for sensor in partition.sensors:
+            sensor.restore_snapshot(sensors_data.get(sensor.zone_id, {}))
+
+    return event
+
+
+class QolsysStateSnapshot(object):
+    """Persist the state to a local file so it can be restored on start.
+
+    The snapshot is written at most once per delay after a change, to a
+    temporary file that is then renamed over the previous snapshot, so
+    that a crash while writing never leaves a corrupted snapshot behind.
+    The file is read and written in the executor, so that it does not
+    block the event loop.
+    """
+
+    VERSION = 1
+
+    def __init__(self, state: QolsysState, path: str,
+                 delay: float = 5) -> None:
+        self._state = state
+        self._path = path
+        self._delay = delay
+        self._handle = None
+        self._task = None
+        # Only one write at a time runs in the executor, so that an older
+        # snapshot never replaces a newer one
+        self._writing = asyncio.Lock()
+
+        state.register(self, callback=self._state_update,
+                       changes=[QolsysState.NOTIFY_UPDATE_PARTITIONS,
+                                QolsysState.NOTIFY_UPDATE_ERROR])
+        for partition in state.partitions:
+            self._register_partition(partition)
+
+    async def restore(self):
+        """Restore the state from the snapshot, if there is a valid one.
+        Returns whether the state was restored."""
+        try:
+            data = await asyncio.get_running_loop().run_in_executor(
+                None, self._read)
+        except FileNotFoundError:
+            LOGGER.debug(f"No state snapshot found at '{self._path}'")
+            return False
+        except (OSError, ValueError) as e:
+            LOGGER.warning(f"Unable to read state snapshot '{self._path}': {e}")
+            return False
+
+        if not isinstance(data, dict) or data.get('version') != self.VERSION:
+            LOGGER.warning(f"Ignoring state snapshot '{self._path}' with "
+                           "unsupported version")
+            return False
+
+        try:
+            event = summary_from_snapshot(data.get('partition_list'))
+        except QolsysException as e:
+            LOGGER.warning(f"Invalid state snapshot '{self._path}': {e}")
+            return False
+
+        LOGGER.info(f"Restoring state snapshot from '{self._path}'")
+        self._state.update(event)
+        self._state.restore_snapshot(data)
+        return True
+
+    async def save(self):
+        """Write the snapshot right away, cancelling any pending write."""
+        self.cancel()
+
+        # The state is taken on the event loop, only the file is written
+        # in the executor
+        data = {'version': self.VERSION}
+        data.update(self._state.to_snapshot())
+
+        async with self._writing:
+            await asyncio.get_running_loop().run_in_executor(
+                None, self._write, data)
+
+    def cancel(self):
+        if self._handle is not None:
+            self._handle.cancel()
+            self._handle = None
+
+    def _read(self):
+        with open(self._path) as f:
+            return json.load(f)
+
+    def _write(self, data):
+        tmp_path = f'{self._path}.tmp'
+        try:
+            with open(tmp_path, 'w') as f:
+                json.dump(data, f, separators=(',', ':'))
+            os.replace(tmp_path, self._path)
+        except OSError as e:
+            LOGGER.warning(f"Unable to write state snapshot '{self._path}': {e}")
+            return
+
+        LOGGER.debug(f"State snapshot written to '{self._path}'")
+
+    def _schedule(self):
+        # We do not postpone an already scheduled write, so a constant flow
+        # of changes does not prevent the snapshot from being written
+        if self._handle is not None:
+            return
+
+        loop = asyncio.get_running_loop()
+        self._handle = loop.call_later(self._delay, self._save_later)
+
+    def _save_later(self):
+        self._handle = None
+        self._task = asyncio.ensure_future(self.save())
+
+    def _state_update(self, state: QolsysState, changeset: QolsysChangeset):
+        if QolsysState.NOTIFY_UPDATE_PARTITIONS in changeset:
+            for partition in state.partitions:
+                self._register_partition(partition)
+        self._schedule()
+
+    def _register_partition(self, partition: QolsysPartition):
+        partition.register(self, callback=self._partition_update)
+        for sensor in partition.sensors:
+            sensor.register(self, callback=self._sensor_update)
+
+    def _partition_update(self, partition: QolsysPartition,
+                          changeset: QolsysChangeset):
+        change = changeset.get(QolsysPartition.NOTIFY_ADD_SENSOR)
+        if change is not None:
+            for sensor in change.new_value:
+                sensor.register(self, callback=self._sensor_update)
+        self._schedule()
+
+    def _sensor_update(self, sensor: QolsysSensor,
+                       changeset: QolsysChangeset):
+        self._schedule()
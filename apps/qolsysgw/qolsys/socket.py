@@ -1,13 +1,19 @@
 import asyncio
+import collections
 import json
 import logging
 import ssl
+import time
 
 from qolsys.actions import QolsysAction
 from qolsys.actions import QolsysActionInfo
 from qolsys.events import QolsysEvent
+from qolsys.exceptions import InvalidQolsysEventException
+from qolsys.exceptions import InvalidQolsysSensorException
 from qolsys.exceptions import UnknownQolsysEventException
 from qolsys.exceptions import UnknownQolsysSensorException
+from qolsys.metrics import CURRENT_TRACE
+from qolsys.metrics import QolsysMetrics
 from qolsys.utils import LoggerCallback
 
 
@@ -19,7 +25,9 @@ class QolsysSocket(object):
                  logger=None, callback: callable = None,
                  connected_callback: callable = None,
                  disconnected_callback: callable = None,
-                 keep_alive: int = None) -> None:
+                 keep_alive: int = None,
+                 ack_timeout: float = None,
+                 metrics: QolsysMetrics = None) -> None:
         self._hostname = hostname
         self._port = port or 12345
         self._token = token or ''
@@ -29,29 +37,87 @@ class QolsysSocket(object):
         self._connected_callback = connected_callback or LoggerCallback('Connected callback')
         self._disconnected_callback = disconnected_callback or LoggerCallback('Disconnected callback')
         self._keep_alive = keep_alive or 60 * 4  # 4mn, since the panel generally timeouts at 5mn
+        self._metrics = metrics
+        self.ack_timeout = ack_timeout
 
         self._writer = None
 
+        # The panel sends an ACK for each read of the data we send, the
+        # commands as well as the empty lines sent as keep-alives, in the
+        # order it received them; the ACK is a bare line without any
+        # identifier, so it cannot be matched with the nonce of a command.
+        # We thus keep a future per message sent, and resolve the oldest
+        # one still waited for on each ACK. Messages sent close to each
+        # other can be read at once by the panel and get a single ACK, so
+        # the messages that are not waited for anymore, or not expected to
+        # be acknowledged anymore after the timeout, leave the queue for the
+        # ACKs of the next messages to be matched with them
+        self._acks = collections.deque()
+
+    def set_callbacks(self, callback: callable,
+                      connected_callback: callable,
+                      disconnected_callback: callable,
+                      metrics: QolsysMetrics = None):
+        """Replace the callbacks of the socket, so that another gateway
+        can take over an established connection."""
+        self._callback = callback
+        self._connected_callback = connected_callback
+        self._disconnected_callback = disconnected_callback
+        self._metrics = metrics
+
     def create_tasks(self, event_loop):
         return {
             'listen': event_loop.create_task(self.listen()),
             'keep_alive': event_loop.create_task(self.keep_alive()),
         }
 
-    async def send(self, action: QolsysAction):
+    async def send(self, action: QolsysAction) -> asyncio.Future:
+        """Send the action to the panel, and return a future that will be
+        resolved when the panel acknowledges it."""
         if self._writer is None:
             raise Exception('No writer')
 
         self._logger.debug(f'Sending: {action.with_token(self._token)}')
-        self._writer.write(action.with_token(self._token).encode())
+        return await self._write(action.with_token(self._token))
+
+    async def _write(self, message: str) -> asyncio.Future:
+        # The future is queued right before writing the message, without
+        # yielding to the event loop, so that the futures are in the order
+        # in which the panel receives the messages
+        ack = asyncio.get_running_loop().create_future()
+        self._acks.append((time.monotonic(), ack))
+        self._writer.write(message.encode())
         await self._writer.drain()
 
+        return ack
+
+    def _acknowledged(self):
+        # The messages whose caller stopped waiting for them, or which were
+        # sent longer than the timeout ago, do not expect an ACK anymore
+        expired = time.monotonic() - self.ack_timeout \
+            if self.ack_timeout else None
+        while self._acks:
+            sent_at, ack = self._acks[0]
+            if not ack.done() and (expired is None or sent_at >= expired):
+                break
+            self._acks.popleft()
+            ack.cancel()
+
+        if not self._acks:
+            self._logger.debug('ACK without pending message - ignoring.')
+            return
+
+        self._acks.popleft()[1].set_result(True)
+
+    def _cancel_acks(self):
+        while self._acks:
+            self._acks.popleft()[1].cancel()
+
     async def keep_alive(self):
         while 'we need to keep the connection alive':
             if self._writer is not None:
                 self._logger.debug('Sending keep-alive')
-                self._writer.write('\n'.encode())
-                await self._writer.drain()
+                await self._write('\n')
             await asyncio.sleep(self._keep_alive)
 
     async def listen(self):
@@ -64,6 +130,7 @@ class QolsysSocket(object):
 
         self._listen = True
         delay_reconnect = 0
+        connected_before = False
         while self._listen:
             writer = None
             try:
@@ -76,9 +143,15 @@ class QolsysSocket(object):
                 await self.send(QolsysActionInfo())
                 await self._connected_callback()
 
+                if self._metrics:
+                    if connected_before:
+                        self._metrics.increment('reconnects')
+                    connected_before = True
+
                 delay_reconnect = 0
                 while 'there is content to read':
                     line = await reader.readline()
+                    received_at = time.monotonic()
                     if not line:
                         self._logger.info('Connection closed by the panel, exiting to reset the connection')
                         break
@@ -87,15 +160,21 @@ class QolsysSocket(object):
                     self._logger.debug(f"Data received (len: {len(line)}): {line}")
 
                     if line == 'ACK':
-                        # This is an ACK to a command we sent, we can ignore
-                        self._logger.debug('ACK - ignoring.')
+                        # This is an ACK to a command we sent
+                        self._logger.debug('ACK')
+                        self._acknowledged()
                         continue
 
+                    if self._metrics:
+                        self._metrics.frame_received(received_at)
+
                     try:
                         # We try to parse the event to one of our event classes
                         event = QolsysEvent.from_json(line)
                     except json.decoder.JSONDecodeError:
                         self._logger.debug(f'Data is not JSON: {line}')
+                        if self._metrics:
+                            self._metrics.increment('decode_failures')
                         continue
                     except UnknownQolsysEventException:
                         self._logger.debug(f'Unknown Qolsys event: {line}')
@@ -103,11 +182,32 @@ class QolsysSocket(object):
                     except UnknownQolsysSensorException:
                         self._logger.debug(f'Unknown sensor in Qolsys event: {line}')
                         continue
+                    except (InvalidQolsysEventException,
+                            InvalidQolsysSensorException) as e:
+                        self._logger.warning(f'Rejected Qolsys event: {e}')
+                        if self._metrics:
+                            self._metrics.increment('decode_failures')
+                        continue
+
+                    # Follow the frame through the gateway until the
+                    # resulting messages are published
+                    token = None
+                    if self._metrics:
+                        trace = self._metrics.trace(started_at=received_at)
+                        trace.mark('decode')
+                        token = CURRENT_TRACE.set(trace)
 
                     try:
                         await self._callback(event)
+                    except asyncio.CancelledError:
+                        # Stopping the gateway while it handles an event
+                        # must not be mistaken for an error of the callback
+                        raise
                     except:  # noqa: E722
                         self._logger.exception(f'Error calling callback for event: {line}')
+                    finally:
+                        if token is not None:
+                            CURRENT_TRACE.reset(token)
             except asyncio.exceptions.CancelledError:
                 self._listen = False
                 self._logger.info('listening cancelled')
@@ -115,6 +215,9 @@ class QolsysSocket(object):
                 delay_reconnect = min(delay_reconnect * 2 or 1, 60)
                 self._logger.exception('error while listening')
             finally:
+                # The commands that were not acknowledged will never be
+                self._cancel_acks()
+
                 await self._disconnected_callback()
 
                 self._writer = None
@@ -5,6 +5,7 @@ from mqtt.exceptions import MqttException
 from qolsys.events import QolsysEventInfoSummary
 from qolsys.exceptions import QolsysException
 from qolsys.observable import QolsysObservable
+from qolsys.utils import subclasses_index
 
 
 LOGGER = logging.getLogger(__name__)
@@ -47,6 +48,18 @@ class QolsysState(QolsysObservable):
         return self._partitions.get(int(partition_id))
 
     def update(self, event: QolsysEventInfoSummary):
+        partitions = {int(p.id): p for p in event.partitions}
+
+        # If the partitions did not change, we can reconcile them in place
+        # instead of replacing them, so that only the entities that actually
+        # changed need to be published again
+        if self._partitions and partitions.keys() == self._partitions.keys() \
+                and all(p.name == self._partitions[i].name
+                        for i, p in partitions.items()):
+            for partition_id, partition in partitions.items():
+                self._partitions[partition_id].update(partition)
+            return
+
         prev_partitions = self.partitions
 
         self._partitions = {}
@@ -57,6 +70,33 @@ class QolsysState(QolsysObservable):
                     prev_value=prev_partitions,
                     new_value=self.partitions)
 
+    def to_snapshot(self):
+        last_exception = self._last_exception
+        return {
+            'partition_list': [p.to_snapshot() for p in self.partitions],
+            'last_error_type': (type(last_exception).__name__
+                                if last_exception else None),
+            'last_error_desc': (str(last_exception)
+                                if last_exception else None),
+            'last_error_at': last_exception.at if last_exception else None,
+        }
+
+    def restore_snapshot(self, data: dict):
+        error_type = data.get('last_error_type')
+        if not error_type:
+            return
+
+        # Restore the error with its original type, without going through
+        # its constructor, which would date it from now
+        exc_class = QolsysException
+        for base in (QolsysException, MqttException):
+            exc_class = subclasses_index(base).get(error_type, exc_class)
+
+        exc = exc_class.__new__(exc_class)
+        Exception.__init__(exc, data.get('last_error_desc'))
+        exc._at = data.get('last_error_at')
+        self.last_exception = exc
+
     def zone(self, zone_id):
         for partition in self.partitions:
             zone = partition.zone(zone_id)
@@ -1,6 +1,5 @@
 import logging
 import re
-import subprocess
 
 
 LOGGER = logging.getLogger(__name__)
@@ -21,11 +20,29 @@ async def defaultLoggerCallback(*args, **kwargs):
     callback(*args, **kwargs)
 
 
+_NORMALIZE_NON_WORD_RE = re.compile(r'[\W_]+')
+_NORMALIZE_CAPITALS_RE = re.compile(r'(?<=[^\s])([A-Z])')
+_NORMALIZE_SPACES_RE = re.compile(r'\s')
+_SUBTYPE_WORDS_RE = re.compile(r'(?<=[a-z])(?=[A-Z])')
+
+# Subclasses of the classes searched through find_subclass, by class name
+_SUBCLASSES_INDEX = {}
+
+
 def all_subclasses(cls):
     return set(cls.__subclasses__()).union(
         [s for c in cls.__subclasses__() for s in all_subclasses(c)])
 
 
+def subclasses_index(cls, refresh=False):
+    index = _SUBCLASSES_INDEX.get(cls)
+    if index is None or refresh:
+        index = _SUBCLASSES_INDEX[cls] = {
+            klass.__name__: klass for klass in all_subclasses(cls)
+        }
+    return index
+
+
 def find_subclass(cls, subtype: str, cache: dict = None, normalize=True,
                   preserve_capitals=False):
     if cache and subtype in cache:
@@ -33,43 +50,49 @@ def find_subclass(cls, subtype: str, cache: dict = None, normalize=True,
 
     normalized_subtype = subtype
     if normalize:
-        normalized_subtype = re.compile(r'[\W_]+').sub(' ', normalized_subtype)
+        normalized_subtype = _NORMALIZE_NON_WORD_RE.sub(' ', normalized_subtype)
         if preserve_capitals:
-            normalized_subtype = re.compile(r'(?<=[^\s])([A-Z])').sub(
+            normalized_subtype = _NORMALIZE_CAPITALS_RE.sub(
                 ' \\1', normalized_subtype)
         normalized_subtype = normalized_subtype.title()
-        normalized_subtype = re.compile(r'\s').sub('', normalized_subtype)
+        normalized_subtype = _NORMALIZE_SPACES_RE.sub('', normalized_subtype)
 
     search = f"{cls.__name__}{normalized_subtype}"
 
-    for klass in all_subclasses(cls):
-        if klass.__name__ == search:
-            if cache is not None:
-                cache[subtype] = klass
-            return klass
+    klass = subclasses_index(cls).get(search)
+    if klass is None:
+        # The class might have been defined after the index was built
+        klass = subclasses_index(cls, refresh=True).get(search)
 
     if cache is not None:
-        cache[subtype] = None
-    return None
+        cache[subtype] = klass
+    return klass
+
 
+def subtype_names(cls, classes=None, separator='_', upper=True):
+    """Return the subtypes that find_subclass resolves to the given
+    subclasses of cls (all of them by default), written the way the
+    Qolsys Panel writes them, e.g. ZONE_EVENT for QolsysEventZoneEvent."""
+    if classes is None:
+        classes = all_subclasses(cls)
 
-def get_mac_from_host(ip_or_host):
-    try:
-        # The arp command will automatically resolve the hostname to an
-        # IP address for us if needed
-        process = subprocess.run(['arp', ip_or_host], capture_output=True)
-    except subprocess.SubprocessError:
-        LOGGER.exception(f"Error trying to get the mac address for '{ip_or_host}'")
-        return None
+    names = []
+    for klass in classes:
+        if not klass.__name__.startswith(cls.__name__) or \
+                klass.__name__ == cls.__name__:
+            continue
 
-    output = process.stdout.decode('utf-8')
+        name = _SUBTYPE_WORDS_RE.sub(
+            separator, klass.__name__[len(cls.__name__):])
+        names.append(name.upper() if upper else name)
 
-    m = re.search(r'(([a-f\d]{1,2}:){5}[a-f\d]{1,2})', output)
+    return names
 
-    if m is None:
-        LOGGER.warning(f"No mac address found for '{ip_or_host}'")
-        return None
 
-    mac = m[0]
-    LOGGER.debug(f"Found mac address '{mac}' for '{ip_or_host}'")
-    return mac
+def warm_subclass_cache(cls, cache: dict, subtypes=(), **kwargs):
+    """Build the index of the subclasses of cls and resolve the subtypes in
+    the cache ahead of time, so that the first lookups of find_subclass
+    do not have to search through the subclasses."""
+    subclasses_index(cls, refresh=True)
+    for subtype in subtypes:
+        find_subclass(cls, subtype, cache=cache, **kwargs)
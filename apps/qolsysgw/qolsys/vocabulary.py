@@ -0,0 +1,140 @@
+import logging
+import re
+import sys
+
+
+LOGGER = logging.getLogger(__name__)
+
+
+class QolsysVocabulary(object):
+    """Normalization table for a string field sent by the Qolsys Panel.
+
+    Looking up a value returns its canonical, interned, form, so that all
+    objects share the same string instance and can be compared by identity.
+    The known values are exposed as attributes (e.g. ``ARM_AWAY``), values
+    not known in advance are learned on first use, up to a limit to avoid
+    growing the table indefinitely.
+    """
+
+    _MAX_SIZE = 512
+
+    def __init__(self, name: str, values: list, normalize: callable = None):
+        self._name = name
+        self._normalize = normalize
+        self._table = {}
+        self._known = set()
+
+        for value in values:
+            canonical = self._learn(value)
+            self._known.add(canonical)
+            setattr(self, re.sub(r'\W', '_', canonical).upper(), canonical)
+
+    def __call__(self, value):
+        canonical = self._table.get(value)
+        if canonical is None:
+            canonical = self._learn(value)
+        return canonical
+
+    def __contains__(self, value):
+        return value in self._known
+
+    def __iter__(self):
+        return iter(self._known)
+
+    def strict(self, value):
+        """Return the canonical form of a value known in advance, or raise
+        a ValueError if the value is not part of the vocabulary."""
+        canonical = self(value)
+        if canonical not in self._known:
+            raise ValueError(f"must be one of {', '.join(sorted(self._known))}")
+        return canonical
+
+    def _learn(self, value):
+        canonical = sys.intern(
+            self._normalize(value) if self._normalize else value)
+
+        if len(self._table) >= self._MAX_SIZE:
+            return self._table.get(canonical, canonical)
+
+        canonical = self._table.setdefault(canonical, canonical)
+        self._table[value] = canonical
+        return canonical
+
+
+PARTITION_STATUS = QolsysVocabulary('partition status', [
+    'DISARM',
+    'ARM_STAY',
+    'ARM_AWAY',
+    'ARM_NIGHT',
+    'ENTRY_DELAY',
+    'EXIT_DELAY',
+    'ARM-AWAY-EXIT-DELAY',
+    'ARM-STAY-EXIT-DELAY',
+    'ALARM',
+], normalize=str.upper)
+
+# The arming types received in ARMING events are the statuses that the
+# partition takes, so they share the same table
+ARMING_TYPE = PARTITION_STATUS
+
+ALARM_TYPE = QolsysVocabulary('alarm type', [
+    'POLICE',
+    'FIRE',
+    'AUXILIARY',
+], normalize=str.upper)
+
+SENSOR_STATUS = QolsysVocabulary('sensor status', [
+    'Open',
+    'Closed',
+], normalize=str.capitalize)
+
+SENSOR_STATE = QolsysVocabulary('sensor state', [
+    '0',
+    '1',
+], normalize=str)
+
+SENSOR_TYPE = QolsysVocabulary('sensor type', [
+    'Auxiliary Pendant',
+    'Bluetooth',
+    'CODetector',
+    'Door_Window',
+    'Doorbell',
+    'Freeze',
+    'GlassBreak',
+    'Heat',
+    'KeyFob',
+    'Keypad',
+    'Motion',
+    'Panel Glass Break',
+    'Panel Motion',
+    'Shock',
+    'Siren',
+    'SmokeDetector',
+    'TakeoverModule',
+    'Temperature',
+    'Tilt',
+    'Translator',
+    'Water',
+], normalize=str)
+
+SENSOR_GROUP = QolsysVocabulary('sensor group', [
+    'awayinstantmotion',
+    'entryexitdelay',
+    'entryexitlongdelay',
+    'fixedintrusion',
+    'fixedmedical',
+    'freeze',
+    'garageTilt1',
+    'glassbreakawayonly',
+    'instantperimeter',
+    'localsafety',
+    'mobileintrusion',
+    'safetymotion',
+    'shock',
+    'Siren',
+    'smoke_heat',
+    'takeovermodule',
+    'Temperature',
+    'translator',
+    'WaterSensor',
+], normalize=str)
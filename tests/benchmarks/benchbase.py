@@ -0,0 +1,205 @@
+import asyncio
+import datetime
+import json
+import logging
+import os
+import platform
+import statistics
+import subprocess
+import time
+import unittest
+
+import testenv  # noqa: F401
+from testutils.mock_panel import PanelServer
+
+from gateway import QolsysGateway
+
+
+# Where to write the results of the benchmarks; by default, one file per
+# commit in the results directory, so that they can be compared across
+# commits with compare.py
+RESULTS_ENV = 'QOLSYSGW_BENCHMARK_RESULTS'
+RESULTS_DIR = os.path.join(testenv.CURRENT_DIR, 'results')
+
+
+def current_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            cwd=testenv.ROOT_DIR, capture_output=True, text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def results_path():
+    path = os.environ.get(RESULTS_ENV)
+    if path:
+        return path
+    return os.path.join(RESULTS_DIR, f"{current_commit() or 'local'}.json")
+
+
+def summarize(durations: list):
+    """Return the statistics, in milliseconds, of a list of durations in
+    seconds."""
+    durations = sorted(durations)
+    p95 = durations[min(len(durations) - 1, int(len(durations) * .95))]
+
+    return {
+        'min_ms': durations[0] * 1000,
+        'median_ms': statistics.median(durations) * 1000,
+        'mean_ms': statistics.mean(durations) * 1000,
+        'p95_ms': p95 * 1000,
+    }
+
+
+class BenchmarkResults(object):
+    """Results of the benchmarks of a run, saved as JSON.
+
+    Each benchmark is identified by its name and parameters, and has a set
+    of metrics; metrics whose name ends with ``_per_s`` are better when
+    higher, all the others are better when lower.
+    """
+
+    def __init__(self) -> None:
+        self._benchmarks = {}
+
+    @staticmethod
+    def key(name: str, params: dict):
+        if not params:
+            return name
+        params = ','.join(f'{k}={v}' for k, v in params.items())
+        return f'{name}[{params}]'
+
+    def record(self, name: str, params: dict, **metrics):
+        self._benchmarks[self.key(name, params)] = {
+            'name': name,
+            'params': params,
+            'metrics': metrics,
+        }
+
+    def save(self, path: str = None):
+        if not self._benchmarks:
+            return
+
+        path = path or results_path()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+
+        # Results of the benchmarks of other modules might already be in
+        # the file, keep them
+        try:
+            with open(path) as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            data = {}
+
+        data.update({
+            'commit': current_commit(),
+            'python': platform.python_version(),
+            'created_at': datetime.datetime.now(
+                datetime.timezone.utc).isoformat(),
+        })
+        data.setdefault('benchmarks', {}).update(self._benchmarks)
+
+        with open(path, 'w') as f:
+            json.dump(data, f, indent=2, sort_keys=True)
+
+
+class TestQolsysGatewayBenchmarkBase(unittest.IsolatedAsyncioTestCase):
+
+    _TIMEOUT = 30
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.results = BenchmarkResults()
+
+        # Logging each message would be measured with the rest
+        logging.disable(logging.INFO)
+
+    @classmethod
+    def tearDownClass(cls):
+        logging.disable(logging.NOTSET)
+        cls.results.save()
+        super().tearDownClass()
+
+    async def _init_panel_and_gw(self, broker=None, **kwargs):
+        panel = PanelServer()
+        await panel.start()
+
+        gw = QolsysGateway()
+        gw.broker = broker
+        gw.args = {
+            'panel_host': 'localhost',
+            'panel_port': panel.port,
+            'panel_mac': 'aa:bb:cc:dd:ee:ff',
+            'panel_token': '<panel_token>',
+            'diagnostics_interval': 0,
+            **kwargs,
+        }
+        await gw.initialize()
+
+        await panel.wait_for_next_message(
+            timeout=self._TIMEOUT,
+            filters={'action': 'INFO'},
+            raise_on_timeout=True,
+        )
+
+        return panel, gw
+
+    async def _wait_for_publishes(self, gw, count: int, startpos: int = 0,
+                                  topic_filter: callable = None):
+        """Wait until the gateway published the given number of messages
+        since startpos, only counting those whose topic passes the filter,
+        and return the time at which the last one was published."""
+        deadline = time.perf_counter() + self._TIMEOUT
+        seen = 0
+        position = startpos
+
+        while True:
+            published = gw.PUBLISHED.MESSAGES
+            for message in published[position:]:
+                if topic_filter is None or topic_filter(message['topic']):
+                    seen += 1
+            position = len(published)
+
+            if seen >= count:
+                return time.perf_counter()
+
+            if time.perf_counter() > deadline:
+                raise TimeoutError(f'Only {seen} of {count} messages '
+                                   'published before timeout')
+
+            await asyncio.sleep(0)
+
+    async def _wait_for_quiet(self, gw, quiet: float = .1):
+        """Wait until the gateway did not publish anything for the given
+        number of seconds."""
+        deadline = time.perf_counter() + self._TIMEOUT
+        count = len(gw.PUBLISHED.MESSAGES)
+        quiet_since = time.perf_counter()
+
+        while time.perf_counter() - quiet_since < quiet:
+            if time.perf_counter() > deadline:
+                raise TimeoutError('The gateway kept publishing until '
+                                   'timeout')
+            await asyncio.sleep(.01)
+
+            if len(gw.PUBLISHED.MESSAGES) != count:
+                count = len(gw.PUBLISHED.MESSAGES)
+                quiet_since = time.perf_counter()
+
+    async def _wait_for_broker(self, broker, count: int):
+        """Wait until the broker handled the given number of messages, and
+        return the time at which the last one was handled."""
+        deadline = time.perf_counter() + self._TIMEOUT
+
+        while broker.total_messages < count:
+            if time.perf_counter() > deadline:
+                raise TimeoutError(f'Only {broker.total_messages} of {count} '
+                                   'messages handled by the broker before '
+                                   'timeout')
+            await asyncio.sleep(.001)
+
+        return time.perf_counter()
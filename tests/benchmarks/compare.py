@@ -0,0 +1,75 @@
+"""Compare the results of two runs of the benchmarks.
+
+Usage: python tests/benchmarks/compare.py BASE.json NEW.json [--threshold PCT]
+
+Exits with a non-zero status if any metric regressed by more than the
+threshold (in percent, 10 by default). Metrics whose name ends with
+``_per_s`` are better when higher, all the others are better when lower.
+"""
+import argparse
+import json
+import sys
+
+
+def is_higher_better(metric: str):
+    return metric.endswith('_per_s')
+
+
+def compare(base: dict, new: dict, threshold: float):
+    """Return the rows of the comparison of the benchmarks of both runs,
+    as (benchmark, metric, base, new, change in percent, regressed)."""
+    rows = []
+
+    base_benchmarks = base.get('benchmarks', {})
+    for key, benchmark in sorted(new.get('benchmarks', {}).items()):
+        base_metrics = base_benchmarks.get(key, {}).get('metrics', {})
+
+        for metric, value in sorted(benchmark['metrics'].items()):
+            base_value = base_metrics.get(metric)
+            if base_value is None:
+                rows.append((key, metric, None, value, None, False))
+                continue
+
+            change = ((value - base_value) / base_value * 100
+                      if base_value else 0.0)
+            worse = -change if is_higher_better(metric) else change
+            rows.append((key, metric, base_value, value, change,
+                         worse > threshold))
+
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description='Compare the results of two runs of the benchmarks')
+    parser.add_argument('base', help='results of the reference run')
+    parser.add_argument('new', help='results of the run to compare')
+    parser.add_argument('--threshold', type=float, default=10,
+                        help='percentage over which a change is considered '
+                             'a regression (default: %(default)s)')
+    args = parser.parse_args(argv)
+
+    with open(args.base) as f:
+        base = json.load(f)
+    with open(args.new) as f:
+        new = json.load(f)
+
+    print(f"Comparing {base.get('commit') or args.base} to "
+          f"{new.get('commit') or args.new}")
+
+    regressions = 0
+    for key, metric, base_value, value, change, regressed in compare(
+            base, new, args.threshold):
+        if change is None:
+            print(f'  {key} {metric}: {value:.3f} (new)')
+            continue
+
+        regressions += regressed
+        print(f"  {key} {metric}: {base_value:.3f} -> {value:.3f} "
+              f"({change:+.1f}%){' REGRESSION' if regressed else ''}")
+
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,254 @@
+"""Benchmarks of the gateway, on synthetic panels of different sizes.
+
+Run with ``pytest -p no:logging tests/benchmarks/``; the results are saved
+as JSON in tests/benchmarks/results/<commit>.json, or in the file set in
+the QOLSYSGW_BENCHMARK_RESULTS environment variable, and can be compared
+across commits with tests/benchmarks/compare.py.
+"""
+import gc
+import json
+import time
+import tracemalloc
+
+import testenv  # noqa: F401
+from benchbase import TestQolsysGatewayBenchmarkBase
+from benchbase import summarize
+from testutils.load_generator import PanelLoadGenerator
+from testutils.mqtt_broker import MockMqttBroker
+from testutils.synthetic_panel import SyntheticPanel
+
+from mqtt.utils import normalize_name_to_id
+from qolsys.events import QolsysEvent
+from qolsys.state import QolsysState
+
+
+# The sizes of the panels to benchmark, as (partitions, zones per partition);
+# the Qolsys Panel supports up to 128 zones
+PANEL_SIZES = (
+    (1, 32),
+    (4, 32),
+    (1, 128),
+)
+
+# The slow brokers to benchmark, as (latency in seconds, maximum number of
+# messages handled per second)
+SLOW_BROKERS = (
+    (.005, None),
+    (0, 1000),
+    (.005, 1000),
+)
+
+
+class TestBenchmarkQolsysGateway(TestQolsysGatewayBenchmarkBase):
+
+    def _params(self, partitions, zones):
+        return {'partitions': partitions, 'zones': partitions * zones}
+
+    def _sensor_topic(self, panel, zone_id, topic):
+        name = normalize_name_to_id(panel.zone(zone_id)['name'])
+        return f'homeassistant/binary_sensor/{name}/{topic}'
+
+    async def _ready_panel_and_gw(self, synthetic, **kwargs):
+        panel, gw = await self._init_panel_and_gw(**kwargs)
+
+        startpos = len(gw.PUBLISHED.MESSAGES)
+        started_at = time.perf_counter()
+        await panel.writeline(synthetic.summary())
+
+        # The discovery of the last sensor is published last
+        last_topic = self._sensor_topic(
+            synthetic, synthetic.zone_ids[-1], 'attributes')
+        finished_at = await self._wait_for_publishes(
+            gw, 1, startpos=startpos,
+            topic_filter=lambda topic: topic == last_topic)
+
+        published = len(gw.PUBLISHED.MESSAGES) - startpos
+        return panel, gw, finished_at - started_at, published
+
+    def test_benchmark_summary_decode(self):
+        for partitions, zones in PANEL_SIZES:
+            synthetic = SyntheticPanel(partitions, zones)
+            summary = json.dumps(synthetic.summary())
+
+            durations = []
+            for _ in range(20):
+                started_at = time.perf_counter()
+                QolsysEvent.from_json(summary)
+                durations.append(time.perf_counter() - started_at)
+
+            stats = summarize(durations)
+            self.results.record(
+                'summary_decode', self._params(partitions, zones),
+                per_zone_us=stats['median_ms'] * 1000 / (partitions * zones),
+                **stats,
+            )
+
+    def test_benchmark_memory_per_zone(self):
+        def traced_state(partitions, zones):
+            summary = json.dumps(SyntheticPanel(partitions, zones).summary())
+
+            # The sensors are created when decoding the event, and then
+            # kept by the state, so both are traced
+            gc.collect()
+            tracemalloc.start()
+            try:
+                event = QolsysEvent.from_json(summary)
+                state = QolsysState()
+                state.update(event)
+                del event
+                gc.collect()
+                size, _ = tracemalloc.get_traced_memory()
+            finally:
+                tracemalloc.stop()
+
+            self.assertTrue(state.partitions)
+            return size
+
+        small_partitions, small_zones = PANEL_SIZES[0]
+        partitions, zones = PANEL_SIZES[-1]
+        small = traced_state(small_partitions, small_zones)
+        large = traced_state(partitions, zones)
+
+        self.results.record(
+            'state_memory', self._params(partitions, zones),
+            total_bytes=large,
+            per_zone_bytes=(large - small) / (
+                partitions * zones - small_partitions * small_zones),
+        )
+
+    async def test_benchmark_discovery_configure(self):
+        for partitions, zones in PANEL_SIZES:
+            synthetic = SyntheticPanel(partitions, zones)
+            _, _, duration, published = await self._ready_panel_and_gw(
+                synthetic)
+
+            self.results.record(
+                'discovery_configure', self._params(partitions, zones),
+                duration_ms=duration * 1000,
+                per_zone_us=duration * 1e6 / (partitions * zones),
+                messages=published,
+            )
+
+    async def test_benchmark_zone_active_throughput(self):
+        events = 500
+
+        for partitions, zones in PANEL_SIZES:
+            synthetic = SyntheticPanel(partitions, zones)
+            panel, gw, _, _ = await self._ready_panel_and_gw(synthetic)
+
+            lines = [synthetic.zone_active(synthetic.random_zone_id())
+                     for _ in range(events)]
+
+            startpos = len(gw.PUBLISHED.MESSAGES)
+            started_at = time.perf_counter()
+            for line in lines:
+                await panel.writeline(line)
+
+            # Each event changes the status of its sensor, so each leads to
+            # the publication of the state of the sensor
+            finished_at = await self._wait_for_publishes(
+                gw, events, startpos=startpos,
+                topic_filter=lambda topic: topic.endswith('/state'))
+            duration = finished_at - started_at
+
+            self.results.record(
+                'zone_active_throughput',
+                dict(self._params(partitions, zones), events=events),
+                events_per_s=events / duration,
+                messages_per_event=(
+                    len(gw.PUBLISHED.MESSAGES) - startpos) / events,
+            )
+
+    async def test_benchmark_arming_latency(self):
+        for partitions, zones in PANEL_SIZES:
+            synthetic = SyntheticPanel(partitions, zones)
+            panel, gw, _, _ = await self._ready_panel_and_gw(synthetic)
+
+            partition_id = synthetic.partition_ids[-1]
+            state_topic = (f'homeassistant/alarm_control_panel/qolsys_panel/'
+                           f'partition{partition_id}/state')
+
+            durations = []
+            for i in range(20):
+                arming_type = 'ARM_STAY' if i % 2 == 0 else 'DISARM'
+
+                startpos = len(gw.PUBLISHED.MESSAGES)
+                started_at = time.perf_counter()
+                await panel.writeline(synthetic.arming(partition_id,
+                                                       arming_type))
+                finished_at = await self._wait_for_publishes(
+                    gw, 1, startpos=startpos,
+                    topic_filter=lambda topic: topic == state_topic)
+                durations.append(finished_at - started_at)
+
+            self.results.record(
+                'arming_latency', self._params(partitions, zones),
+                **summarize(durations),
+            )
+
+    async def test_benchmark_broker_accounting(self):
+        events = 200
+
+        for partitions, zones in PANEL_SIZES:
+            synthetic = SyntheticPanel(partitions, zones)
+            broker = MockMqttBroker()
+            panel, gw, _, discovery = await self._ready_panel_and_gw(
+                synthetic, broker=broker)
+            await self._wait_for_broker(broker, len(gw.PUBLISHED.MESSAGES))
+
+            # What stays on the broker after the discovery, and is sent to
+            # each client subscribing to the topics
+            retained_bytes = broker.retained_bytes
+            retained_topics = len(broker.retained)
+
+            broker.reset_counters()
+            generator = PanelLoadGenerator(panel, synthetic, rate=1000,
+                                           pattern='constant')
+            stats = await generator.run(events=events)
+            await self._wait_for_quiet(gw)
+
+            self.results.record(
+                'broker_accounting', self._params(partitions, zones),
+                discovery_messages=discovery,
+                retained_topics=retained_topics,
+                retained_bytes=retained_bytes,
+                messages_per_event=broker.total_messages / stats['events'],
+                bytes_per_event=broker.total_bytes / stats['events'],
+            )
+
+    async def test_benchmark_slow_broker(self):
+        events = 200
+        partitions, zones = PANEL_SIZES[0]
+
+        for latency, max_rate in SLOW_BROKERS:
+            synthetic = SyntheticPanel(partitions, zones)
+            broker = MockMqttBroker(latency=latency, max_rate=max_rate)
+            panel, gw, _, _ = await self._ready_panel_and_gw(
+                synthetic, broker=broker)
+            await self._wait_for_broker(broker, len(gw.PUBLISHED.MESSAGES))
+
+            lines = [synthetic.zone_active(synthetic.random_zone_id())
+                     for _ in range(events)]
+
+            broker.reset_counters()
+            startpos = len(gw.PUBLISHED.MESSAGES)
+            started_at = time.perf_counter()
+            for line in lines:
+                await panel.writeline(line)
+
+            # The gateway does not wait for the broker to publish the next
+            # messages, so it is done with the events before the broker
+            handled_at = await self._wait_for_publishes(
+                gw, events, startpos=startpos,
+                topic_filter=lambda topic: topic.endswith('/state'))
+            delivered_at = await self._wait_for_broker(
+                broker, len(gw.PUBLISHED.MESSAGES) - startpos)
+
+            self.results.record(
+                'slow_broker',
+                dict(self._params(partitions, zones), events=events,
+                     latency_ms=latency * 1000, max_rate=max_rate),
+                events_per_s=events / (handled_at - started_at),
+                delivered_per_s=events / (delivered_at - started_at),
+                max_queue_depth=broker.max_inflight,
+            )
@@ -1,4 +1,7 @@
 import asyncio
+import json
+
+from unittest import mock
 
 import testenv  # noqa: F401
 from testbase import TestQolsysGatewayBase
@@ -41,6 +44,7 @@ class TestIntegrationQolsysGateway(TestQolsysGatewayBase):
         await asyncio.sleep(self._TIMEOUT)
 
         self.assertTrue(panel.is_client_connected)
+        self.assertEqual(1, gw.metrics.counter('decode_failures'))
 
     async def test_integration_gateway_stays_connected_on_unknown_json_data(self):
         panel, gw = await self._init_panel_and_gw_and_wait()
@@ -88,6 +92,24 @@ class TestIntegrationQolsysGateway(TestQolsysGatewayBase):
 
         self.assertTrue(panel.is_client_connected)
 
+    async def test_integration_gateway_stays_connected_on_invalid_event(self):
+        panel, gw = await self._init_panel_and_gw_and_wait()
+
+        await panel.writeline({
+            'event': 'ZONE_EVENT',
+            'zone_event_type': 'ZONE_ACTIVE',
+            'zone': {'status': 'Open'},
+        })
+
+        warning = await gw.wait_for_next_log(
+            timeout=self._TIMEOUT,
+            filters={'level': 'WARNING'},
+            match="^Rejected Qolsys event: Missing field 'zone.zone_id'",
+        )
+
+        self.assertIsNotNone(warning)
+        self.assertTrue(panel.is_client_connected)
+
     async def test_integration_gateway_publish_error_on_unknown_event_type(self):
         panel, gw = await self._init_panel_and_gw_and_wait()
 
@@ -117,3 +139,338 @@ class TestIntegrationQolsysGateway(TestQolsysGatewayBase):
             },
             attributes['payload'],
         )
+
+    async def test_integration_gateway_terminate_publishes_per_partition(self):
+        # Without a grace period configured, the entities are marked
+        # unavailable right away
+        panel, gw, _, _ = await self._ready_panel_and_gw()
+
+        gw.mqtt_publish_func.reset_mock()
+        await gw.terminate()
+        await asyncio.sleep(self._TIMEOUT)
+
+        topics = sorted(
+            c.args[0] for c in gw.mqtt_publish_func.call_args_list
+        )
+        self.assertEqual([
+            'homeassistant/alarm_control_panel/qolsys_panel/availability',
+            'homeassistant/alarm_control_panel/qolsys_panel/partition0/'
+            'availability',
+            'homeassistant/alarm_control_panel/qolsys_panel/partition1/'
+            'availability',
+        ], topics)
+
+    async def test_integration_gateway_terminate_drops_queued_discovery(self):
+        panel, gw, _, _ = await self._ready_panel_and_gw(
+            partition_ids=[0],
+            zone_ids=[10000],
+            reload_grace_period=0,
+        )
+
+        # Queue the discovery of all the entities, as when the mac address
+        # of the panel is resolved, and terminate before it is published
+        gw._updater.configure_all(gw._state)
+        gw.mqtt_publish_func.reset_mock()
+        await gw.terminate()
+        await asyncio.sleep(self._TIMEOUT)
+
+        topics = sorted(
+            c.args[0] for c in gw.mqtt_publish_func.call_args_list
+        )
+        self.assertEqual([
+            'homeassistant/alarm_control_panel/qolsys_panel/availability',
+            'homeassistant/alarm_control_panel/qolsys_panel/partition0/'
+            'availability',
+        ], topics)
+
+    async def test_integration_gateway_reload_publishes_dropped_discovery(self):
+        panel, gw1, entity_ids, _ = await self._ready_panel_and_gw(
+            partition_ids=[0],
+            zone_ids=[10000],
+            reload_grace_period=self._TIMEOUT * 5,
+        )
+
+        gw1._updater.configure_all(gw1._state)
+        await gw1.terminate()
+
+        # The configuration did not change, but the previous gateway did
+        # not publish the discovery it had queued, so the new one does
+        gw2 = QolsysGateway()
+        gw2.name = gw1.name
+        gw2.args = dict(gw1.args)
+        await gw2.initialize()
+
+        await gw2.wait_for_next_mqtt_publish(
+            timeout=self._TIMEOUT,
+            filters={'topic': 'homeassistant/binary_sensor/'
+                              f'{entity_ids[-1]}/config'},
+            raise_on_timeout=True,
+        )
+
+    async def test_integration_gateway_reload_keeps_panel_connection(self):
+        panel, gw1, _, _ = await self._ready_panel_and_gw(
+            partition_ids=[0],
+            zone_ids=[10000],
+            reload_grace_period=self._TIMEOUT * 5,
+        )
+
+        await gw1.terminate()
+        startpos = len(panel.MESSAGES.MESSAGES)
+
+        gw2 = QolsysGateway()
+        gw2.name = gw1.name
+        gw2.args = dict(gw1.args, panel_user_code='1234',
+                        code_arm_required=True)
+        await gw2.initialize()
+
+        # The connection to the panel was taken over, so there is no
+        # new INFO request
+        info = await panel.wait_for_next_message(
+            timeout=self._TIMEOUT,
+            filters={'action': 'INFO'},
+            startpos=startpos,
+        )
+        self.assertIsNone(info)
+
+        # Only the discovery of the partition is published again, as the
+        # changed key does not affect the state or the sensors
+        topics = [c.args[0] for c in gw2.mqtt_publish_func.call_args_list]
+        self.assertIn('homeassistant/alarm_control_panel/qolsys_panel/'
+                      'partition0/config', topics)
+        self.assertNotIn('homeassistant/alarm_control_panel/qolsys_panel/'
+                         'availability', topics)
+        self.assertFalse([t for t in topics
+                          if t.startswith('homeassistant/binary_sensor/')])
+
+        config = json.loads(next(
+            c.args[1] for c in gw2.mqtt_publish_func.call_args_list
+            if c.args[0] == 'homeassistant/alarm_control_panel/'
+                            'qolsys_panel/partition0/config'
+        ))
+        self.assertTrue(config['code_arm_required'])
+
+        # The events of the panel are now handled by the new gateway
+        await panel.writeline({
+            'event': 'ARMING',
+            'arming_type': 'ARM_STAY',
+            'partition_id': 0,
+            'version': 1,
+            'requestID': '<request_id>',
+        })
+
+        state = await gw2.wait_for_next_mqtt_publish(
+            timeout=self._TIMEOUT,
+            filters={'topic': 'homeassistant/alarm_control_panel/'
+                              'qolsys_panel/partition0/state'},
+            raise_on_timeout=True,
+        )
+        self.assertEqual('armed_home', state['payload'])
+
+    async def test_integration_gateway_reload_replays_parked_events(self):
+        panel, gw1, _, _ = await self._ready_panel_and_gw(
+            partition_ids=[0],
+            zone_ids=[10000],
+            reload_grace_period=self._TIMEOUT * 5,
+        )
+
+        await gw1.terminate()
+        gw1.mqtt_publish_func.reset_mock()
+
+        # The event is received while no gateway handles the panel events
+        await panel.writeline({
+            'event': 'ARMING',
+            'arming_type': 'ARM_STAY',
+            'partition_id': 0,
+            'version': 1,
+            'requestID': '<request_id>',
+        })
+        await asyncio.sleep(self._TIMEOUT)
+
+        # The terminated gateway did not handle it
+        gw1.mqtt_publish_func.assert_not_called()
+
+        gw2 = QolsysGateway()
+        gw2.name = gw1.name
+        gw2.args = dict(gw1.args)
+        await gw2.initialize()
+
+        state = await gw2.wait_for_next_mqtt_publish(
+            timeout=self._TIMEOUT,
+            filters={'topic': 'homeassistant/alarm_control_panel/'
+                              'qolsys_panel/partition0/state'},
+            raise_on_timeout=True,
+        )
+        self.assertEqual('armed_home', state['payload'])
+        gw1.mqtt_publish_func.assert_not_called()
+
+    async def test_integration_gateway_reload_resolves_mac_address(self):
+        resolve = mock.AsyncMock(return_value=None)
+        with mock.patch('qolsys.mac.QolsysMacResolver.resolve', resolve):
+            panel, gw1, _, _ = await self._ready_panel_and_gw(
+                partition_ids=[0],
+                zone_ids=[10000],
+                reload_grace_period=self._TIMEOUT * 5,
+            )
+            await gw1.terminate()
+
+            # The connection is taken over, so the new gateway resolves
+            # the mac address without waiting for a connection event
+            resolve.return_value = '01:12:76:ef:11:02'
+            gw2 = QolsysGateway()
+            gw2.name = gw1.name
+            gw2.args = dict(gw1.args)
+            await gw2.initialize()
+
+            await asyncio.sleep(self._TIMEOUT)
+
+        self.assertEqual(2, resolve.await_count)
+
+        config = await gw2.find_last_mqtt_publish(
+            filters={'topic': 'homeassistant/alarm_control_panel/'
+                              'qolsys_panel/partition0/config'},
+        )
+        self.assertIsNotNone(config)
+        self.assertEqual(
+            [['mac', '01:12:76:ef:11:02']],
+            json.loads(config['payload'])['device']['connections'],
+        )
+
+    async def test_integration_gateway_reload_not_taken_over_tears_down(self):
+        panel, gw, _, _ = await self._ready_panel_and_gw(
+            partition_ids=[0],
+            zone_ids=[10000],
+            reload_grace_period=self._TIMEOUT,
+        )
+
+        gw.mqtt_publish_func.reset_mock()
+        await gw.terminate()
+
+        # Nothing happens until the grace period expires
+        topics = [c.args[0] for c in gw.mqtt_publish_func.call_args_list]
+        self.assertNotIn('homeassistant/alarm_control_panel/qolsys_panel/'
+                         'availability', topics)
+
+        await gw.wait_for_next_mqtt_publish(
+            timeout=self._TIMEOUT * 5,
+            filters={'topic': 'homeassistant/alarm_control_panel/'
+                              'qolsys_panel/availability',
+                     'payload': 'offline'},
+            raise_on_timeout=True,
+        )
+
+    async def test_integration_gateway_startup_profile(self):
+        times = [
+            ('json', 100, 100),
+            ('qolsys.events', 500, 800),
+            ('gateway', 300, 2000),
+        ]
+
+        with mock.patch('gateway.import_times',
+                        mock.AsyncMock(return_value=times)), \
+                self.assertLogs('gateway', level='INFO') as logs:
+            panel, gw, _, _ = await self._ready_panel_and_gw(
+                partition_ids=[0],
+                zone_ids=[10000],
+                startup_profile=True,
+            )
+
+        messages = '\n'.join(logs.output)
+        for stage in ('warm_up', 'initialized', 'connected',
+                      'first_summary'):
+            self.assertIn(f'Startup profile: {stage} reached after', messages)
+        self.assertIn('Startup profile: import gateway took 2.0ms', messages)
+        self.assertIn('Startup profile: import qolsys.events took 0.8ms',
+                      messages)
+        self.assertNotIn('import json', messages)
+
+    async def test_integration_gateway_traces_panel_frames(self):
+        panel, gw, _, _ = await self._ready_panel_and_gw(
+            partition_ids=[0],
+            zone_ids=[10000],
+        )
+
+        await panel.writeline({
+            'event': 'ARMING',
+            'arming_type': 'ARM_STAY',
+            'partition_id': 0,
+            'version': 1,
+            'requestID': '<request_id>',
+        })
+
+        await gw.wait_for_next_mqtt_publish(
+            timeout=self._TIMEOUT,
+            filters={'topic': 'homeassistant/alarm_control_panel/'
+                              'qolsys_panel/partition0/state'},
+            raise_on_timeout=True,
+        )
+
+        metrics = gw.metrics
+        self.assertEqual(2, metrics.counter('frames'))
+        self.assertEqual(2, metrics.counter('events'))
+        self.assertGreater(metrics.counter('publishes'), 0)
+        self.assertFalse(metrics.pending)
+        for stage in ('decode', 'broker', 'mutate', 'notify', 'total'):
+            self.assertEqual(2, metrics.histogram(stage).count, stage)
+
+    async def test_integration_gateway_patches_mac_address_once_resolved(self):
+        resolve = mock.AsyncMock(return_value='01:12:76:ef:11:02')
+        with mock.patch('qolsys.mac.QolsysMacResolver.resolve', resolve):
+            panel, gw, _, _ = await self._ready_panel_and_gw(
+                partition_ids=[0],
+                zone_ids=[10000],
+            )
+
+            await asyncio.sleep(self._TIMEOUT)
+
+        config = await gw.find_last_mqtt_publish(
+            filters={'topic': 'homeassistant/alarm_control_panel/'
+                              'qolsys_panel/partition0/config'},
+        )
+
+        resolve.assert_awaited_once_with()
+        self.assertIsNotNone(config)
+        self.assertEqual(
+            [['mac', '01:12:76:ef:11:02']],
+            json.loads(config['payload'])['device']['connections'],
+        )
+
+    async def test_integration_gateway_no_diagnostics_by_default(self):
+        panel, gw = await self._init_panel_and_gw_and_wait()
+
+        config = await gw.find_last_mqtt_publish(
+            filters={'topic': 'homeassistant/sensor/'
+                              'qolsys_panel_events_per_second/config'},
+        )
+        self.assertIsNone(config)
+
+    async def test_integration_gateway_configures_diagnostics_on_connection(self):
+        panel, gw = await self._init_panel_and_gw_and_wait(
+            diagnostics_interval=60,
+        )
+
+        config = await gw.find_last_mqtt_publish(
+            filters={'topic': 'homeassistant/sensor/'
+                              'qolsys_panel_events_per_second/config'},
+        )
+        self.assertIsNotNone(config)
+        self.assertJsonSubDictEqual(
+            {
+                'entity_category': 'diagnostic',
+                'state_topic': 'homeassistant/sensor/'
+                               'qolsys_panel_diagnostics/state',
+            },
+            config['payload'],
+        )
+
+        state = await gw.find_last_mqtt_publish(
+            filters={'topic': 'homeassistant/sensor/'
+                              'qolsys_panel_diagnostics/state'},
+        )
+        self.assertIsNotNone(state)
+        self.assertJsonSubDictEqual(
+            {
+                'reconnects': 0,
+                'decode_failures': 0,
+            },
+            state['payload'],
+        )
@@ -1,7 +1,19 @@
 import json
+import os
+import tempfile
+
+from unittest import mock
 
 import testenv  # noqa: F401
 from testbase import TestQolsysGatewayBase
+from testutils.fixtures_data import get_summary
+
+from qolsys.events import QolsysEvent
+from qolsys.exceptions import InvalidUserCodeException
+from qolsys.exceptions import QolsysControlTimeoutException
+from qolsys.exceptions import UnknownQolsysPartitionException
+from qolsys.snapshot import QolsysStateSnapshot
+from qolsys.state import QolsysState
 
 
 class TestIntegrationQolsysGatewayControl(TestQolsysGatewayBase):
@@ -38,7 +50,7 @@ class TestIntegrationQolsysGatewayControl(TestQolsysGatewayBase):
                                    secure_arm=False, panel_user_code=None,
                                    user_control_token=None, expect_bypass=None,
                                    send_delay=None, send_bypass=None,
-                                   **kwargs):
+                                   send_partition_id=0, **kwargs):
         panel, gw, _, _ = await self._ready_panel_and_gw(
             partition_ids=[0],
             zone_ids=[10000],
@@ -55,7 +67,7 @@ class TestIntegrationQolsysGatewayControl(TestQolsysGatewayBase):
 
         control = {
             'action': control_action,
-            'partition_id': 0,
+            'partition_id': send_partition_id,
             'session_token': session_token,
         }
         if send_code:
@@ -246,6 +258,59 @@ class TestIntegrationQolsysGatewayControl(TestQolsysGatewayBase):
                          'a configured panel code',
         )
 
+    async def test_integration_control_arm_away_secure_arm_without_code_partition_id_str(self):
+        await self._test_control_arming(
+            secure_arm=True,
+            control_action='ARM_AWAY',
+            partition_status='DISARM',
+            arming_type='ARM_AWAY',
+            send_partition_id='0',
+            expect_error='^Cannot perform action without '
+                         'a configured panel code',
+        )
+
+    async def test_integration_control_arm_away_partition_id_str(self):
+        await self._test_control_arming(
+            control_action='ARM_AWAY',
+            partition_status='DISARM',
+            arming_type='ARM_AWAY',
+            send_partition_id='0',
+        )
+
+    async def test_integration_control_secure_arm_from_restored_snapshot(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, 'state.json')
+            summary = get_summary(secure_arm=True, partition_ids=[0],
+                                  zone_ids=[10000])
+            await QolsysStateSnapshot(
+                QolsysState(QolsysEvent.from_json(summary.event)),
+                path,
+            ).save()
+
+            # The panel does not send its summary, so the secure arm of the
+            # partition only comes from the snapshot
+            panel, gw = await self._init_panel_and_gw_and_wait(
+                state_snapshot_path=path,
+            )
+
+            gw.mqtt_publish(
+                'homeassistant/alarm_control_panel/qolsys_panel/set',
+                json.dumps({
+                    'action': 'ARM_AWAY',
+                    'partition_id': 0,
+                    'session_token': gw._session_token,
+                }),
+                namespace='mqtt',
+            )
+
+            error = await gw.wait_for_next_log(
+                timeout=self._TIMEOUT,
+                filters={'level': 'ERROR'},
+                match='^Cannot perform action without '
+                      'a configured panel code',
+            )
+            self.assertIsNotNone(error)
+
     async def test_integration_control_arm_away_bypass_true_if_configured(self):
         await self._test_control_arming(
             control_action='ARM_AWAY',
@@ -489,3 +554,193 @@ class TestIntegrationQolsysGatewayControl(TestQolsysGatewayBase):
             control_action='TRIGGER_AUXILIARY',
             alarm_type='AUXILIARY',
         )
+
+    async def test_integration_api_arm_away(self):
+        panel, gw, _, _ = await self._ready_panel_and_gw(
+            partition_ids=[0],
+            zone_ids=[10000],
+        )
+
+        # The control returns once acknowledged by the panel, so the
+        # message is already received when we start waiting for it
+        startpos = len(panel.MESSAGES.MESSAGES)
+        await gw.arm_away(0, delay=5, bypass=True)
+
+        action = await panel.wait_for_next_message(
+            timeout=self._TIMEOUT,
+            startpos=startpos,
+            filters={'action': 'ARMING'},
+        )
+
+        self.assertIsNotNone(action)
+        self.assertEqual('ARM_AWAY', action['arming_type'])
+        self.assertEqual(0, action['partition_id'])
+        self.assertEqual(5, action['delay'])
+        self.assertEqual('true', action['bypass'])
+        self.assertEqual(gw.args['panel_token'], action['token'])
+
+    async def test_integration_api_trigger(self):
+        panel, gw, _, _ = await self._ready_panel_and_gw(
+            partition_ids=[0],
+            zone_ids=[10000],
+        )
+
+        # The control returns once acknowledged by the panel, so the
+        # message is already received when we start waiting for it
+        startpos = len(panel.MESSAGES.MESSAGES)
+        await gw.trigger(0, alarm_type='FIRE')
+
+        action = await panel.wait_for_next_message(
+            timeout=self._TIMEOUT,
+            startpos=startpos,
+            filters={'action': 'ALARM'},
+        )
+
+        self.assertIsNotNone(action)
+        self.assertEqual('FIRE', action['alarm_type'])
+        self.assertEqual(0, action['partition_id'])
+
+    async def test_integration_api_disarm_with_invalid_code(self):
+        panel, gw, _, _ = await self._ready_panel_and_gw(
+            partition_ids=[0],
+            zone_ids=[10000],
+            partition_status={0: 'ARM_AWAY'},
+            panel_user_code='1337',
+            code_disarm_required=True,
+            ha_check_user_code=False,
+        )
+
+        with self.assertRaises(InvalidUserCodeException):
+            await gw.disarm(0, code='4242')
+
+        action = await panel.wait_for_next_message(
+            timeout=self._TIMEOUT,
+            filters={'action': 'ARMING'},
+        )
+        self.assertIsNone(action)
+
+    async def test_integration_api_unknown_partition(self):
+        panel, gw, _, _ = await self._ready_panel_and_gw(
+            partition_ids=[0],
+            zone_ids=[10000],
+        )
+
+        with self.assertRaises(UnknownQolsysPartitionException):
+            await gw.arm_stay(1)
+
+    async def test_integration_api_times_out_without_ack(self):
+        panel, gw, _, _ = await self._ready_panel_and_gw(
+            partition_ids=[0],
+            zone_ids=[10000],
+            panel_ack_timeout=self._TIMEOUT,
+        )
+
+        with mock.patch.object(gw._qolsys_socket, '_acknowledged'):
+            with self.assertRaises(QolsysControlTimeoutException):
+                await gw.arm_stay(0)
+
+    async def test_integration_api_acked_after_timed_out_command(self):
+        panel, gw, _, _ = await self._ready_panel_and_gw(
+            partition_ids=[0],
+            zone_ids=[10000],
+            panel_ack_timeout=self._TIMEOUT,
+        )
+
+        with mock.patch.object(gw._qolsys_socket, '_acknowledged'):
+            with self.assertRaises(QolsysControlTimeoutException):
+                await gw.arm_stay(0)
+
+        # The timed out command must not take the ACK of the next one
+        await gw.arm_away(0)
+        self.assertEqual(0, len(gw._qolsys_socket._acks))
+
+    async def test_integration_control_duplicates_sent_once(self):
+        panel, gw, _, _ = await self._ready_panel_and_gw(
+            partition_ids=[0],
+            zone_ids=[10000],
+        )
+
+        control = json.dumps({
+            'action': 'ARM_AWAY',
+            'partition_id': 0,
+            'session_token': gw._session_token,
+        })
+
+        for _ in range(3):
+            gw.mqtt_publish(
+                'homeassistant/alarm_control_panel/qolsys_panel/set',
+                control,
+                namespace='mqtt',
+            )
+
+        action, pos = await panel.wait_for_next_message(
+            timeout=self._TIMEOUT,
+            filters={'action': 'ARMING'},
+            returnpos=True,
+        )
+        self.assertIsNotNone(action)
+        self.assertEqual('ARM_AWAY', action['arming_type'])
+
+        action = await panel.wait_for_next_message(
+            timeout=self._TIMEOUT,
+            filters={'action': 'ARMING'},
+            startpos=pos,
+        )
+        self.assertIsNone(action)
+
+    async def test_integration_api_skips_satisfied_control(self):
+        panel, gw, _, _ = await self._ready_panel_and_gw(
+            partition_ids=[0],
+            zone_ids=[10000],
+            partition_status={0: 'ARM_STAY'},
+        )
+
+        startpos = len(panel.MESSAGES.MESSAGES)
+        await gw.arm_stay(0)
+
+        action = await panel.wait_for_next_message(
+            timeout=self._TIMEOUT,
+            filters={'action': 'ARMING'},
+            startpos=startpos,
+        )
+        self.assertIsNone(action)
+
+    async def test_integration_api_skips_disarm_when_disarmed(self):
+        panel, gw, _, _ = await self._ready_panel_and_gw(
+            partition_ids=[0],
+            zone_ids=[10000],
+            partition_status={0: 'DISARM'},
+        )
+
+        startpos = len(panel.MESSAGES.MESSAGES)
+        self.assertFalse(await gw.disarm(0, code='4242'))
+
+        action = await panel.wait_for_next_message(
+            timeout=self._TIMEOUT,
+            filters={'action': 'ARMING'},
+            startpos=startpos,
+        )
+        self.assertIsNone(action)
+
+    async def test_integration_api_alternating_controls_all_sent(self):
+        panel, gw, _, _ = await self._ready_panel_and_gw(
+            partition_ids=[0],
+            zone_ids=[10000],
+            partition_status={0: 'ARM_STAY'},
+            control_dedup_window=10,
+        )
+
+        # Sending a different command for the partition ends the window
+        # of the previous one, so it can be sent again right away
+        startpos = len(panel.MESSAGES.MESSAGES)
+        self.assertTrue(await gw.disarm(0, code='4242'))
+        self.assertTrue(await gw.arm_away(0))
+        self.assertTrue(await gw.disarm(0, code='4242'))
+        self.assertFalse(await gw.disarm(0, code='4242'))
+
+        arming_types = [
+            message['arming_type']
+            for message in panel.MESSAGES.MESSAGES[startpos:]
+            if message.get('action') == 'ARMING'
+        ]
+        self.assertEqual(['DISARM', 'ARM_AWAY', 'DISARM'], arming_types)
@@ -0,0 +1,135 @@
+import asyncio
+
+import testenv  # noqa: F401
+from testbase import TestQolsysGatewayBase
+from testutils.load_generator import PanelLoadGenerator
+from testutils.mock_panel import PanelServer
+from testutils.mqtt_broker import MockMqttBroker
+from testutils.synthetic_panel import SyntheticPanel
+
+from gateway import QolsysGateway
+from mqtt.utils import normalize_name_to_id
+
+
+class TestIntegrationQolsysGatewayLoad(TestQolsysGatewayBase):
+
+    async def _init_generator_and_gw(self, broker=None, **kwargs):
+        panel = PanelServer(ack_latency=.01, ack_jitter=.01)
+        await panel.start()
+
+        synthetic = SyntheticPanel(partitions=2, zones_per_partition=16,
+                                   seed=1)
+        generator = PanelLoadGenerator(panel, synthetic, seed=1, **kwargs)
+
+        gw = QolsysGateway()
+        gw.broker = broker
+        gw.args = {
+            'panel_host': 'localhost',
+            'panel_port': panel.port,
+            'panel_token': '<panel_token>',
+            'panel_mac': 'aa:bb:cc:dd:ee:ff',
+        }
+        await gw.initialize()
+
+        # The generator answers the INFO request with the SUMMARY
+        await panel.wait_for_client(timeout=self._TIMEOUT * 10,
+                                    raise_if_timeout=True)
+        for _ in range(100):
+            if len(gw._state.partitions) == 2:
+                break
+            await asyncio.sleep(self._TIMEOUT / 10)
+
+        return panel, synthetic, generator, gw
+
+    async def _assert_state_converges(self, synthetic, gw):
+        def expected():
+            return {
+                zone_id: synthetic.zone(zone_id)['status']
+                for zone_id in synthetic.zone_ids
+            }, {
+                partition_id: str(partition['status'])
+                for partition_id, partition in synthetic._partitions.items()
+            }
+
+        def actual():
+            return {
+                sensor.zone_id: sensor.status
+                for partition in gw._state.partitions
+                for sensor in partition.sensors
+            }, {
+                partition.id: str(partition.status)
+                for partition in gw._state.partitions
+            }
+
+        for _ in range(100):
+            if actual() == expected():
+                break
+            await asyncio.sleep(self._TIMEOUT / 10)
+
+        self.assertEqual(expected(), actual())
+
+    async def test_integration_load_events_mix(self):
+        panel, synthetic, generator, gw = await self._init_generator_and_gw(
+            rate=1000,
+            pattern='burst',
+            burst_size=20,
+            partial_frames=.2,
+        )
+
+        stats = await generator.run(events=300)
+
+        self.assertEqual(300, stats['events'])
+        self.assertGreater(stats['partial_frames'], 0)
+        self.assertGreater(stats['ZONE_ACTIVE'], stats['ARMING'])
+
+        await self._assert_state_converges(synthetic, gw)
+        self.assertEqual(0, gw.metrics.counter('decode_failures'))
+
+    async def test_integration_load_disconnects(self):
+        panel, synthetic, generator, gw = await self._init_generator_and_gw(
+            rate=500,
+            pattern='poisson',
+            disconnect_interval=.1,
+        )
+
+        stats = await generator.run(duration=.5)
+
+        self.assertGreaterEqual(stats['disconnects'], 2)
+
+        # The gateway asks again for the SUMMARY when reconnecting, which
+        # brings it back in sync with the panel
+        await self._assert_state_converges(synthetic, gw)
+        self.assertEqual(stats['disconnects'],
+                         gw.metrics.counter('reconnects'))
+
+    async def test_integration_load_slow_broker(self):
+        broker = MockMqttBroker(latency=.001, max_rate=5000)
+        panel, synthetic, generator, gw = await self._init_generator_and_gw(
+            broker=broker,
+            rate=500,
+            pattern='burst',
+        )
+
+        stats = await generator.run(events=100)
+        self.assertEqual(100, stats['events'])
+
+        # The events go through the broker before being applied, so the
+        # state still converges, only later
+        await self._assert_state_converges(synthetic, gw)
+        self.assertEqual(0, gw.metrics.counter('decode_failures'))
+
+        # The discovery of each entity stays retained on the broker
+        for zone_id in synthetic.zone_ids:
+            name = normalize_name_to_id(synthetic.zone(zone_id)['name'])
+            self.assertIn(f'homeassistant/binary_sensor/{name}/config',
+                          broker.retained)
+        for partition_id in synthetic.partition_ids:
+            self.assertIn(f'homeassistant/alarm_control_panel/qolsys_panel/'
+                          f'partition{partition_id}/config', broker.retained)
+
+        # And everything the gateway published reaches the broker
+        for _ in range(100):
+            if broker.total_messages == len(gw.PUBLISHED.MESSAGES):
+                break
+            await asyncio.sleep(self._TIMEOUT / 10)
+        self.assertEqual(len(gw.PUBLISHED.MESSAGES), broker.total_messages)
@@ -130,6 +130,8 @@ class TestIntegrationQolsysEvents(TestQolsysGatewayBase):
         state = sensor_state
 
         mqtt_prefix = f'homeassistant/binary_sensor/{sensor_flat_name}'
+        partition_prefix = ('homeassistant/alarm_control_panel/qolsys_panel/'
+                            f'partition{state.partition_id}')
 
         with self.subTest(msg=f'MQTT config of sensor {state.zone_id} is correct'):
             mqtt_config = await gw.find_last_mqtt_publish(
@@ -155,7 +157,7 @@ class TestIntegrationQolsysEvents(TestQolsysGatewayBase):
                             'payload_not_available': 'offline',
                         },
                         {
-                            'topic': f'{mqtt_prefix}/availability',
+                            'topic': f'{partition_prefix}/availability',
                             'payload_available': 'online',
                             'payload_not_available': 'offline',
                         },
@@ -175,12 +177,18 @@ class TestIntegrationQolsysEvents(TestQolsysGatewayBase):
 
         with self.subTest(msg=f'MQTT availability of sensor {state.zone_id} is correct'):
             mqtt_availability = await gw.find_last_mqtt_publish(
-                filters={'topic': f'{mqtt_prefix}/availability'},
+                filters={'topic': f'{partition_prefix}/availability'},
             )
 
             self.assertIsNotNone(mqtt_availability)
             self.assertEqual('online', mqtt_availability['payload'])
 
+            mqtt_availability = await gw.find_last_mqtt_publish(
+                filters={'topic': f'{mqtt_prefix}/availability'},
+            )
+
+            self.assertIsNone(mqtt_availability)
+
         with self.subTest(msg=f'MQTT state of sensor {state.zone_id} is correct'):
             mqtt_state = await gw.find_last_mqtt_publish(
                 filters={'topic': f'{mqtt_prefix}/state'},
@@ -222,8 +230,11 @@ class TestIntegrationQolsysEvents(TestQolsysGatewayBase):
                     retain=mock.ANY,
                 ))
 
+        # Sensors depend on the availability of their partition, and do
+        # not publish their own availability
+        sensor_topics = [t for t in topics if t != 'availability']
         for entity_id in entity_ids:
-            for topic in topics:
+            for topic in sensor_topics:
                 mqtt_publish_calls.append(mock.call(
                     f'homeassistant/binary_sensor/{entity_id}/{topic}',
                     mock.ANY,
@@ -1345,13 +1356,6 @@ class TestIntegrationQolsysEvents(TestQolsysGatewayBase):
                               'my_motion/config'},
         )
 
-        availability = await gw.wait_for_next_mqtt_publish(
-            timeout=self._TIMEOUT,
-            filters={'topic': 'homeassistant/binary_sensor/'
-                              'my_motion/availability'},
-            continued=True,
-        )
-
         state = await gw.wait_for_next_mqtt_publish(
             timeout=self._TIMEOUT,
             filters={'topic': 'homeassistant/binary_sensor/'
@@ -1387,8 +1391,8 @@ class TestIntegrationQolsysEvents(TestQolsysGatewayBase):
                             'payload_not_available': 'offline',
                         },
                         {
-                            'topic': 'homeassistant/binary_sensor/'
-                                     'my_motion/availability',
+                            'topic': 'homeassistant/alarm_control_panel/'
+                                     'qolsys_panel/partition0/availability',
                             'payload_available': 'online',
                             'payload_not_available': 'offline',
                         },
@@ -1406,10 +1410,6 @@ class TestIntegrationQolsysEvents(TestQolsysGatewayBase):
                 config['payload'],
             )
 
-        with self.subTest(msg='Check MQTT availability of new sensor'):
-            self.assertIsNotNone(availability)
-            self.assertEqual('online', availability['payload'])
-
         with self.subTest(msg='Check MQTT state of new sensor'):
             self.assertIsNotNone(state)
             self.assertEqual('Closed', state['payload'])
@@ -1664,6 +1664,48 @@ class TestIntegrationQolsysEvents(TestQolsysGatewayBase):
             alarm_type='AUXILIARY',
         )
 
+    async def test_integration_event_alarm_publishes_attributes_once(self):
+        panel, gw, _, _ = await self._ready_panel_and_gw(
+            partition_ids=[0],
+            zone_ids=[10000],
+            partition_status={0: 'ALARM'},
+        )
+        attributes_topic = ('homeassistant/alarm_control_panel/'
+                            'qolsys_panel/partition0/attributes')
+
+        for alarm_type in ('FIRE', 'POLICE'):
+            gw.mqtt_publish_func.reset_mock()
+
+            await panel.writeline({
+                'event': 'ALARM',
+                'alarm_type': alarm_type,
+                'partition_id': 0,
+                'version': 1,
+                'requestID': '<request_id>',
+            })
+
+            published_attrs = await gw.wait_for_next_mqtt_publish(
+                timeout=self._TIMEOUT,
+                filters={'topic': attributes_topic},
+            )
+
+        # Resetting the alarm type when the status is set and then setting
+        # the new alarm type happen in the same batch, so we only publish
+        # the final attributes
+        self.assertIsNotNone(published_attrs)
+        self.assertJsonSubDictEqual(
+            {'alarm_type': 'POLICE'},
+            published_attrs['payload'],
+        )
+
+        attributes_calls = [
+            c for c in gw.mqtt_publish_func.call_args_list
+            if c.args[0] == attributes_topic
+        ]
+        self.assertEqual(1, len(attributes_calls))
+
+        self.assertTrue(panel.is_client_connected)
+
     async def _test_integration_event_error(self, error_type, error_desc,
                                             extra_expect=None, init_data=None):
         if init_data:
@@ -91,9 +91,11 @@ class TestQolsysGatewayBase(unittest.IsolatedAsyncioTestCase):
 
         # We need to wait for the whole side effects to finish happening,
         # before we can check the final result; we check that by waiting
-        # for the last entity's last topic to be published
+        # for the last entity's last topic to be published; the discovery
+        # is published in the background, so it might take a few iterations
+        # of the event loop
         await gw.wait_for_next_mqtt_publish(
-            timeout=self._TIMEOUT,
+            timeout=self._TIMEOUT * 10,
             filters={'topic': summary.last_topic},
         )
 
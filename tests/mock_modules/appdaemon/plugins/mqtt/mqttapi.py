@@ -80,6 +80,11 @@ class Mqtt(ADBase, ADAPI):
 
         self.mqtt_publish_func = mock.Mock(name='mqtt_publish')
 
+        # An optional testutils.mqtt_broker.MockMqttBroker through which
+        # the messages are published, to model the broker and account for
+        # what is published
+        self.broker = None
+
     @sync_wrapper
     async def listen_event(self, callback, event=None, **kwargs):
         listen_event = deepcopy(kwargs)
@@ -106,6 +111,9 @@ class Mqtt(ADBase, ADAPI):
         # In case we want to follow the logs of what happens in our mock
         LOGGER.debug(f'publishing: topic={topic} payload={payload} kwargs={kwargs}')
 
+        if self.broker is not None:
+            await self.broker.publish(topic, payload, **kwargs)
+
         # Let's go through the LISTEN_EVENT data and check if we have
         # any LISTEN_EVENT with MQTT_MESSAGE as event, for the same topic,
         # and in which case we can call the callback
@@ -1,6 +1,48 @@
 from types import SimpleNamespace
 
 
+_ZONE_GROUPS = {
+    'Door_Window': 'entryexitdelay',
+    'Motion': 'safetymotion',
+}
+
+
+def get_zones_summary(status='DISARM', sensor_status='Closed',
+                      zones=(10000, ), zone_types=None):
+    """Return a SUMMARY event with a single partition and a sensor per
+    zone id, of the type given in zone_types, or a door by default."""
+    zone_types = zone_types or {}
+    return {
+        'event': 'INFO',
+        'info_type': 'SUMMARY',
+        'partition_list': [
+            {
+                'partition_id': 0,
+                'name': 'partition0',
+                'status': status,
+                'secure_arm': False,
+                'zone_list': [
+                    {
+                        'id': f'001-{zone_id - 10000:04d}',
+                        'type': zone_types.get(zone_id, 'Door_Window'),
+                        'name': f'My Sensor {zone_id}',
+                        'group': _ZONE_GROUPS[
+                            zone_types.get(zone_id, 'Door_Window')],
+                        'status': sensor_status,
+                        'state': '0',
+                        'zone_id': zone_id,
+                        'zone_type': 1,
+                        'zone_physical_type': 1,
+                        'zone_alarm_type': 3,
+                        'partition_id': 0,
+                    }
+                    for zone_id in zones
+                ],
+            },
+        ],
+    }
+
+
 def get_summary(secure_arm=False, partition_ids=None,
                 zone_ids=None, partition_status=None):
     if partition_status is None:
@@ -370,8 +412,13 @@ def get_summary(secure_arm=False, partition_ids=None,
         'attributes',
     ]
 
+    # The topics of the sensors do not use the panel unique id prefix
+    prefix = 'qolsys_panel_'
+    last_entity_id = entity_ids[-1]
+    if last_entity_id.startswith(prefix):
+        last_entity_id = last_entity_id[len(prefix):]
     last_topic = (f'homeassistant/binary_sensor/'
-                  f'{entity_ids[-1]}/{topics[-1]}')
+                  f'{last_entity_id}/{topics[-1]}')
 
     return SimpleNamespace(
         event=event,
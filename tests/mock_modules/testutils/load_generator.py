@@ -0,0 +1,269 @@
+"""Load generator for the mock Qolsys Panel.
+
+Serves a synthetic panel on a local port and sends it a stream of events
+to stress the gateway connected to it, e.g. from tests/mock_modules:
+
+    python -m testutils.load_generator --port 12345 --rate 200 \\
+        --duration 60 --pattern poisson --partial-frames 0.05 \\
+        --disconnect-interval 30 --ack-latency 0.2
+
+The gateway needs to be configured with the host and port of the
+generator; the token is not checked.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import random
+import time
+
+from collections import Counter
+
+from testutils.mock_panel import PanelServer
+from testutils.synthetic_panel import SyntheticPanel
+
+
+LOGGER = logging.getLogger(__name__)
+
+
+DEFAULT_MIX = {
+    'ZONE_ACTIVE': 90,
+    'ZONE_UPDATE': 4,
+    'ARMING': 4,
+    'ALARM': 1,
+    'SUMMARY': 1,
+}
+
+PATTERNS = ('constant', 'poisson', 'burst')
+
+ARMING_TYPES = ('ARM_STAY', 'ARM_AWAY', 'DISARM')
+ALARM_TYPES = ('POLICE', 'FIRE', 'AUXILIARY')
+
+
+class PanelLoadGenerator(object):
+    """Send a stream of events of a synthetic panel through a PanelServer.
+
+    Events are drawn from ``mix``, a dict of the relative weights of each
+    event type, and sent at ``rate`` events per second on average, either
+    at a constant rate, following a Poisson process, or in bursts of
+    ``burst_size`` events. The generator can also split a ratio of the
+    frames in several writes (``partial_frames``), and close the connection
+    every ``disconnect_interval`` seconds. As the real panel, it answers
+    the INFO requests of the gateway with a SUMMARY.
+    """
+
+    def __init__(self, server: PanelServer, panel: SyntheticPanel,
+                 rate: float = 10, mix: dict = None,
+                 pattern: str = 'poisson', burst_size: int = 10,
+                 partial_frames: float = 0,
+                 disconnect_interval: float = None, seed: int = 0):
+        if rate <= 0:
+            raise ValueError('The rate must be positive')
+        if pattern not in PATTERNS:
+            raise ValueError(f"Unknown pattern '{pattern}', must be one "
+                             f"of {', '.join(PATTERNS)}")
+
+        mix = mix or DEFAULT_MIX
+        unknown = set(mix) - set(DEFAULT_MIX)
+        if unknown:
+            raise ValueError('Unknown event types: '
+                             f"{', '.join(sorted(unknown))}")
+
+        self._server = server
+        self._panel = panel
+        self._rate = rate
+        self._types = list(mix)
+        self._weights = [mix[t] for t in self._types]
+        self._pattern = pattern
+        self._burst_size = burst_size
+        self._partial_frames = partial_frames
+        self._disconnect_interval = disconnect_interval
+        self._random = random.Random(seed)
+
+        self.stats = Counter()
+
+        server.add_message_handler(self._on_message)
+
+    def _on_message(self, message: dict):
+        if message.get('action') == 'INFO':
+            asyncio.ensure_future(
+                self._send('SUMMARY', self._panel.summary()))
+
+    def _event(self, event_type: str):
+        panel = self._panel
+
+        if event_type == 'ZONE_ACTIVE':
+            return panel.zone_active(panel.random_zone_id())
+
+        if event_type == 'ZONE_UPDATE':
+            return panel.zone_update(panel.random_zone_id(active=False))
+
+        if event_type == 'ARMING':
+            return panel.arming(panel.random_partition_id(),
+                                self._random.choice(ARMING_TYPES))
+
+        if event_type == 'ALARM':
+            return panel.alarm(panel.random_partition_id(),
+                               self._random.choice(ALARM_TYPES))
+
+        return panel.summary()
+
+    def _delays(self):
+        """Yield the delays between two events."""
+        while True:
+            if self._pattern == 'constant':
+                yield 1 / self._rate
+            elif self._pattern == 'poisson':
+                yield self._random.expovariate(self._rate)
+            else:
+                yield self._burst_size / self._rate
+                for _ in range(self._burst_size - 1):
+                    yield 0
+
+    async def _send(self, event_type: str, event: dict):
+        if not self._server.is_client_connected:
+            self.stats['dropped'] += 1
+            return False
+
+        line = json.dumps(event)
+        try:
+            if self._partial_frames and \
+                    self._random.random() < self._partial_frames:
+                await self._server.write_partial(
+                    line, pieces=self._random.randint(2, 4), delay=.001)
+                self.stats['partial_frames'] += 1
+            else:
+                await self._server.writeline(line)
+        except (AttributeError, ConnectionError):
+            # The client disconnected while we were writing
+            self.stats['dropped'] += 1
+            return False
+
+        self.stats[event_type] += 1
+        self.stats['bytes'] += len(line) + 1
+        return True
+
+    async def run(self, duration: float = None, events: int = None,
+                  client_timeout: float = 30):
+        """Send events until the duration elapsed or the number of events
+        were sent, whichever comes first, and return the statistics of what
+        was sent."""
+        if duration is None and events is None:
+            raise ValueError('Either the duration or the number of events '
+                             'must be set')
+
+        started_at = time.monotonic()
+        next_at = started_at
+        next_disconnect_at = started_at + (self._disconnect_interval or 0)
+
+        sent = 0
+        for delay in self._delays():
+            if events is not None and sent >= events:
+                break
+
+            # Follow the schedule from the start, so that the time spent
+            # sending the events does not lower the rate
+            next_at += delay
+            if duration is not None and next_at - started_at > duration:
+                break
+            await asyncio.sleep(max(0, next_at - time.monotonic()))
+
+            if self._disconnect_interval and \
+                    time.monotonic() >= next_disconnect_at:
+                await self._server.disconnect()
+                self.stats['disconnects'] += 1
+                await self._server.wait_for_client(timeout=client_timeout)
+
+                # The events that would have been sent while disconnected
+                # are lost, instead of being sent all at once afterwards
+                next_at = time.monotonic()
+                next_disconnect_at = next_at + self._disconnect_interval
+
+            event_type = self._random.choices(self._types,
+                                              self._weights)[0]
+            if await self._send(event_type, self._event(event_type)):
+                self.stats['events'] += 1
+            sent += 1
+
+        self.stats['duration'] = time.monotonic() - started_at
+        return dict(self.stats)
+
+
+def parse_mix(value: str):
+    mix = {}
+    for item in value.split(','):
+        event_type, _, weight = item.partition('=')
+        mix[event_type.strip().upper()] = float(weight or 1)
+    return mix
+
+
+async def run(args):
+    server = PanelServer(ack_latency=args.ack_latency,
+                         ack_jitter=args.ack_jitter)
+    listener = await server.start(port=args.port)
+    print(f'Mock panel listening on localhost:{server.port}', flush=True)
+
+    panel = SyntheticPanel(partitions=args.partitions,
+                           zones_per_partition=args.zones, seed=args.seed)
+    generator = PanelLoadGenerator(
+        server, panel,
+        rate=args.rate,
+        mix=args.mix,
+        pattern=args.pattern,
+        burst_size=args.burst_size,
+        partial_frames=args.partial_frames,
+        disconnect_interval=args.disconnect_interval,
+        seed=args.seed,
+    )
+
+    await server.wait_for_client()
+    # Give the gateway the time to ask for the SUMMARY first
+    await asyncio.sleep(1)
+
+    stats = await generator.run(duration=args.duration, events=args.events)
+    print(json.dumps(stats, indent=2, sort_keys=True))
+
+    await server.disconnect()
+    listener.close()
+    await listener.wait_closed()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description='Send a stream of events of a synthetic Qolsys Panel '
+                    'to the gateway connected to it')
+    parser.add_argument('--port', type=int, default=12345)
+    parser.add_argument('--partitions', type=int, default=1)
+    parser.add_argument('--zones', type=int, default=32,
+                        help='number of zones per partition')
+    parser.add_argument('--rate', type=float, default=10,
+                        help='average number of events per second')
+    parser.add_argument('--duration', type=float, default=None,
+                        help='number of seconds to send events for')
+    parser.add_argument('--events', type=int, default=None,
+                        help='number of events to send')
+    parser.add_argument('--mix', type=parse_mix, default=None,
+                        help='relative weights of the event types, e.g. '
+                             'ZONE_ACTIVE=90,ARMING=10')
+    parser.add_argument('--pattern', choices=PATTERNS, default='poisson')
+    parser.add_argument('--burst-size', type=int, default=10)
+    parser.add_argument('--partial-frames', type=float, default=0,
+                        help='ratio of the frames to split in several writes')
+    parser.add_argument('--disconnect-interval', type=float, default=None,
+                        help='number of seconds between two disconnections')
+    parser.add_argument('--ack-latency', type=float, default=0,
+                        help='seconds before acknowledging a command')
+    parser.add_argument('--ack-jitter', type=float, default=0,
+                        help='maximum random seconds added to the latency')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+
+    if args.duration is None and args.events is None:
+        parser.error('one of --duration or --events is required')
+
+    logging.basicConfig(level=logging.WARNING)
+    asyncio.run(run(args))
+
+
+if __name__ == '__main__':
+    main()
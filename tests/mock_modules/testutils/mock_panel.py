@@ -2,6 +2,7 @@ import asyncio
 import json
 import logging
 import os.path
+import random
 import socket
 import ssl
 import time
@@ -15,8 +16,15 @@ CERTS_DIR = os.path.join(os.path.dirname(__file__), 'certs')
 
 class PanelServer(object):
 
-    def __init__(self):
+    def __init__(self, ack_latency=0, ack_jitter=0):
         self.MESSAGES = MessageStorage(name='message')
+
+        # The panel takes some time to acknowledge the commands, which can
+        # be simulated with a fixed latency and a random jitter on top
+        self._ack_latency = ack_latency
+        self._ack_jitter = ack_jitter
+
+        self._message_handlers = []
         self.stop()
 
     async def start(self, port=0):
@@ -63,6 +71,38 @@ class PanelServer(object):
         self._writer.write(f'{line}\n'.encode())
         await self._writer.drain()
 
+    async def write_partial(self, line, pieces=2, delay=0):
+        """Write the line in several pieces, as the panel might do when the
+        frame is split over multiple TCP segments."""
+        if not isinstance(line, str):
+            line = json.dumps(line)
+
+        data = f'{line}\n'.encode()
+        size = max(1, -(-len(data) // pieces))
+        for i in range(0, len(data), size):
+            if i:
+                await asyncio.sleep(delay)
+            self._writer.write(data[i:i + size])
+            await self._writer.drain()
+
+    async def disconnect(self):
+        """Close the connection with the client, which can then connect
+        again."""
+        writer, self._writer = self._writer, None
+        self._client_connected = False
+
+        if writer is not None:
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except (ConnectionError, ssl.SSLError):
+                pass
+
+    def add_message_handler(self, callback):
+        """Call the callback with each message received from the client,
+        so that the panel can answer them."""
+        self._message_handlers.append(callback)
+
     async def wait_for_client(self, timeout=None, raise_if_timeout=False):
         start = time.time()
 
@@ -103,23 +143,66 @@ class PanelServer(object):
             while self._keep_listening:
                 # We can't use readline() as there's no guarantee
                 # we're getting a \n at the end of the message
-                line = await reader.read(4096)
+                data = await reader.read(4096)
+                if not data:
+                    break
 
-                # Acknowledge that the message was received, as the panel does
-                writer.write('ACK\n'.encode())
-                await writer.drain()
+                # Acknowledge that the data was received, as the panel
+                # does once per read, keep-alives included
+                await self._acknowledge(writer)
 
-                # Then handle the message
-                line = line.decode().rstrip('\n')
-                LOGGER.info(f"Data received (len: {len(line)}): {line}")
+                for message in self._split_messages(data.decode()):
+                    # Keep-alive messages have nothing else to handle
+                    if message is None:
+                        continue
 
-                # Convert to JSON
-                line_as_json = json.loads(line)
-                self.MESSAGES.append(line_as_json)
+                    # Then handle the message
+                    LOGGER.info(f"Data received: {message}")
+                    self.MESSAGES.append(message)
+
+                    for handler in self._message_handlers:
+                        handler(message)
         finally:
             # If we reach here, clear out the writer
             # self._writer = None
             self._client_connected = False
 
+    @staticmethod
+    def _split_messages(data):
+        """Split the data received at once into the messages it contains,
+        JSON objects or None for the keep-alives; the commands are not
+        followed by a newline, so each newline is a keep-alive."""
+        decoder = json.JSONDecoder()
+        messages = []
+
+        pos = 0
+        while pos < len(data):
+            if data[pos] == '\n':
+                messages.append(None)
+                pos += 1
+            elif data[pos].isspace():
+                pos += 1
+            else:
+                message, pos = decoder.raw_decode(data, pos)
+                messages.append(message)
+
+        return messages
+
+    async def _acknowledge(self, writer):
+        latency = self._ack_latency
+        if self._ack_jitter:
+            latency += random.uniform(0, self._ack_jitter)
+
+        if latency <= 0:
+            writer.write('ACK\n'.encode())
+            await writer.drain()
+            return
+
+        def write_ack():
+            if not writer.is_closing():
+                writer.write('ACK\n'.encode())
+
+        asyncio.get_running_loop().call_later(latency, write_ack)
+
     async def wait_for_next_message(self, *args, **kwargs):
         return await self.MESSAGES.wait_for_next(*args, **kwargs)
@@ -0,0 +1,129 @@
+import asyncio
+import logging
+import time
+
+from collections import Counter
+
+
+LOGGER = logging.getLogger(__name__)
+
+
+def topic_matches(topic_filter: str, topic: str):
+    """Return whether the topic matches the MQTT topic filter, which can
+    use the + (single level) and # (all remaining levels) wildcards."""
+    filter_levels = topic_filter.split('/')
+    topic_levels = topic.split('/')
+
+    for i, level in enumerate(filter_levels):
+        if level == '#':
+            return True
+        if i >= len(topic_levels):
+            return False
+        if level != '+' and level != topic_levels[i]:
+            return False
+
+    return len(filter_levels) == len(topic_levels)
+
+
+class MockMqttBroker(object):
+    """In-process stand-in for an MQTT broker, accounting for what is
+    published through it.
+
+    Each publish takes ``latency`` seconds to be handled, and the broker
+    handles at most ``max_rate`` messages per second, the following ones
+    waiting for their turn, as a slow broker would make them. The retained
+    messages are stored per topic, an empty retained payload clearing the
+    topic, and the number of messages and bytes are counted per topic.
+    As a real broker for the messages of a same client, the messages are
+    handled in the order in which they were published.
+    """
+
+    def __init__(self, latency: float = 0, max_rate: float = None):
+        self._latency = latency
+        self._interval = 1 / max_rate if max_rate else 0
+        self._next_slot = 0
+        self._previous = None
+
+        self._subscriptions = []
+        self.retained = {}
+        self.inflight = 0
+        self.reset_counters()
+
+    def reset_counters(self):
+        """Reset the counters of messages and bytes, and the peak number of
+        messages in flight, but keep the retained messages."""
+        self.messages = Counter()
+        self.bytes = Counter()
+        self.max_inflight = self.inflight
+
+    @property
+    def total_messages(self):
+        return sum(self.messages.values())
+
+    @property
+    def total_bytes(self):
+        return sum(self.bytes.values())
+
+    @property
+    def retained_bytes(self):
+        return sum(len(topic) + len(payload)
+                   for topic, payload in self.retained.items())
+
+    def subscribe(self, topic_filter: str, callback: callable):
+        """Call the callback with the topic and payload of each message
+        published to a topic matching the filter, and with the retained
+        messages already matching it."""
+        self._subscriptions.append((topic_filter, callback))
+
+        for topic, payload in self.retained.items():
+            if topic_matches(topic_filter, topic):
+                callback(topic, payload)
+
+    async def publish(self, topic: str, payload=None, retain: bool = False,
+                      **kwargs):
+        self.inflight += 1
+        self.max_inflight = max(self.max_inflight, self.inflight)
+
+        previous = self._previous
+        handled = self._previous = asyncio.get_running_loop().create_future()
+        try:
+            await self._wait_for_slot()
+            if self._latency:
+                await asyncio.sleep(self._latency)
+
+            # Messages waiting for the same time can be woken up in any
+            # order, wait for the previous one to keep them in order
+            if previous is not None:
+                await asyncio.shield(previous)
+
+            self._handle(topic, payload, retain)
+        finally:
+            self.inflight -= 1
+            handled.set_result(None)
+
+    def _handle(self, topic: str, payload, retain: bool):
+        payload = '' if payload is None else str(payload)
+        self.messages[topic] += 1
+        self.bytes[topic] += len(topic) + len(payload)
+
+        if retain:
+            if payload:
+                self.retained[topic] = payload
+            else:
+                self.retained.pop(topic, None)
+
+        for topic_filter, callback in self._subscriptions:
+            if topic_matches(topic_filter, topic):
+                callback(topic, payload)
+
+    async def _wait_for_slot(self):
+        if not self._interval:
+            return
+
+        # Reserve the next slot available, so that the messages are
+        # handled in order at the maximum rate
+        now = time.monotonic()
+        slot = max(now, self._next_slot)
+        self._next_slot = slot + self._interval
+        if slot > now:
+            await asyncio.sleep(slot - now)
@@ -0,0 +1,184 @@
+import random
+
+
+# The properties of the zones of each sensor type, as sent by the panel:
+# group, zone_physical_type, zone_alarm_type, zone_type
+SENSOR_TYPES = {
+    'Door_Window': ('entryexitdelay', 1, 3, 1),
+    'Motion': ('awayinstantmotion', 2, 3, 2),
+    'Panel Motion': ('safetymotion', 1, 3, 119),
+    'GlassBreak': ('glassbreakawayonly', 1, 0, 116),
+    'Panel Glass Break': ('glassbreakawayonly', 1, 0, 116),
+    'Bluetooth': ('mobileintrusion', 1, 1, 115),
+    'SmokeDetector': ('smoke_heat', 9, 9, 5),
+    'CODetector': ('entryexitdelay', 1, 3, 1),
+    'Water': ('WaterSensor', 8, 0, 15),
+    'Doorbell': ('localsafety', 1, 3, 109),
+    'Freeze': ('freeze', 6, 0, 17),
+    'Heat': ('smoke_heat', 10, 0, 8),
+    'Temperature': ('Temperature', 1, 0, 8),
+    'Tilt': ('garageTilt1', 1, 3, 16),
+    'Keypad': ('fixedintrusion', 4, 0, 104),
+    'Auxiliary Pendant': ('fixedmedical', 1, 0, 21),
+    'Siren': ('Siren', 1, 3, 14),
+    'KeyFob': ('mobileintrusion', 3, 0, 102),
+    'TakeoverModule': ('takeovermodule', 13, 0, 18),
+    'Translator': ('translator', 14, 0, 20),
+    'Shock': ('shock', 12, 0, 107),
+}
+
+# A sensor mix close to the one of a typical house
+DEFAULT_SENSOR_MIX = {
+    'Door_Window': 60,
+    'Motion': 20,
+    'GlassBreak': 5,
+    'SmokeDetector': 5,
+    'CODetector': 3,
+    'Water': 3,
+    'Freeze': 2,
+    'KeyFob': 2,
+}
+
+# The sensor types whose status changes in normal operation
+ACTIVE_SENSOR_TYPES = ('Door_Window', 'Motion', 'Tilt', 'GlassBreak')
+
+
+class SyntheticPanel(object):
+    """Generate the events of a Qolsys Panel of an arbitrary size.
+
+    The panel has ``partitions`` partitions of ``zones_per_partition``
+    zones each, whose types are drawn from ``sensor_mix``, a dict of the
+    relative weights of each sensor type. The generation is deterministic
+    for a given ``seed``, so that the same panel can be compared across
+    runs.
+    """
+
+    def __init__(self, partitions: int = 1, zones_per_partition: int = 10,
+                 sensor_mix: dict = None, seed: int = 0):
+        self._random = random.Random(seed)
+
+        sensor_mix = sensor_mix or DEFAULT_SENSOR_MIX
+        unknown = set(sensor_mix) - set(SENSOR_TYPES)
+        if unknown:
+            raise ValueError('Unknown sensor types: '
+                             f"{', '.join(sorted(unknown))}")
+
+        types = list(sensor_mix)
+        weights = [sensor_mix[t] for t in types]
+
+        self._partitions = {}
+        self._zones = {}
+        for partition_id in range(partitions):
+            zone_list = []
+            for i in range(zones_per_partition):
+                sensor_type = self._random.choices(types, weights)[0]
+                zone = self._zone(partition_id, i, sensor_type)
+                zone_list.append(zone)
+                self._zones[zone['zone_id']] = zone
+
+            self._partitions[partition_id] = {
+                'partition_id': partition_id,
+                'name': f'partition{partition_id}',
+                'status': 'DISARM',
+                'secure_arm': False,
+                'zone_list': zone_list,
+            }
+
+    def _zone(self, partition_id: int, index: int, sensor_type: str):
+        group, physical_type, alarm_type, zone_type = SENSOR_TYPES[sensor_type]
+        zone_id = (partition_id + 1) * 10000 + index
+
+        return {
+            'id': f'{partition_id + 1:03d}-{index:04d}',
+            'type': sensor_type,
+            'name': f'{sensor_type} {partition_id}-{index}',
+            'group': group,
+            'status': 'Closed',
+            'state': '0',
+            'zone_id': zone_id,
+            'zone_physical_type': physical_type,
+            'zone_alarm_type': alarm_type,
+            'zone_type': zone_type,
+            'partition_id': partition_id,
+        }
+
+    @property
+    def partition_ids(self):
+        return list(self._partitions)
+
+    @property
+    def zone_ids(self):
+        return list(self._zones)
+
+    @property
+    def active_zone_ids(self):
+        """The zones whose status can change in normal operation."""
+        return [zone_id for zone_id, zone in self._zones.items()
+                if zone['type'] in ACTIVE_SENSOR_TYPES]
+
+    def zone(self, zone_id: int):
+        return self._zones[zone_id]
+
+    def random_zone_id(self, active: bool = True):
+        return self._random.choice(
+            self.active_zone_ids if active else self.zone_ids)
+
+    def random_partition_id(self):
+        return self._random.choice(self.partition_ids)
+
+    def summary(self, request_id: str = '<request_id>'):
+        return {
+            'event': 'INFO',
+            'info_type': 'SUMMARY',
+            'partition_list': list(self._partitions.values()),
+            'nonce': 'qolsys',
+            'requestID': request_id,
+        }
+
+    def zone_active(self, zone_id: int, status: str = None):
+        zone = self._zones[zone_id]
+        if status is None:
+            status = 'Closed' if zone['status'] == 'Open' else 'Open'
+        zone['status'] = status
+
+        return {
+            'event': 'ZONE_EVENT',
+            'zone_event_type': 'ZONE_ACTIVE',
+            'version': 1,
+            'zone': {
+                'status': status,
+                'zone_id': zone_id,
+            },
+            'requestID': '<request_id>',
+        }
+
+    def zone_update(self, zone_id: int):
+        return {
+            'event': 'ZONE_EVENT',
+            'zone_event_type': 'ZONE_UPDATE',
+            'zone': dict(self._zones[zone_id]),
+            'version': 1,
+            'requestID': '<request_id>',
+        }
+
+    def arming(self, partition_id: int, arming_type: str):
+        self._partitions[partition_id]['status'] = arming_type
+
+        return {
+            'event': 'ARMING',
+            'arming_type': arming_type,
+            'partition_id': partition_id,
+            'version': 1,
+            'requestID': '<request_id>',
+        }
+
+    def alarm(self, partition_id: int, alarm_type: str = 'POLICE'):
+        self._partitions[partition_id]['status'] = 'ALARM'
+
+        return {
+            'event': 'ALARM',
+            'alarm_type': alarm_type,
+            'partition_id': partition_id,
+            'version': 1,
+            'requestID': '<request_id>',
+        }
@@ -0,0 +1,149 @@
+import asyncio
+import unittest
+
+from unittest import mock
+
+import tests.unit.qolsysgw.mqtt.testenv  # noqa: F401
+
+from mqtt.scheduler import MqttPublishScheduler
+from qolsys.metrics import QolsysMetrics
+
+
+class TestUnitMqttPublishScheduler(unittest.IsolatedAsyncioTestCase):
+
+    async def test_unit_attributes_published_right_away_without_interval(self):
+        mqtt_publish = mock.Mock()
+        scheduler = MqttPublishScheduler(mqtt_publish)
+
+        scheduler.publish_attributes(topic='a', payload='1')
+        scheduler.publish_attributes(topic='a', payload='2')
+
+        self.assertEqual([
+            mock.call(topic='a', payload='1'),
+            mock.call(topic='a', payload='2'),
+        ], mqtt_publish.call_args_list)
+
+    async def test_unit_attributes_rate_limited_last_value_wins(self):
+        mqtt_publish = mock.Mock()
+        scheduler = MqttPublishScheduler(mqtt_publish,
+                                         attributes_interval=.05)
+
+        scheduler.publish_attributes(topic='a', payload='1')
+        scheduler.publish_attributes(topic='a', payload='2')
+        scheduler.publish_attributes(topic='a', payload='3')
+        scheduler.publish_attributes(topic='b', payload='1')
+        scheduler.publish(topic='state', payload='Open')
+
+        # The first attributes of each topic and the state are published
+        # right away, the others wait for the end of the interval
+        self.assertEqual([
+            mock.call(topic='a', payload='1'),
+            mock.call(topic='b', payload='1'),
+            mock.call(topic='state', payload='Open'),
+        ], mqtt_publish.call_args_list)
+
+        await asyncio.sleep(.1)
+
+        self.assertEqual(mock.call(topic='a', payload='3'),
+                         mqtt_publish.call_args)
+        self.assertEqual(4, mqtt_publish.call_count)
+
+    async def test_unit_attributes_skipped_when_unchanged(self):
+        mqtt_publish = mock.Mock()
+        metrics = QolsysMetrics()
+        scheduler = MqttPublishScheduler(mqtt_publish, metrics=metrics)
+
+        scheduler.publish_attributes(topic='a', payload='1')
+        scheduler.publish_attributes(topic='a', payload='1')
+        scheduler.publish_attributes(topic='b', payload='1')
+        scheduler.publish_attributes(topic='a', payload='2')
+        scheduler.publish_attributes(topic='a', payload='2')
+
+        self.assertEqual([
+            mock.call(topic='a', payload='1'),
+            mock.call(topic='b', payload='1'),
+            mock.call(topic='a', payload='2'),
+        ], mqtt_publish.call_args_list)
+        self.assertEqual(2, metrics.counter('attributes_skipped'))
+
+        # Once forgotten, the same payload is published again
+        scheduler.forget_attributes('a')
+        scheduler.publish_attributes(topic='a', payload='2')
+
+        self.assertEqual(mock.call(topic='a', payload='2'),
+                         mqtt_publish.call_args)
+        self.assertEqual(4, mqtt_publish.call_count)
+
+    async def test_unit_attributes_rate_limited_skipped_when_back(self):
+        mqtt_publish = mock.Mock()
+        scheduler = MqttPublishScheduler(mqtt_publish,
+                                         attributes_interval=.05)
+
+        scheduler.publish_attributes(topic='a', payload='1')
+        scheduler.publish_attributes(topic='a', payload='2')
+        scheduler.publish_attributes(topic='a', payload='1')
+
+        await asyncio.sleep(.1)
+
+        # The attributes came back to the published value before the end
+        # of the interval, so there is nothing more to publish
+        self.assertEqual([
+            mock.call(topic='a', payload='1'),
+        ], mqtt_publish.call_args_list)
+
+    async def test_unit_background_runs_once_per_key(self):
+        calls = []
+        scheduler = MqttPublishScheduler(mock.Mock())
+
+        scheduler.background('a', lambda: calls.append('a1'))
+        scheduler.background('b', lambda: calls.append('b'))
+        scheduler.background('a', lambda: calls.append('a2'))
+        self.assertEqual([], calls)
+
+        await asyncio.sleep(0)
+        self.assertEqual(['a2'], calls)
+
+        await asyncio.sleep(0)
+        self.assertEqual(['a2', 'b'], calls)
+
+    async def test_unit_background_errors_do_not_stop_the_lane(self):
+        calls = []
+        scheduler = MqttPublishScheduler(mock.Mock())
+
+        scheduler.background('a', lambda: 1 / 0)
+        scheduler.background('b', lambda: calls.append('b'))
+
+        with self.assertLogs('mqtt.scheduler', level='ERROR'):
+            await asyncio.sleep(0)
+            await asyncio.sleep(0)
+
+        self.assertEqual(['b'], calls)
+
+    async def test_unit_cancel_drops_the_pending_work(self):
+        calls = []
+        mqtt_publish = mock.Mock()
+        scheduler = MqttPublishScheduler(mqtt_publish,
+                                         attributes_interval=.05)
+
+        scheduler.publish_attributes(topic='a', payload='1')
+        scheduler.publish_attributes(topic='a', payload='2')
+        scheduler.background('a', lambda: calls.append('a'))
+
+        self.assertTrue(scheduler.cancel())
+        self.assertFalse(scheduler.cancel())
+
+        await asyncio.sleep(.1)
+
+        self.assertEqual([], calls)
+        self.assertEqual([
+            mock.call(topic='a', payload='1'),
+        ], mqtt_publish.call_args_list)
+
+        # The scheduler can still be used once cancelled
+        scheduler.background('b', lambda: calls.append('b'))
+        await asyncio.sleep(0)
+        self.assertEqual(['b'], calls)
+
+
+if __name__ == '__main__':
+    unittest.main()
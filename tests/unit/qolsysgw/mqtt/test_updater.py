@@ -1,15 +1,20 @@
+import json
 import unittest
 
 from unittest import mock
 
 import tests.unit.qolsysgw.mqtt.testenv  # noqa: F401
 
+from mqtt.scheduler import MqttPublishScheduler
 from mqtt.updater import MqttUpdater
 from mqtt.updater import MqttWrapperFactory
+from mqtt.updater import MqttWrapperQolsysMetrics
 from mqtt.updater import MqttWrapperQolsysState
 from mqtt.updater import MqttWrapperQolsysPartition
 from mqtt.updater import MqttWrapperQolsysSensor
 from qolsys.config import QolsysGatewayConfig
+from qolsys.metrics import QolsysMetrics
+from qolsys.observable import QolsysChangeset
 from qolsys.state import QolsysState
 from qolsys.partition import QolsysPartition
 from qolsys.sensors import QolsysSensor
@@ -27,7 +32,9 @@ class TestUnitMqttUpdater(unittest.TestCase):
 
         updater = MqttUpdater(state, factory)
 
-        state.register.assert_called_once_with(updater, updater._state_update)
+        state.register.assert_called_once_with(
+            updater, callback=updater._state_update,
+            changes=MqttUpdater.STATE_CHANGES)
 
     def test_unit_state_update_register_for_partition_updates(self):
         state = mock.create_autospec(QolsysState)
@@ -39,10 +46,15 @@ class TestUnitMqttUpdater(unittest.TestCase):
         partition2 = mock.create_autospec(QolsysPartition)
         state.partitions = [partition1, partition2]
 
-        updater._state_update(state, change=QolsysState.NOTIFY_UPDATE_PARTITIONS)
+        updater._state_update(state, QolsysChangeset().add(
+            QolsysState.NOTIFY_UPDATE_PARTITIONS))
 
-        partition1.register.assert_called_once_with(updater, updater._partition_update)
-        partition2.register.assert_called_once_with(updater, updater._partition_update)
+        partition1.register.assert_called_once_with(
+            updater, callback=updater._partition_update,
+            changes=MqttUpdater.PARTITION_CHANGES)
+        partition2.register.assert_called_once_with(
+            updater, callback=updater._partition_update,
+            changes=MqttUpdater.PARTITION_CHANGES)
 
     def test_unit_state_update_configures_partitions(self):
         state = mock.create_autospec(QolsysState)
@@ -60,7 +72,8 @@ class TestUnitMqttUpdater(unittest.TestCase):
         }
         factory.wrap.side_effect = lambda obj: wrapped[obj]
 
-        updater._state_update(state, change=QolsysState.NOTIFY_UPDATE_PARTITIONS)
+        updater._state_update(state, QolsysChangeset().add(
+            QolsysState.NOTIFY_UPDATE_PARTITIONS))
 
         # Checked we wrapped the partitions using the factory
         wrap_calls = [
@@ -90,10 +103,13 @@ class TestUnitMqttUpdater(unittest.TestCase):
         partition1.sensors = [sensor1, sensor2]
         partition2.sensors = [sensor3]
 
-        updater._state_update(state, change=QolsysState.NOTIFY_UPDATE_PARTITIONS)
+        updater._state_update(state, QolsysChangeset().add(
+            QolsysState.NOTIFY_UPDATE_PARTITIONS))
 
         for sensor in [sensor1, sensor2, sensor3]:
-            sensor.register.assert_called_once_with(updater, updater._sensor_update)
+            sensor.register.assert_called_once_with(
+                updater, callback=updater._sensor_update,
+                changes=MqttUpdater.SENSOR_CHANGES)
 
     def test_unit_state_update_configures_sensors(self):
         state = mock.create_autospec(QolsysState)
@@ -120,7 +136,8 @@ class TestUnitMqttUpdater(unittest.TestCase):
         }
         factory.wrap.side_effect = lambda obj: wrapped[obj]
 
-        updater._state_update(state, change=QolsysState.NOTIFY_UPDATE_PARTITIONS)
+        updater._state_update(state, QolsysChangeset().add(
+            QolsysState.NOTIFY_UPDATE_PARTITIONS))
 
         # Checked we wrapped the partitions using the factory
         wrap_calls = [
@@ -138,6 +155,39 @@ class TestUnitMqttUpdater(unittest.TestCase):
         wrapped[sensor2].configure.assert_called_once_with(partition=partition1)
         wrapped[sensor3].configure.assert_called_once_with(partition=partition2)
 
+    def test_unit_register_partitions_only_configures_requested(self):
+        state = mock.create_autospec(QolsysState)
+        factory = mock.create_autospec(MqttWrapperFactory)
+
+        updater = MqttUpdater(state, factory)
+
+        partition = mock.create_autospec(QolsysPartition)
+        state.partitions = [partition]
+
+        sensor = mock.create_autospec(QolsysSensor)
+        partition.sensors = [sensor]
+
+        wrapped = {
+            partition: mock.create_autospec(MqttWrapperQolsysPartition),
+            sensor: mock.create_autospec(MqttWrapperQolsysSensor),
+        }
+        factory.wrap.side_effect = lambda obj: wrapped[obj]
+
+        updater.register_partitions(state, configure_partitions=True,
+                                    configure_sensors=False)
+
+        # Both are registered for updates, but only the partition is
+        # configured
+        partition.register.assert_called_once_with(
+            updater, callback=updater._partition_update,
+            changes=MqttUpdater.PARTITION_CHANGES)
+        sensor.register.assert_called_once_with(
+            updater, callback=updater._sensor_update,
+            changes=MqttUpdater.SENSOR_CHANGES)
+
+        wrapped[partition].configure.assert_called_once_with()
+        wrapped[sensor].configure.assert_not_called()
+
     def test_unit_partition_update_add_sensor_configures_sensor(self):
         state = mock.create_autospec(QolsysState)
         factory = mock.create_autospec(MqttWrapperFactory)
@@ -154,11 +204,12 @@ class TestUnitMqttUpdater(unittest.TestCase):
         }
         factory.wrap.side_effect = lambda obj: wrapped[obj]
 
-        updater._partition_update(partition,
-                                  change=QolsysPartition.NOTIFY_ADD_SENSOR,
-                                  new_value=new_sensor)
+        updater._partition_update(partition, QolsysChangeset().add_items(
+            QolsysPartition.NOTIFY_ADD_SENSOR, added=[new_sensor]))
 
-        new_sensor.register.assert_called_once_with(updater, callback=updater._sensor_update)
+        new_sensor.register.assert_called_once_with(
+            updater, callback=updater._sensor_update,
+            changes=MqttUpdater.SENSOR_CHANGES)
         wrapped[new_sensor].configure.assert_called_once_with(partition=partition)
 
     def test_unit_partition_update_update_status_updates_partition_state(self):
@@ -175,8 +226,8 @@ class TestUnitMqttUpdater(unittest.TestCase):
         }
         factory.wrap.side_effect = lambda obj: wrapped[obj]
 
-        updater._partition_update(partition,
-                                  change=QolsysPartition.NOTIFY_UPDATE_STATUS)
+        updater._partition_update(partition, QolsysChangeset().add(
+            QolsysPartition.NOTIFY_UPDATE_STATUS))
 
         wrapped[partition].update_state.assert_called_once_with()
 
@@ -194,9 +245,36 @@ class TestUnitMqttUpdater(unittest.TestCase):
         }
         factory.wrap.side_effect = lambda obj: wrapped[obj]
 
-        updater._partition_update(partition,
-                                  change=QolsysPartition.NOTIFY_UPDATE_SECURE_ARM)
+        updater._partition_update(partition, QolsysChangeset().add(
+            QolsysPartition.NOTIFY_UPDATE_SECURE_ARM))
+
+        wrapped[partition].configure.assert_called_once_with()
+
+    def test_unit_partition_update_configures_in_scheduler_background(self):
+        state = mock.create_autospec(QolsysState)
+        factory = mock.create_autospec(MqttWrapperFactory)
+        scheduler = mock.create_autospec(MqttPublishScheduler)
+
+        updater = MqttUpdater(state, factory, scheduler=scheduler)
+
+        partition = mock.create_autospec(QolsysPartition)
+        partition.name = f'TestPartition ({id(partition)})'
+
+        wrapped = {
+            partition: mock.create_autospec(MqttWrapperQolsysPartition),
+        }
+        wrapped[partition].config_topic = 'partition/config'
+        factory.wrap.side_effect = lambda obj: wrapped[obj]
+
+        updater._partition_update(partition, QolsysChangeset().add(
+            QolsysPartition.NOTIFY_UPDATE_SECURE_ARM))
+
+        wrapped[partition].configure.assert_not_called()
+        scheduler.background.assert_called_once_with(
+            'partition/config', mock.ANY)
 
+        callback = scheduler.background.call_args[0][1]
+        callback()
         wrapped[partition].configure.assert_called_once_with()
 
     def test_unit_partition_update_update_alarm_type_updates_attributes(self):
@@ -213,8 +291,8 @@ class TestUnitMqttUpdater(unittest.TestCase):
         }
         factory.wrap.side_effect = lambda obj: wrapped[obj]
 
-        updater._partition_update(partition,
-                                  change=QolsysPartition.NOTIFY_UPDATE_ALARM_TYPE)
+        updater._partition_update(partition, QolsysChangeset().add(
+            QolsysPartition.NOTIFY_UPDATE_ALARM_TYPE))
 
         wrapped[partition].update_attributes.assert_called_once_with()
 
@@ -232,8 +310,8 @@ class TestUnitMqttUpdater(unittest.TestCase):
         }
         factory.wrap.side_effect = lambda obj: wrapped[obj]
 
-        updater._sensor_update(sensor,
-                               change=QolsysSensor.NOTIFY_UPDATE_STATUS)
+        updater._sensor_update(sensor, QolsysChangeset().add(
+            QolsysSensor.NOTIFY_UPDATE_STATUS))
 
         wrapped[sensor].update_state.assert_called_once_with()
 
@@ -251,8 +329,8 @@ class TestUnitMqttUpdater(unittest.TestCase):
         }
         factory.wrap.side_effect = lambda obj: wrapped[obj]
 
-        updater._sensor_update(sensor,
-                               change=QolsysSensor.NOTIFY_UPDATE_ATTRIBUTES)
+        updater._sensor_update(sensor, QolsysChangeset().add(
+            QolsysSensor.NOTIFY_UPDATE_ATTRIBUTES))
 
         wrapped[sensor].update_attributes.assert_called_once_with()
 
@@ -306,6 +384,7 @@ class TestUnitMqttWrapperQolsys(unittest.TestCase):
         sensor.zone_id = 69
         sensor.id = '012-ID-1337'
         sensor.unique_id = sensor.id
+        sensor.partition = partition
         wrapped_sensor = MqttWrapperQolsysSensor(
             sensor=sensor, mqtt_publish=mqtt_publish, cfg=cfg,
             mqtt_plugin_cfg=mqtt_plugin_cfg, session_token=session_token)
@@ -331,6 +410,25 @@ class TestUnitMqttWrapperQolsys(unittest.TestCase):
             'sensor': wrapped_sensor,
         }
 
+    def test_unit_configure_forces_attributes_publish(self):
+        scheduler = mock.create_autospec(MqttPublishScheduler)
+        wrapped_partition = MqttWrapperQolsysPartition(
+            partition=self.partition, mqtt_publish=self.mqtt_publish,
+            cfg=self.cfg, mqtt_plugin_cfg=self.mqtt_plugin_cfg,
+            session_token=self.session_token, scheduler=scheduler)
+
+        calls = mock.Mock()
+        scheduler.forget_attributes.side_effect = calls.forget_attributes
+        with mock.patch.object(wrapped_partition, 'update_state'), \
+                mock.patch.object(wrapped_partition, 'update_attributes',
+                                  calls.update_attributes):
+            wrapped_partition.configure()
+
+        self.assertEqual([
+            mock.call.forget_attributes(wrapped_partition.attributes_topic),
+            mock.call.update_attributes(),
+        ], calls.mock_calls)
+
     def test_unit_partition_configure_payload(self):
         self.maxDiff = None
 
@@ -383,6 +481,54 @@ class TestUnitMqttWrapperQolsys(unittest.TestCase):
 
         self.assertDictEqual(expected, actual)
 
+    def test_unit_metrics_configure_diagnostics(self):
+        metrics = QolsysMetrics()
+        wrapped_metrics = MqttWrapperQolsysMetrics(
+            metrics=metrics, mqtt_publish=self.mqtt_publish, cfg=self.cfg,
+            mqtt_plugin_cfg=self.mqtt_plugin_cfg,
+            session_token=self.session_token)
+
+        wrapped_metrics.configure()
+
+        published = {
+            c.kwargs['topic']: c.kwargs['payload']
+            for c in self.mqtt_publish.call_args_list
+        }
+        self.assertEqual(len(MqttWrapperQolsysMetrics.DIAGNOSTICS) + 1,
+                         len(published))
+
+        state_topic = 'homeassistant/sensor/qolsys_panel_diagnostics/state'
+        self.assertEqual(set(metrics.diagnostics()),
+                         set(json.loads(published[state_topic])))
+
+        config = json.loads(published[
+            'homeassistant/sensor/qolsys_panel_latency_p99/config'])
+        self.assertDictEqual({
+            'name': 'P99 Latency',
+            'state_topic': state_topic,
+            'value_template': '{{ value_json.latency_p99 }}',
+            'state_class': 'measurement',
+            'entity_category': 'diagnostic',
+            'availability_mode': 'all',
+            'unit_of_measurement': 'ms',
+            'device_class': 'duration',
+            'unique_id': 'qolsys_panel_latency_p99',
+            'availability': [
+                {
+                    'payload_available': 'online',
+                    'payload_not_available': 'offline',
+                    'topic': ('homeassistant/alarm_control_panel/qolsys_panel/'
+                              'availability'),
+                },
+                {
+                    'payload_available': 'online',
+                    'payload_not_available': 'offline',
+                    'topic': 'appdaemon',
+                },
+            ],
+            'device': wrapped_metrics.device_payload,
+        }, config)
+
     def test_unit_sensor_ha_device_class(self):
         for cls, device_class in MqttWrapperQolsysSensor.QOLSYS_TO_HA_DEVICE_CLASS.items():
             class SubCls(cls):
@@ -401,6 +547,45 @@ class TestUnitMqttWrapperQolsys(unittest.TestCase):
 
             self.assertEqual(expected, actual, f'for sensor class {cls.__name__}')
 
+    def test_unit_sensor_ha_device_class_unknown_warns_once(self):
+        class UnknownSensor(QolsysSensor):
+            def __init__(self):
+                pass
+
+        wrapped_sensor = MqttWrapperQolsysSensor(
+            sensor=UnknownSensor(), mqtt_publish=self.mqtt_publish,
+            cfg=self.cfg, mqtt_plugin_cfg=self.mqtt_plugin_cfg,
+            session_token=self.session_token)
+
+        with self.assertLogs('mqtt.updater', level='WARNING') as logs:
+            for _ in range(3):
+                self.assertEqual('safety', wrapped_sensor.ha_device_class)
+        self.assertEqual(1, len(logs.records))
+
+    def test_unit_sensor_ha_device_class_overrides(self):
+        self.cfg.sensor_device_class = QolsysGatewayConfig({
+            'panel_host': '127.0.0.1',
+            'panel_token': 'ToKeN',
+            'sensor_device_class': {
+                '69': 'window',
+                'entryexitdelay': 'garage_door',
+                'Door_Window': 'opening',
+            },
+        }).sensor_device_class
+
+        self.sensor.group = 'entryexitdelay'
+        self.sensor.type = 'Door_Window'
+        self.assertEqual('window', self.wrapped_sensor.ha_device_class)
+
+        self.sensor.zone_id = 70
+        self.assertEqual('garage_door', self.wrapped_sensor.ha_device_class)
+
+        self.sensor.group = 'entryexitlongdelay'
+        self.assertEqual('opening', self.wrapped_sensor.ha_device_class)
+
+        self.sensor.type = 'Motion'
+        self.assertEqual('safety', self.wrapped_sensor.ha_device_class)
+
     def test_unit_sensor_configure_payload(self):
         self.maxDiff = None
 
@@ -418,8 +603,8 @@ class TestUnitMqttWrapperQolsys(unittest.TestCase):
                 {
                     'payload_available': 'online',
                     'payload_not_available': 'offline',
-                    'topic': ('homeassistant/binary_sensor/'
-                              'testsensor/availability'),
+                    'topic': ('homeassistant/alarm_control_panel/qolsys_panel/'
+                              'testpartition/availability'),
                 },
                 {
                     'payload_available': 'online',
@@ -450,6 +635,46 @@ class TestUnitMqttWrapperQolsys(unittest.TestCase):
 
         self.assertDictEqual(expected, actual)
 
+    def test_unit_configure_json_with_shared_fragments(self):
+        for birth_topic in ('appdaemon', 'appdaemon/birth'):
+            self.mqtt_plugin_cfg_get['birth_topic'] = birth_topic
+            fragments = {}
+
+            for name, wrapper in self.wrappers.items():
+                wrapper._fragments = fragments
+                kwargs = {'partition': self.partition}
+
+                with self.subTest(wrapper=name, birth_topic=birth_topic):
+                    payload = json.loads(wrapper.configure_json(**kwargs))
+                    self.assertEqual(wrapper.device_payload,
+                                     payload['device'])
+                    self.assertEqual(
+                        wrapper.device_availability,
+                        payload['availability'][0])
+
+    def test_unit_configure_json_without_entity_fields(self):
+        wrapper = self.wrappers['partition']
+        with mock.patch.object(wrapper, 'configure_entity_payload',
+                               return_value={}):
+            payload = json.loads(wrapper.configure_json())
+
+        self.assertEqual(['availability', 'device'], sorted(payload))
+
+    def test_unit_factory_shares_fragments(self):
+        factory = MqttWrapperFactory(
+            mqtt_publish=self.mqtt_publish, cfg=self.cfg,
+            mqtt_plugin_cfg=self.mqtt_plugin_cfg,
+            session_token=self.session_token)
+
+        wrapped_state = factory.wrap(QolsysState())
+        wrapped_partition = factory.wrap(QolsysPartition(
+            partition_id=0, name='partition0', status='DISARM',
+            secure_arm=False))
+        self.assertIs(wrapped_state._fragments, wrapped_partition._fragments)
+
+        wrapped_state.configure()
+        self.assertIn('device', wrapped_partition._fragments)
+
 
 if __name__ == '__main__':
     unittest.main()
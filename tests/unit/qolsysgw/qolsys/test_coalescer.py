@@ -0,0 +1,120 @@
+import asyncio
+import unittest
+
+import tests.unit.qolsysgw.qolsys.testenv  # noqa: F401
+
+from qolsys.coalescer import QolsysZoneCoalescer
+from qolsys.events import QolsysEvent
+from qolsys.state import QolsysState
+from testutils.fixtures_data import get_zones_summary
+
+
+class TestUnitQolsysZoneCoalescer(unittest.IsolatedAsyncioTestCase):
+
+    def _state(self, status='DISARM'):
+        return QolsysState(QolsysEvent.from_json(get_zones_summary(
+            status=status,
+            zones=(10000, 10001),
+            zone_types={10000: 'Motion'},
+        )))
+
+    async def test_unit_transitions_within_window_are_coalesced(self):
+        state = self._state()
+        coalescer = QolsysZoneCoalescer(state, windows={'Motion': 0.05})
+        zone = state.zone(10000)
+
+        coalescer.zone_open(10000)
+        self.assertTrue(zone.is_open)
+
+        coalescer.zone_closed(10000)
+        coalescer.zone_open(10000)
+        coalescer.zone_closed(10000)
+        self.assertTrue(zone.is_open)
+        self.assertEqual(0, zone.flaps)
+
+        await asyncio.sleep(0.1)
+
+        self.assertTrue(zone.is_closed)
+        self.assertEqual(3, zone.flaps)
+
+    async def test_unit_group_takes_precedence_over_type(self):
+        windows = {'safetymotion': 0.5, 'Motion': 0.05}
+        state = self._state()
+
+        self.assertEqual(0.5, QolsysZoneCoalescer.window_for(
+            windows, state.zone(10000)))
+        self.assertIsNone(QolsysZoneCoalescer.window_for(
+            windows, state.zone(10001)))
+
+    async def test_unit_zones_without_window_are_not_delayed(self):
+        state = self._state()
+        coalescer = QolsysZoneCoalescer(state, windows={'Motion': 10})
+        zone = state.zone(10001)
+
+        coalescer.zone_open(10001)
+        coalescer.zone_closed(10001)
+
+        self.assertTrue(zone.is_closed)
+        self.assertEqual(0, zone.flaps)
+
+    async def test_unit_armed_partition_is_not_delayed(self):
+        state = self._state(status='ARM_AWAY')
+        coalescer = QolsysZoneCoalescer(state, windows={'Motion': 10})
+        zone = state.zone(10000)
+
+        coalescer.zone_open(10000)
+        coalescer.zone_closed(10000)
+
+        self.assertTrue(zone.is_closed)
+        self.assertEqual(0, zone.flaps)
+
+    async def test_unit_repeated_status_flushes_window(self):
+        state = self._state()
+        coalescer = QolsysZoneCoalescer(state, windows={'Motion': 10})
+        zone = state.zone(10000)
+
+        coalescer.zone_open(10000)
+        coalescer.zone_open(10000)
+
+        # The repeated open goes through to the sensor, which is what
+        # the tamper detection relies on
+        self.assertTrue(zone.tampered)
+
+        coalescer.cancel()
+
+    async def test_unit_cancel_drops_pending_windows(self):
+        state = self._state()
+        coalescer = QolsysZoneCoalescer(state, windows={'Motion': 0.05})
+        zone = state.zone(10000)
+
+        coalescer.zone_open(10000)
+        coalescer.zone_closed(10000)
+        coalescer.cancel()
+
+        await asyncio.sleep(0.1)
+
+        self.assertTrue(zone.is_open)
+        self.assertEqual(0, zone.flaps)
+
+    async def test_unit_flush_applies_pending_windows(self):
+        state = self._state()
+        coalescer = QolsysZoneCoalescer(state, windows={'Motion': 10})
+        zone = state.zone(10000)
+
+        coalescer.zone_open(10000)
+        coalescer.zone_closed(10000)
+        self.assertTrue(zone.is_open)
+
+        coalescer.flush()
+
+        self.assertTrue(zone.is_closed)
+        self.assertEqual(1, zone.flaps)
+
+        # The window is closed, the next transition opens a new one
+        coalescer.zone_open(10000)
+        self.assertTrue(zone.is_open)
+        coalescer.cancel()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,104 @@
+import unittest
+
+import tests.unit.qolsysgw.qolsys.testenv  # noqa: F401
+
+from qolsys.config import QolsysGatewayConfig
+
+
+class TestUnitQolsysGatewayConfig(unittest.TestCase):
+
+    def _args(self, **kwargs):
+        return {
+            'panel_host': '127.0.0.1',
+            'panel_mac': 'aa:bb:cc:dd:ee:ff',
+            'panel_token': 'token',
+            **kwargs,
+        }
+
+    def test_unit_checked_config_values_are_attributes(self):
+        cfg = QolsysGatewayConfig(self._args(panel_unique_id='panel'))
+
+        # The values are stored in the object itself, so that reading
+        # them does not go through __getattr__
+        self.assertEqual('panel', vars(cfg)['panel_unique_id'])
+        self.assertEqual('mqtt', vars(cfg)['mqtt_namespace'])
+        self.assertEqual('homeassistant/alarm_control_panel/panel/set',
+                         cfg.control_topic)
+
+    def test_unit_checked_config_is_frozen(self):
+        cfg = QolsysGatewayConfig(self._args())
+
+        with self.assertRaises(AttributeError):
+            cfg.mqtt_namespace = 'other'
+
+        with self.assertRaises(AttributeError):
+            cfg.load({'mqtt_namespace': 'other'})
+
+        self.assertEqual('mqtt', cfg.mqtt_namespace)
+
+    def test_unit_checked_config_mappings_are_frozen(self):
+        args = self._args(
+            sensor_device_class={10: 'door'},
+            coalesce_window={'Motion': 2},
+        )
+        cfg = QolsysGatewayConfig(args)
+
+        with self.assertRaises(TypeError):
+            cfg.sensor_device_class['20'] = 'window'
+
+        with self.assertRaises(TypeError):
+            cfg.coalesce_window['Motion'] = 0
+
+        with self.assertRaises(TypeError):
+            cfg._override_config['mqtt_namespace'] = 'other'
+
+        # The arguments the configuration was loaded from are not shared
+        args['panel_unique_id'] = 'other'
+        self.assertEqual({10: 'door'}, dict(cfg.sensor_device_class))
+        self.assertEqual('qolsys_panel', cfg.panel_unique_id)
+        self.assertEqual(cfg, QolsysGatewayConfig(self._args(
+            sensor_device_class={'10': 'door'},
+            coalesce_window={'Motion': 2},
+        )))
+
+    def test_unit_unchecked_config_can_be_loaded(self):
+        cfg = QolsysGatewayConfig(check=False)
+        cfg.load(self._args(mqtt_namespace='other'))
+
+        with self.assertRaises(TypeError):
+            hash(cfg)
+
+        cfg.check()
+        self.assertEqual('other', cfg.mqtt_namespace)
+        self.assertIsInstance(hash(cfg), int)
+
+    def test_unit_config_equality(self):
+        cfg1 = QolsysGatewayConfig(self._args(
+            sensor_device_class={10: 'door', 'Motion': 'motion'}))
+        cfg2 = QolsysGatewayConfig(self._args(
+            sensor_device_class={'Motion': 'motion', '10': 'door'}))
+        cfg3 = QolsysGatewayConfig(self._args(
+            sensor_device_class={'Motion': 'motion'}))
+
+        self.assertEqual(cfg1, cfg2)
+        self.assertEqual(hash(cfg1), hash(cfg2))
+        self.assertNotEqual(cfg1, cfg3)
+        self.assertEqual(1, len({cfg1, cfg2}))
+
+    def test_unit_config_changed_keys(self):
+        cfg1 = QolsysGatewayConfig(self._args(
+            sensor_device_class={10: 'door'}))
+        cfg2 = QolsysGatewayConfig(self._args(
+            sensor_device_class={'10': 'door'}, panel_port=12346,
+            panel_user_code='1234'))
+
+        self.assertEqual(set(), cfg1.changed_keys(cfg1))
+        # Keys whose checked value derive from a changed key are also
+        # considered as changed
+        self.assertEqual({'panel_port', 'panel_user_code',
+                          'code_disarm_required', 'ha_check_user_code'},
+                         cfg1.changed_keys(cfg2))
+
+
+if __name__ == '__main__':
+    unittest.main()
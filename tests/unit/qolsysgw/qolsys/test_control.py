@@ -6,20 +6,112 @@ from unittest import mock
 
 import tests.unit.qolsysgw.qolsys.testenv
 
+from qolsys.config import QolsysGatewayConfig
+from qolsys.control import QolsysControl
 from qolsys.control import QolsysControlArmAway
 from qolsys.control import QolsysControlArmHome
 from qolsys.control import QolsysControlDisarm
+from qolsys.control import QolsysControlPolicy
 from qolsys.control import QolsysControlTrigger
+from qolsys.exceptions import InvalidUserCodeException
+from qolsys.exceptions import MissingUserCodeException
+
+
+def _policy(secure_arm_partitions=(), **kwargs):
+    cfg = QolsysGatewayConfig({
+        'panel_host': '127.0.0.1',
+        'panel_mac': 'aa:bb:cc:dd:ee:ff',
+        'panel_token': 'token',
+        **kwargs,
+    })
+
+    state = mock.MagicMock()
+    state.partitions = [
+        mock.MagicMock(id=i, secure_arm=i in secure_arm_partitions)
+        for i in range(2)
+    ]
+
+    return QolsysControlPolicy(cfg, state)
+
+
+class TestUnitQolsysControlPolicy(unittest.TestCase):
+
+    def test_unit_policy_precomputes_values(self):
+        policy = _policy(secure_arm_partitions=[1], panel_user_code=1234,
+                         arm_away_exit_delay=30)
+
+        self.assertEqual('1234', policy.panel_user_code)
+        self.assertEqual('1234', policy.valid_code)
+        self.assertEqual(30, policy.arm_away_exit_delay)
+        self.assertEqual(frozenset([1]), policy.secure_arm_partitions)
+
+    def test_unit_policy_is_immutable(self):
+        policy = _policy()
+
+        with self.assertRaises(AttributeError):
+            policy.panel_user_code = '4242'
+
+        with self.assertRaises(AttributeError):
+            del policy.panel_user_code
 
 
-# TODO: add unit tests
 class TestUnitQolsysControlDisarm(unittest.IsolatedAsyncioTestCase):
-    pass
+
+    def _control(self, code, **kwargs):
+        control = QolsysControlDisarm(partition_id=0, code=code, raw={})
+        control.configure(_policy(**kwargs))
+        return control
+
+    async def test_unit_disarm_checks_code(self):
+        policy = dict(panel_user_code='1234', ha_check_user_code=False,
+                      code_disarm_required=True)
+
+        self._control('1234', **policy).check()
+
+        with self.assertRaises(InvalidUserCodeException):
+            self._control('4321', **policy).check()
+
+        with self.assertRaises(InvalidUserCodeException):
+            self._control(None, **policy).check()
+
+    async def test_unit_disarm_without_panel_code_uses_sent_code(self):
+        control = self._control('4242')
+        control.check()
+
+        self.assertEqual('4242', control.action.data['usercode'])
+
+        with self.assertRaises(MissingUserCodeException):
+            self._control(None).check()
 
 
-# TODO: add unit tests
 class TestUnitQolsysControlArmAway(unittest.IsolatedAsyncioTestCase):
-    pass
+
+    async def test_unit_arm_away_uses_policy_defaults(self):
+        control = QolsysControlArmAway(partition_id=0, raw={})
+        control.configure(_policy(arm_away_exit_delay=30,
+                                  arm_away_bypass=True))
+        control.check()
+
+        self.assertEqual(30, control.action.data['delay'])
+        self.assertEqual('true', control.action.data['bypass'])
+
+    async def test_unit_arm_away_requires_code_when_secure_arm(self):
+        control = QolsysControlArmAway(partition_id=1, raw={})
+        control.configure(_policy(secure_arm_partitions=[1]))
+
+        with self.assertRaises(MissingUserCodeException):
+            control.check()
+
+    async def test_unit_arm_away_partition_id_from_json_str(self):
+        control = QolsysControl.from_json({
+            'action': 'ARM_AWAY',
+            'partition_id': '1',
+        })
+        control.configure(_policy(secure_arm_partitions=[1]))
+
+        self.assertEqual(1, control.partition_id)
+        with self.assertRaises(MissingUserCodeException):
+            control.check()
 
 
 # TODO: add unit tests
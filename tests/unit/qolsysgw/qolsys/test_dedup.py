@@ -0,0 +1,90 @@
+import asyncio
+import unittest
+
+import tests.unit.qolsysgw.qolsys.testenv  # noqa: F401
+
+from qolsys.dedup import QolsysControlDeduplicator
+
+
+class TestUnitQolsysControlDeduplicator(unittest.IsolatedAsyncioTestCase):
+
+    def _sender(self, calls, result=None, exception=None, delay=0):
+        async def send():
+            calls.append(result)
+            await asyncio.sleep(delay)
+            if exception:
+                raise exception
+            return result
+        return send
+
+    async def test_unit_inflight_duplicates_collapsed(self):
+        calls = []
+        dedup = QolsysControlDeduplicator()
+
+        results = await asyncio.gather(
+            dedup.run('a', self._sender(calls, 1, delay=.01)),
+            dedup.run('a', self._sender(calls, 2, delay=.01)),
+            dedup.run('b', self._sender(calls, 3, delay=.01)),
+        )
+
+        self.assertEqual([True, True, True], results)
+        self.assertEqual([1, 3], calls)
+
+    async def test_unit_inflight_duplicates_share_exception(self):
+        calls = []
+        dedup = QolsysControlDeduplicator(window=10)
+
+        results = await asyncio.gather(
+            dedup.run('a', self._sender(calls, exception=ValueError(),
+                                        delay=.01)),
+            dedup.run('a', self._sender(calls)),
+            return_exceptions=True,
+        )
+
+        self.assertIsInstance(results[0], ValueError)
+        self.assertIsInstance(results[1], ValueError)
+
+        # A failed command is not remembered, so it can be retried
+        await dedup.run('a', self._sender(calls, 2))
+        self.assertEqual(2, len(calls))
+
+    async def test_unit_recent_duplicates_skipped_in_window(self):
+        calls = []
+        dedup = QolsysControlDeduplicator(window=.05)
+
+        self.assertTrue(await dedup.run('a', self._sender(calls, 1)))
+        self.assertFalse(await dedup.run('a', self._sender(calls, 2)))
+        self.assertEqual([1], calls)
+
+        await asyncio.sleep(.1)
+
+        self.assertTrue(await dedup.run('a', self._sender(calls, 3)))
+        self.assertEqual([1, 3], calls)
+
+    async def test_unit_other_command_of_group_ends_window(self):
+        calls = []
+        dedup = QolsysControlDeduplicator(window=10)
+
+        await dedup.run('disarm', self._sender(calls, 1), group=0)
+        await dedup.run('arm', self._sender(calls, 2), group=0)
+        await dedup.run('disarm', self._sender(calls, 3), group=0)
+        self.assertEqual([1, 2, 3], calls)
+
+        # The commands of the other groups do not end the window
+        await dedup.run('arm', self._sender(calls, 4), group=1)
+        self.assertFalse(
+            await dedup.run('disarm', self._sender(calls, 5), group=0))
+        self.assertEqual([1, 2, 3, 4], calls)
+
+    async def test_unit_recent_duplicates_sent_without_window(self):
+        calls = []
+        dedup = QolsysControlDeduplicator()
+
+        await dedup.run('a', self._sender(calls, 1))
+        await dedup.run('a', self._sender(calls, 2))
+
+        self.assertEqual([1, 2], calls)
+
+
+if __name__ == '__main__':
+    unittest.main()
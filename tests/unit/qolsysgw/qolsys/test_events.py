@@ -0,0 +1,117 @@
+import unittest
+
+import tests.unit.qolsysgw.qolsys.testenv  # noqa: F401
+
+from qolsys.events import QolsysEvent
+from qolsys.events import QolsysEventArming
+from qolsys.events import QolsysEventZoneEventActive
+from qolsys.exceptions import InvalidQolsysEventException
+from qolsys.exceptions import InvalidQolsysSensorException
+
+
+class TestUnitQolsysEventFromJson(unittest.TestCase):
+
+    def setUp(self):
+        QolsysEvent.REJECTED.clear()
+
+    def test_unit_arming_fields_are_coerced(self):
+        event = QolsysEvent.from_json({
+            'event': 'ARMING',
+            'arming_type': 'ARM_STAY',
+            'partition_id': '1',
+            'delay': '30',
+            'version': 1,
+            'requestID': '<request_id>',
+        })
+
+        self.assertIsInstance(event, QolsysEventArming)
+        self.assertEqual(1, event.partition_id)
+        self.assertEqual(30, event.delay)
+        self.assertEqual('ARM_STAY', event.arming_type)
+        self.assertEqual('<request_id>', event.request_id)
+
+    def test_unit_zone_active_status_is_normalized(self):
+        event = QolsysEvent.from_json({
+            'event': 'ZONE_EVENT',
+            'zone_event_type': 'ZONE_ACTIVE',
+            'zone': {'zone_id': 10000, 'status': 'open'},
+        })
+
+        self.assertIsInstance(event, QolsysEventZoneEventActive)
+        self.assertEqual(10000, event.zone.id)
+        self.assertEqual('Open', event.zone.status)
+
+    def test_unit_missing_field_is_rejected_and_counted(self):
+        with self.assertRaises(InvalidQolsysEventException):
+            QolsysEvent.from_json({
+                'event': 'ZONE_EVENT',
+                'zone_event_type': 'ZONE_ACTIVE',
+                'zone': {'status': 'Open'},
+            })
+
+        with self.assertRaises(InvalidQolsysEventException):
+            QolsysEvent.from_json({
+                'event': 'ARMING',
+                'arming_type': 'DISARM',
+            })
+
+        self.assertEqual(1, QolsysEvent.REJECTED['ZONE_EVENT'])
+        self.assertEqual(1, QolsysEvent.REJECTED['ARMING'])
+
+    def test_unit_invalid_value_is_rejected(self):
+        with self.assertRaises(InvalidQolsysEventException):
+            QolsysEvent.from_json({
+                'event': 'ALARM',
+                'partition_id': 'zero',
+            })
+
+        self.assertEqual(1, QolsysEvent.REJECTED['ALARM'])
+
+    def test_unit_invalid_zone_in_full_zone_event_is_rejected(self):
+        with self.assertRaises(InvalidQolsysSensorException):
+            QolsysEvent.from_json({
+                'event': 'ZONE_EVENT',
+                'zone_event_type': 'ZONE_ADD',
+                'zone': {'type': 'Door_Window', 'name': 'My Door'},
+            })
+
+        self.assertEqual(1, QolsysEvent.REJECTED['ZONE_EVENT'])
+
+    def test_unit_invalid_sensor_in_summary_is_skipped(self):
+        event = QolsysEvent.from_json({
+            'event': 'INFO',
+            'info_type': 'SUMMARY',
+            'partition_list': [
+                {
+                    'partition_id': 0,
+                    'name': 'partition0',
+                    'status': 'DISARM',
+                    'secure_arm': False,
+                    'zone_list': [
+                        {
+                            'id': '001-0000',
+                            'type': 'Door_Window',
+                            'name': 'My Door',
+                            'status': 'Closed',
+                            'zone_id': 10000,
+                            'partition_id': 0,
+                        },
+                        {
+                            'id': '001-0001',
+                            'type': 'Door_Window',
+                            'name': 'My Window',
+                            'status': 'Closed',
+                            'partition_id': 0,
+                        },
+                    ],
+                },
+            ],
+        })
+
+        partitions = event.partitions
+        self.assertEqual(1, len(partitions))
+        self.assertEqual([10000], [s.zone_id for s in partitions[0].sensors])
+
+
+if __name__ == '__main__':
+    unittest.main()
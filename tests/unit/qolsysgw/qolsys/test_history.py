@@ -0,0 +1,129 @@
+import time
+import unittest
+
+from unittest import mock
+
+import tests.unit.qolsysgw.qolsys.testenv  # noqa: F401
+
+from qolsys.events import QolsysEvent
+from qolsys.history import QolsysZoneHistories
+from qolsys.history import QolsysZoneHistory
+from qolsys.sensors import QolsysSensor
+from qolsys.state import QolsysState
+from testutils.fixtures_data import get_zones_summary
+
+
+class TestUnitQolsysZoneHistory(unittest.TestCase):
+
+    def test_unit_ring_buffer_keeps_last_transitions(self):
+        history = QolsysZoneHistory(3, status='Closed')
+        for i, status in enumerate(['Open', 'Closed', 'Open', 'Closed']):
+            history.append(100 + i, status)
+
+        self.assertEqual(3, len(history))
+        self.assertEqual([
+            (101, 'Closed'),
+            (102, 'Open'),
+            (103, 'Closed'),
+        ], history.last())
+        self.assertEqual([(103, 'Closed')], history.last(1))
+        self.assertEqual([], history.last(0))
+        self.assertEqual(102, history.last_status_at('Open'))
+
+    def test_unit_open_duration(self):
+        history = QolsysZoneHistory(8, status='Closed')
+        history.append(100, 'Open')
+        history.append(130, 'Closed')
+        history.append(190, 'Open')
+
+        self.assertEqual(30 + 10, history.open_duration(100, now=200))
+        self.assertEqual(10, history.open_duration(30, now=200))
+        self.assertEqual(0, history.open_duration(50, now=180))
+
+    def test_unit_open_duration_uses_status_before_oldest_transition(self):
+        history = QolsysZoneHistory(2, status='Closed')
+        history.append(100, 'Open')
+        history.append(110, 'Closed')
+        history.append(120, 'Open')
+
+        # The transition to open at 100 was overwritten, but we still know
+        # the zone was open until 110
+        self.assertEqual(5 + 5, history.open_duration(20, now=125))
+
+    def test_unit_flaps(self):
+        history = QolsysZoneHistory(8)
+        for t in (10, 20, 30, 1000):
+            history.append(t, 'Open' if t % 20 else 'Closed')
+
+        self.assertEqual(1, history.flaps(100, now=1050))
+        self.assertEqual(4, history.flaps(3600, now=1050))
+        self.assertEqual(8, history.flaps_per_hour(1800, now=1050))
+
+    def test_unit_queries_on_wrapped_buffer(self):
+        history = QolsysZoneHistory(4, status='Closed')
+        for t in (10, 20, 30, 40, 50, 60):
+            history.append(t, 'Open' if t % 20 else 'Closed')
+
+        # The arrays now hold 50, 60, 30, 40
+        self.assertEqual([30, 40, 50, 60], [t for t, _ in history.last()])
+        self.assertEqual(3, history.flaps(25, now=60))
+        self.assertEqual(4, history.flaps(100, now=60))
+        self.assertEqual(0, history.flaps(10, now=25))
+        self.assertEqual(50, history.last_status_at('Open'))
+        self.assertEqual(10 + 10, history.open_duration(40, now=65))
+
+    def test_unit_to_timestamp(self):
+        now = time.monotonic()
+        self.assertAlmostEqual(time.time() - 10,
+                               QolsysZoneHistory.to_timestamp(now - 10),
+                               delta=1)
+
+
+class TestUnitQolsysZoneHistories(unittest.TestCase):
+
+    def test_unit_status_changes_are_recorded(self):
+        state = QolsysState(QolsysEvent.from_json(get_zones_summary()))
+        histories = QolsysZoneHistories(state, size=4, attributes=True)
+        sensor = state.zone(10000)
+
+        callback = mock.Mock()
+        sensor.register(object(), callback=callback,
+                        changes=[QolsysSensor.NOTIFY_UPDATE_ATTRIBUTES])
+
+        sensor.open()
+        sensor.closed()
+
+        self.assertIs(histories.history(10000), sensor.history)
+        self.assertAlmostEqual(time.monotonic(), sensor.history.last()[-1][0],
+                               delta=1)
+        self.assertEqual(['Open', 'Closed'],
+                         [s for _, s in sensor.history.last()])
+        self.assertEqual(2, callback.call_count)
+
+    def test_unit_transition_is_published_with_the_status(self):
+        state = QolsysState(QolsysEvent.from_json(get_zones_summary()))
+        sensor = state.zone(10000)
+
+        # Registered before the histories, as the updater is
+        transitions = []
+        callback = mock.Mock(side_effect=lambda sensor, changeset:
+                             transitions.append(len(sensor.history)))
+        sensor.register(object(), callback=callback,
+                        changes=[QolsysSensor.NOTIFY_UPDATE_STATUS,
+                                 QolsysSensor.NOTIFY_UPDATE_ATTRIBUTES])
+        QolsysZoneHistories(state, size=4, attributes=True)
+
+        with state.batch():
+            sensor.flaps += 1
+            sensor.open()
+
+        callback.assert_called_once()
+        changeset = callback.call_args.args[1]
+        self.assertEqual({QolsysSensor.NOTIFY_UPDATE_STATUS,
+                          QolsysSensor.NOTIFY_UPDATE_ATTRIBUTES},
+                         set(changeset))
+        self.assertEqual([1], transitions)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,147 @@
+import asyncio
+import os
+import tempfile
+import time
+import unittest
+
+import tests.unit.qolsysgw.qolsys.testenv  # noqa: F401
+
+from qolsys.events import QolsysEvent
+from qolsys.journal import QolsysJournal
+from qolsys.state import QolsysState
+from testutils.fixtures_data import get_zones_summary
+
+
+def _summary():
+    return QolsysEvent.from_json(get_zones_summary())
+
+
+class TestUnitQolsysJournal(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self._tmpdir = tempfile.TemporaryDirectory()
+        self._path = os.path.join(self._tmpdir.name, 'journal.jsonl')
+
+    def tearDown(self):
+        self._tmpdir.cleanup()
+
+    async def test_unit_changes_are_journaled_and_queryable(self):
+        state = QolsysState()
+        journal = QolsysJournal(state, self._path)
+        writer = asyncio.create_task(journal.run())
+
+        # The journal stores timestamps with a millisecond precision
+        start = int(time.time())
+        state.update(_summary())
+        state.zone(10000).open()
+        state.zone(10000).closed()
+        partition = state.partition(0)
+        with state.batch():
+            partition.triggered(alarm_type='POLICE')
+        partition.errored('DISARM_FAILED', 'Invalid usercode')
+        partition.errored('DISARM_FAILED', 'Invalid usercode')
+
+        await asyncio.sleep(0.05)
+        await journal.close()
+        await writer
+
+        self.assertTrue(os.path.exists(self._path))
+        self.assertGreaterEqual(journal.last_status_at(10000, 'Open'), start)
+        self.assertIsNone(journal.last_status_at(10001, 'Open'))
+        self.assertEqual(2, await journal.count('zone', zone_id=10000))
+        self.assertEqual(2, await journal.count('error', since=start,
+                                                error_type='DISARM_FAILED'))
+        self.assertEqual([('ALARM', 'POLICE')], [
+            (r['status'], r['alarm_type'])
+            for r in await journal.records('partition')
+        ])
+
+    async def test_unit_state_is_rebuilt_from_journal(self):
+        state = QolsysState(_summary())
+        journal = QolsysJournal(state, self._path)
+        journal._append_snapshot()
+
+        state.zone(10000).open()
+        state.partition(0).status = 'ARM_AWAY'
+        state.partition(0).errored('DISARM_FAILED', 'Invalid usercode')
+        await journal.close()
+
+        # Simulate a partially written line after a crash
+        with open(self._path, 'a') as f:
+            f.write('{"t": 1')
+
+        restored = QolsysState()
+        journal = QolsysJournal(restored, self._path)
+        self.assertTrue(await journal.restore())
+
+        self.assertTrue(restored.zone(10000).is_open)
+        self.assertEqual('ARM_AWAY', restored.partition(0).status)
+        self.assertEqual(1, restored.partition(0).disarm_failed)
+        self.assertEqual(state.partition(0).last_error_at,
+                         restored.partition(0).last_error_at)
+
+    async def test_unit_close_waits_for_the_write_in_progress(self):
+        state = QolsysState(_summary())
+        journal = QolsysJournal(state, self._path)
+        writer = asyncio.create_task(journal.run())
+
+        # Each write is slow enough for the journal to be closed while the
+        # writer is still writing, as when compacting a large journal
+        write = journal._write
+
+        def slow_write(*args, **kwargs):
+            time.sleep(0.05)
+            write(*args, **kwargs)
+
+        journal._write = slow_write
+
+        state.zone(10000).open()
+        await asyncio.sleep(0.01)
+        state.zone(10000).closed()
+        state.zone(10000).open()
+        await journal.close()
+        await writer
+
+        # The records queued while the writer was busy are written after
+        # the ones it was writing, and none is lost
+        self.assertEqual(['Open', 'Closed', 'Open'], [
+            r['status'] for r in await journal.records('zone')
+        ])
+
+    async def test_unit_compaction_drops_old_records(self):
+        state = QolsysState(_summary())
+        journal = QolsysJournal(state, self._path, retention=1)
+        journal._append(QolsysJournal.RECORD_ZONE, zone_id=10000,
+                        status='Open')
+        journal._queue[0]['t'] -= 2 * 86400
+        state.zone(10000).open()
+        await journal.close()
+
+        journal._compact(journal._dumps(journal._snapshot_record()))
+
+        records = await journal.records()
+        self.assertEqual(['zone', 'snapshot'], [r['k'] for r in records])
+        self.assertGreater(records[0]['t'], time.time() - 86400)
+        self.assertFalse(os.path.exists(f'{self._path}.tmp'))
+
+    async def test_unit_quiet_journal_is_compacted_periodically(self):
+        state = QolsysState(_summary())
+        journal = QolsysJournal(state, self._path, retention=1)
+        journal._COMPACT_INTERVAL = .05
+        journal._append(QolsysJournal.RECORD_ZONE, zone_id=10000,
+                        status='Open')
+        journal._queue[0]['t'] -= 2 * 86400
+        writer = asyncio.create_task(journal.run())
+
+        # Nothing else is written, the old record is still dropped once
+        # the compaction interval elapsed
+        await asyncio.sleep(.2)
+        await journal.close()
+        await writer
+
+        records = await journal.records()
+        self.assertEqual(['snapshot'], [r['k'] for r in records])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,121 @@
+import json
+import os
+import tempfile
+import unittest
+
+from unittest import mock
+
+from tests.unit.qolsysgw.qolsys.testenv import FIXTURES_DIR
+
+from qolsys.mac import QolsysMacResolver
+from qolsys.mac import mac_from_arp_command
+from qolsys.mac import mac_from_proc_arp
+
+
+PROC_NET_ARP = '''\
+IP address       HW type     Flags       HW address            Mask     Device
+192.168.1.10     0x1         0x2         01:12:76:EF:11:02     *        eth0
+192.168.1.11     0x1         0x0         00:00:00:00:00:00     *        eth0
+'''
+
+
+def _arp_process(fixture):
+    with open(os.path.join(FIXTURES_DIR, fixture), 'rb') as f:
+        output = f.read()
+
+    process = mock.Mock()
+    process.communicate = mock.AsyncMock(return_value=(output, b''))
+    return mock.AsyncMock(return_value=process)
+
+
+class TestUnitMacFromProcArp(unittest.TestCase):
+
+    def setUp(self):
+        self._tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self._tmpdir.cleanup)
+
+        self._path = os.path.join(self._tmpdir.name, 'arp')
+        with open(self._path, 'w') as f:
+            f.write(PROC_NET_ARP)
+
+    def test_unit_returns_mac_address_of_ip(self):
+        self.assertEqual('01:12:76:ef:11:02',
+                         mac_from_proc_arp('192.168.1.10', path=self._path))
+
+    def test_unit_returns_none_on_incomplete_entry(self):
+        self.assertIsNone(mac_from_proc_arp('192.168.1.11', path=self._path))
+
+    def test_unit_returns_none_on_unknown_ip(self):
+        self.assertIsNone(mac_from_proc_arp('192.168.1.12', path=self._path))
+
+    def test_unit_returns_none_without_arp_table(self):
+        self.assertIsNone(mac_from_proc_arp(
+            '192.168.1.10', path=os.path.join(self._tmpdir.name, 'missing')))
+
+
+class TestUnitMacFromArpCommand(unittest.IsolatedAsyncioTestCase):
+
+    async def test_unit_returns_none_without_arp_command(self):
+        with mock.patch('asyncio.create_subprocess_exec',
+                        side_effect=FileNotFoundError):
+            self.assertIsNone(await mac_from_arp_command('random_host'))
+
+    async def test_unit_returns_none_on_mac_address_not_found(self):
+        with mock.patch('asyncio.create_subprocess_exec',
+                        _arp_process('subprocess_run_arp_unknown_host.txt')):
+            self.assertIsNone(await mac_from_arp_command('random_host'))
+
+    async def test_unit_returns_mac_address_on_success(self):
+        with mock.patch('asyncio.create_subprocess_exec',
+                        _arp_process('subprocess_run_arp_known_host.txt')):
+            self.assertEqual(await mac_from_arp_command('random_host'),
+                             '01:12:76:ef:11:02')
+
+
+class TestUnitQolsysMacResolver(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self._tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self._tmpdir.cleanup)
+
+        self._cache_path = os.path.join(self._tmpdir.name, 'mac.json')
+
+    async def test_unit_resolve_saves_to_cache(self):
+        resolver = QolsysMacResolver('random_host',
+                                     cache_path=self._cache_path)
+        self.assertIsNone(resolver.cached())
+
+        with mock.patch.object(resolver, '_resolve_ip',
+                               mock.AsyncMock(return_value='192.168.1.10')), \
+                mock.patch('qolsys.mac.mac_from_proc_arp',
+                           return_value='01:12:76:ef:11:02'):
+            self.assertEqual('01:12:76:ef:11:02', await resolver.resolve())
+
+        with open(self._cache_path) as f:
+            self.assertEqual({'random_host': '01:12:76:ef:11:02'},
+                             json.load(f))
+        self.assertEqual('01:12:76:ef:11:02', resolver.cached())
+
+    async def test_unit_resolve_uses_cache_first(self):
+        with open(self._cache_path, 'w') as f:
+            json.dump({'random_host': '01:12:76:ef:11:02'}, f)
+
+        resolver = QolsysMacResolver('random_host',
+                                     cache_path=self._cache_path)
+
+        with mock.patch('asyncio.create_subprocess_exec') as arp:
+            self.assertEqual('01:12:76:ef:11:02', await resolver.resolve())
+            arp.assert_not_called()
+
+    async def test_unit_resolve_falls_back_to_arp_command(self):
+        resolver = QolsysMacResolver('random_host')
+
+        with mock.patch.object(resolver, '_resolve_ip',
+                               mock.AsyncMock(return_value=None)), \
+                mock.patch('asyncio.create_subprocess_exec',
+                           _arp_process('subprocess_run_arp_known_host.txt')):
+            self.assertEqual('01:12:76:ef:11:02', await resolver.resolve())
+
+
+if __name__ == '__main__':
+    unittest.main()
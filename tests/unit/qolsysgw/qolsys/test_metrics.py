@@ -0,0 +1,170 @@
+import asyncio
+import unittest
+
+from unittest import mock
+
+import tests.unit.qolsysgw.qolsys.testenv  # noqa: F401
+
+from qolsys.metrics import QolsysHistogram
+from qolsys.metrics import QolsysMetrics
+
+
+class TestUnitQolsysHistogram(unittest.TestCase):
+
+    def test_unit_percentiles_use_bucket_bounds(self):
+        histogram = QolsysHistogram(buckets=(.001, .01, .1))
+        for value in [.0005] * 98 + [.05, .2]:
+            histogram.observe(value)
+
+        self.assertEqual(100, histogram.count)
+        self.assertEqual(.001, histogram.percentile(.5))
+        self.assertEqual(.1, histogram.percentile(.99))
+        self.assertEqual(.2, histogram.percentile(1))
+        self.assertEqual([
+            (.001, 98),
+            (.01, 98),
+            (.1, 99),
+            (float('inf'), 100),
+        ], list(histogram.cumulative()))
+
+    def test_unit_empty_histogram(self):
+        histogram = QolsysHistogram()
+        self.assertIsNone(histogram.percentile(.5))
+        self.assertEqual({
+            'count': 0,
+            'avg_ms': None,
+            'p50_ms': None,
+            'p99_ms': None,
+            'max_ms': 0,
+        }, histogram.to_dict())
+
+
+class TestUnitQolsysMetrics(unittest.TestCase):
+
+    def test_unit_trace_records_each_stage(self):
+        metrics = QolsysMetrics()
+
+        with mock.patch('time.monotonic', side_effect=[10.5, 11, 11.25]):
+            trace = metrics.trace(started_at=10)
+            trace.mark('decode')
+            trace.mark('broker')
+            trace.finish()
+
+        self.assertEqual(.5, metrics.histogram('decode').sum)
+        self.assertEqual(.5, metrics.histogram('broker').sum)
+        self.assertEqual(1.25, metrics.histogram('total').sum)
+        self.assertEqual(0, metrics.histogram('publish').count)
+
+    def test_unit_pending_traces_are_resumed_in_order(self):
+        metrics = QolsysMetrics(max_pending=1)
+        first, second = metrics.trace(), metrics.trace()
+
+        metrics.track('a', first)
+        metrics.track('b', second)
+
+        # The oldest event was dropped to make room for the last one
+        self.assertIsNone(metrics.resume('a'))
+        self.assertIs(second, metrics.resume('b'))
+        self.assertFalse(metrics.pending)
+
+        metrics = QolsysMetrics()
+        metrics.track('a', first)
+        metrics.track('a', second)
+        self.assertIs(first, metrics.resume('a'))
+        self.assertIs(second, metrics.resume('a'))
+        self.assertIsNone(metrics.resume('a'))
+
+    def test_unit_diagnostics(self):
+        metrics = QolsysMetrics()
+        metrics.frame_received(received_at=100)
+        metrics.increment('decode_failures')
+        metrics.observe('total', .004)
+
+        diagnostics = metrics.diagnostics(now=102)
+        self.assertIsNone(diagnostics['events_per_second'])
+        self.assertEqual(2, diagnostics['last_frame_age'])
+        self.assertEqual(1, diagnostics['decode_failures'])
+        self.assertEqual(4, diagnostics['latency_avg'])
+        self.assertEqual(4, diagnostics['latency_p99'])
+
+        metrics.increment('events', 30)
+        diagnostics = metrics.diagnostics(now=112)
+        self.assertEqual(3, diagnostics['events_per_second'])
+
+    def test_unit_rate_does_not_depend_on_readers(self):
+        metrics = QolsysMetrics()
+        self.assertIsNone(metrics.rate('events', now=100))
+
+        # Reading the rate in between does not reset its window
+        metrics.increment('events', 50)
+        self.assertEqual(10, metrics.rate('events', now=105))
+        metrics.increment('events', 10)
+        self.assertEqual(6, metrics.rate('events', now=110))
+        self.assertEqual(6, metrics.rate('events', now=110))
+
+        # Once old enough, the rate is computed over the last window
+        metrics.increment('events', 60)
+        self.assertEqual(70 / 60, metrics.rate('events', now=165))
+
+    def test_unit_publish_queue_depth(self):
+        metrics = QolsysMetrics()
+        future = mock.Mock()
+        metrics.track_publish(future)
+        self.assertEqual(1, metrics.gauge('publish_queue_depth'))
+
+        callback = future.add_done_callback.call_args.args[0]
+        callback(future)
+        self.assertEqual(0, metrics.gauge('publish_queue_depth'))
+
+    def test_unit_prometheus_format(self):
+        metrics = QolsysMetrics()
+        metrics.increment('frames', 3)
+        metrics.observe('decode', .002)
+
+        text = metrics.to_prometheus()
+
+        self.assertIn('# TYPE qolsysgw_frames_total counter\n'
+                      'qolsysgw_frames_total 3\n', text)
+        self.assertIn('qolsysgw_stage_duration_seconds_bucket'
+                      '{stage="decode",le="0.001"} 0\n', text)
+        self.assertIn('qolsysgw_stage_duration_seconds_bucket'
+                      '{stage="decode",le="0.0025"} 1\n', text)
+        self.assertIn('qolsysgw_stage_duration_seconds_count'
+                      '{stage="decode"} 1\n', text)
+
+
+class TestUnitQolsysMetricsServer(unittest.IsolatedAsyncioTestCase):
+
+    async def test_unit_serve_prometheus_text(self):
+        metrics = QolsysMetrics()
+        metrics.increment('events')
+        await metrics.serve(port=0, host='127.0.0.1')
+        port = metrics._server.sockets[0].getsockname()[1]
+
+        reader, writer = await asyncio.open_connection('127.0.0.1', port)
+        writer.write(b'GET /metrics HTTP/1.0\r\n\r\n')
+        response = await reader.read()
+        writer.close()
+        metrics.close()
+
+        self.assertTrue(response.startswith(b'HTTP/1.0 200 OK\r\n'))
+        self.assertIn(b'qolsysgw_events_total 1\n', response)
+
+    async def test_unit_serve_closes_idle_clients(self):
+        metrics = QolsysMetrics()
+        await metrics.serve(port=0, timeout=.05)
+        host, port = metrics._server.sockets[0].getsockname()[:2]
+        self.assertEqual('127.0.0.1', host)
+
+        # The client never finishes its request
+        reader, writer = await asyncio.open_connection(host, port)
+        writer.write(b'GET /metrics HTTP/1.0\r\n')
+        response = await asyncio.wait_for(reader.read(), 1)
+        writer.close()
+        metrics.close()
+
+        self.assertEqual(b'', response)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,145 @@
+import unittest
+
+from unittest import mock
+
+import tests.unit.qolsysgw.qolsys.testenv  # noqa: F401
+
+from qolsys.observable import QolsysChange
+from qolsys.observable import QolsysChangeset
+from qolsys.observable import QolsysItemsChange
+from qolsys.observable import QolsysObservable
+
+
+class TestUnitQolsysObservable(unittest.TestCase):
+
+    def test_unit_observer_only_receives_subscribed_changes(self):
+        observable = QolsysObservable()
+        callback = mock.Mock()
+        observable.register(object(), callback=callback, changes=['a'])
+
+        observable.notify(change='b')
+        callback.assert_not_called()
+
+        observable.notify(change='a', prev_value=1, new_value=2)
+        callback.assert_called_once_with(
+            observable, {'a': QolsysChange(prev_value=1, new_value=2)})
+
+    def test_unit_observer_without_changes_receives_everything(self):
+        observable = QolsysObservable()
+        callback = mock.Mock()
+        observable.register(object(), callback=callback)
+
+        observable.notify(change='a')
+        observable.notify(change='b')
+
+        self.assertEqual(2, callback.call_count)
+
+    def test_unit_changeset_is_delivered_once(self):
+        observable = QolsysObservable()
+        callback = mock.Mock()
+        observable.register(object(), callback=callback, changes=['a', 'b'])
+
+        changeset = QolsysChangeset().add('a').add('b').add('c')
+        observable.notify_changeset(changeset)
+
+        callback.assert_called_once_with(observable, changeset)
+
+    def test_unit_batch_merges_changes_until_commit(self):
+        first = QolsysObservable()
+        second = QolsysObservable()
+        first_callback = mock.Mock()
+        second_callback = mock.Mock()
+        first.register(object(), callback=first_callback)
+        second.register(object(), callback=second_callback)
+
+        with first.batch():
+            first.notify(change='a', prev_value=1, new_value=2)
+            with second.batch():
+                second.notify(change='b')
+            first.notify(change='a', prev_value=2, new_value=3)
+            first.notify(change='c')
+
+            first_callback.assert_not_called()
+            second_callback.assert_not_called()
+
+        first_callback.assert_called_once_with(first, {
+            'a': QolsysChange(prev_value=1, new_value=3),
+            'c': QolsysChange(),
+        })
+        second_callback.assert_called_once_with(
+            second, {'b': QolsysChange()})
+
+    def test_unit_batch_drops_reverted_changes(self):
+        observable = QolsysObservable()
+        callback = mock.Mock()
+        observable.register(object(), callback=callback)
+
+        with observable.batch():
+            observable.notify(change='a', prev_value=1, new_value=2)
+            observable.notify(change='a', prev_value=2, new_value=1)
+            observable.notify(change='b', prev_value=None, new_value='x')
+            observable.notify(change='b', prev_value='x', new_value=None)
+
+        callback.assert_not_called()
+
+        with observable.batch():
+            observable.notify(change='a', prev_value=1, new_value=2)
+            observable.notify(change='a', prev_value=2, new_value=1)
+            observable.notify(change='a', prev_value=1, new_value=3)
+            observable.notify(change='c')
+            observable.notify(change='c')
+
+        callback.assert_called_once_with(observable, {
+            'a': QolsysChange(prev_value=1, new_value=3),
+            'c': QolsysChange(),
+        })
+
+    def test_unit_batch_accumulates_items_changes(self):
+        observable = QolsysObservable()
+        callback = mock.Mock()
+        observable.register(object(), callback=callback)
+
+        with observable.batch():
+            observable.notify_changeset(
+                QolsysChangeset().add_items('items', added=['a']))
+            observable.notify_changeset(
+                QolsysChangeset().add_items('items', added=['b'],
+                                            removed=['c']))
+
+        callback.assert_called_once_with(observable, {
+            'items': QolsysItemsChange(prev_value=['c'],
+                                       new_value=['a', 'b']),
+        })
+
+    def test_unit_observer_registered_first_can_add_changes(self):
+        observable = QolsysObservable()
+        calls = []
+        observable.register(
+            'later', changes=['b'],
+            callback=lambda o, changeset: calls.append(('later', changeset)))
+        observable.register(
+            'first', changes=['a'], first=True,
+            callback=lambda o, changeset: changeset.add('b'))
+
+        observable.notify(change='a', prev_value=1, new_value=2)
+
+        self.assertEqual([('later', {
+            'a': QolsysChange(prev_value=1, new_value=2),
+            'b': QolsysChange(),
+        })], calls)
+
+    def test_unit_unregister_stops_notifications(self):
+        observable = QolsysObservable()
+        observer = object()
+        callback = mock.Mock()
+        observable.register(observer, callback=callback, changes=['a'])
+        observable.unregister(observer)
+
+        observable.notify(change='a')
+
+        callback.assert_not_called()
+        self.assertFalse(observable.observes('a'))
+
+
+if __name__ == '__main__':
+    unittest.main()
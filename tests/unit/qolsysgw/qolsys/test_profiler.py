@@ -0,0 +1,68 @@
+import unittest
+
+from unittest import mock
+
+import tests.unit.qolsysgw.qolsys.testenv  # noqa: F401
+
+from qolsys.profiler import QolsysStartupProfiler
+from qolsys.profiler import import_times
+from qolsys.profiler import is_app_module
+from qolsys.profiler import parse_import_times
+
+
+IMPORT_TIME_OUTPUT = '''\
+import time: self [us] | cumulative | imported package
+import time:       120 |        120 |   _io
+import time:       310 |        850 |       qolsys.utils
+import time:      1540 |       2390 |     qolsys.events
+import time:       420 |       4200 | gateway
+'''
+
+
+class TestUnitImportTimes(unittest.IsolatedAsyncioTestCase):
+
+    def test_unit_parse_import_times(self):
+        self.assertEqual([
+            ('_io', 120, 120),
+            ('qolsys.utils', 310, 850),
+            ('qolsys.events', 1540, 2390),
+            ('gateway', 420, 4200),
+        ], parse_import_times(IMPORT_TIME_OUTPUT))
+
+    def test_unit_is_app_module(self):
+        self.assertTrue(is_app_module('gateway'))
+        self.assertTrue(is_app_module('qolsys.events'))
+        self.assertTrue(is_app_module('mqtt.updater'))
+        self.assertFalse(is_app_module('json'))
+        self.assertFalse(is_app_module('appdaemon.plugins.mqtt.mqttapi'))
+
+    async def test_unit_import_times_of_module(self):
+        times = await import_times('qolsys.events')
+
+        modules = [t[0] for t in times]
+        self.assertIn('qolsys.events', modules)
+        self.assertIn('qolsys.utils', modules)
+
+    async def test_unit_import_times_returns_none_on_failure(self):
+        with self.assertLogs('qolsys.profiler', level='WARNING'):
+            self.assertIsNone(await import_times('qolsys.does_not_exist'))
+
+
+class TestUnitQolsysStartupProfiler(unittest.TestCase):
+
+    def test_unit_mark_records_first_time_reached(self):
+        clock = mock.Mock(side_effect=[10, 10.5, 11, 12])
+        profiler = QolsysStartupProfiler(clock=clock)
+
+        self.assertEqual(.5, profiler.mark('connected'))
+        self.assertEqual(1, profiler.mark('first_summary'))
+        self.assertIsNone(profiler.mark('first_summary'))
+
+        self.assertEqual({'connected': .5, 'first_summary': 1},
+                         profiler.stages)
+        self.assertEqual('connected=500.0ms first_summary=1000.0ms',
+                         str(profiler))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,168 @@
+import asyncio
+import json
+import os
+import tempfile
+import unittest
+
+from unittest import mock
+
+import tests.unit.qolsysgw.qolsys.testenv  # noqa: F401
+
+from qolsys.events import QolsysEvent
+from qolsys.exceptions import UnableToParseEventException
+from qolsys.partition import QolsysPartition
+from qolsys.snapshot import QolsysStateSnapshot
+from qolsys.state import QolsysState
+from testutils.fixtures_data import get_zones_summary
+
+
+def _summary(status='DISARM', sensor_status='Closed', zones=(10000, 10001)):
+    return QolsysEvent.from_json(get_zones_summary(
+        status=status, sensor_status=sensor_status, zones=zones))
+
+
+class TestUnitQolsysStateSnapshot(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self._tmpdir = tempfile.TemporaryDirectory()
+        self._path = os.path.join(self._tmpdir.name, 'state.json')
+
+    def tearDown(self):
+        self._tmpdir.cleanup()
+
+    async def test_unit_snapshot_round_trip(self):
+        state = QolsysState(_summary())
+        partition = state.partition(0)
+        partition.errored('DISARM_FAILED', 'Invalid usercode')
+        state.zone(10001).open()
+        state.zone(10001).open()
+
+        await QolsysStateSnapshot(state, self._path).save()
+        self.assertFalse(os.path.exists(f'{self._path}.tmp'))
+
+        restored = QolsysState()
+        self.assertTrue(await QolsysStateSnapshot(restored, self._path).restore())
+
+        restored_partition = restored.partition(0)
+        self.assertEqual('DISARM', restored_partition.status)
+        self.assertEqual(1, restored_partition.disarm_failed)
+        self.assertEqual('Invalid usercode', restored_partition.last_error_desc)
+        self.assertEqual(partition.last_error_at,
+                         restored_partition.last_error_at)
+        self.assertEqual([10000, 10001],
+                         [s.zone_id for s in restored_partition.sensors])
+        self.assertTrue(restored.zone(10001).is_open)
+        self.assertTrue(restored.zone(10001).tampered)
+        self.assertIs(restored_partition, restored.zone(10001).partition)
+
+    async def test_unit_snapshot_round_trip_last_exception(self):
+        state = QolsysState(_summary())
+        exc = UnableToParseEventException('Unable to parse event')
+
+        await QolsysStateSnapshot(state, self._path).save()
+
+        restored = QolsysState()
+        self.assertTrue(await QolsysStateSnapshot(restored, self._path).restore())
+
+        self.assertIsInstance(restored.last_exception,
+                              UnableToParseEventException)
+        self.assertEqual('Unable to parse event',
+                         str(restored.last_exception))
+        self.assertEqual(exc.at, restored.last_exception.at)
+
+    async def test_unit_missing_or_invalid_snapshot_is_ignored(self):
+        state = QolsysState()
+        snapshot = QolsysStateSnapshot(state, self._path)
+
+        self.assertFalse(await snapshot.restore())
+
+        with open(self._path, 'w') as f:
+            json.dump({'version': 1, 'partition_list': 'invalid'}, f)
+
+        with self.assertLogs('qolsys.snapshot', level='WARNING'):
+            self.assertFalse(await snapshot.restore())
+
+        self.assertEqual([], list(state.partitions))
+
+    async def test_unit_changes_are_saved_after_delay(self):
+        state = QolsysState(_summary())
+        snapshot = QolsysStateSnapshot(state, self._path, delay=0.01)
+
+        with mock.patch.object(snapshot, 'save', wraps=snapshot.save) as save:
+            state.zone(10000).open()
+            state.zone(10001).open()
+            save.assert_not_called()
+
+            await asyncio.sleep(0.05)
+            save.assert_called_once_with()
+
+        with open(self._path) as f:
+            data = json.load(f)
+
+        self.assertEqual(['Open', 'Open'], [
+            s['status'] for s in data['partition_list'][0]['zone_list']])
+
+    async def test_unit_error_changes_are_saved_after_delay(self):
+        state = QolsysState(_summary())
+        QolsysStateSnapshot(state, self._path, delay=0.01)
+
+        state.last_exception = UnableToParseEventException('Unable to parse')
+        await asyncio.sleep(0.05)
+
+        restored = QolsysState()
+        self.assertTrue(await QolsysStateSnapshot(restored,
+                                                  self._path).restore())
+        self.assertEqual('Unable to parse', str(restored.last_exception))
+
+
+class TestUnitQolsysStateUpdate(unittest.TestCase):
+
+    def test_unit_summary_with_same_partitions_updates_in_place(self):
+        state = QolsysState(_summary())
+        partition = state.partition(0)
+        sensor = state.zone(10000)
+
+        observer = mock.Mock()
+        state.register(observer, callback=observer.state)
+        partition.register(observer, callback=observer.partition)
+
+        state.update(_summary(status='ARM_AWAY', sensor_status='Open',
+                              zones=(10000, 10002)))
+
+        # The same objects are kept, so there is no need to configure
+        # everything again
+        observer.state.assert_not_called()
+        self.assertIs(partition, state.partition(0))
+        self.assertIs(sensor, state.zone(10000))
+
+        self.assertEqual('ARM_AWAY', partition.status)
+        self.assertTrue(sensor.is_open)
+        self.assertIsNone(state.zone(10001))
+        self.assertIs(partition, state.zone(10002).partition)
+
+        changes = set()
+        for call in observer.partition.call_args_list:
+            changes.update(call.args[1])
+        self.assertEqual({
+            QolsysPartition.NOTIFY_UPDATE_STATUS,
+            QolsysPartition.NOTIFY_REMOVE_SENSOR,
+            QolsysPartition.NOTIFY_ADD_SENSOR,
+        }, changes)
+
+    def test_unit_summary_with_other_partitions_replaces_them(self):
+        state = QolsysState(_summary())
+        partition = state.partition(0)
+
+        observer = mock.Mock()
+        state.register(observer, callback=observer.state)
+
+        event = _summary()
+        event.partitions[0]._name = 'renamed'
+        state.update(event)
+
+        observer.state.assert_called_once()
+        self.assertIsNot(partition, state.partition(0))
+
+
+if __name__ == '__main__':
+    unittest.main()
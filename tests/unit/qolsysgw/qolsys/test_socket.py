@@ -0,0 +1,94 @@
+import asyncio
+import unittest
+
+from unittest import mock
+
+import tests.unit.qolsysgw.qolsys.testenv  # noqa: F401
+
+from qolsys.actions import QolsysActionArmStay
+from qolsys.actions import QolsysActionInfo
+from qolsys.socket import QolsysSocket
+
+
+class TestUnitQolsysSocket(unittest.IsolatedAsyncioTestCase):
+
+    def _socket(self):
+        socket = QolsysSocket(hostname='localhost', token='token')
+        socket._writer = mock.Mock()
+        socket._writer.drain = mock.AsyncMock()
+        return socket
+
+    async def test_unit_acks_resolve_commands_in_order(self):
+        socket = self._socket()
+
+        info = await socket.send(QolsysActionInfo())
+        arm = await socket.send(QolsysActionArmStay(partition_id=0))
+
+        socket._acknowledged()
+        self.assertTrue(info.done())
+        self.assertFalse(arm.done())
+
+        socket._acknowledged()
+        self.assertTrue(arm.done())
+
+    async def test_unit_keep_alive_ack_does_not_resolve_command(self):
+        socket = self._socket()
+
+        # Write a single keep-alive, then stop the loop
+        with mock.patch('asyncio.sleep', side_effect=StopAsyncIteration):
+            with self.assertRaises(StopAsyncIteration):
+                await socket.keep_alive()
+        arm = await socket.send(QolsysActionArmStay(partition_id=0))
+
+        # The first ACK is the one of the keep-alive, which was received
+        # by the panel before the command
+        socket._acknowledged()
+        self.assertFalse(arm.done())
+
+        socket._acknowledged()
+        self.assertTrue(arm.done())
+
+    async def test_unit_timed_out_command_is_dropped_from_acks(self):
+        socket = self._socket()
+
+        # The ACK of the first command never comes, which is detected by
+        # its future being cancelled, by the caller or the ack timeout
+        info = await socket.send(QolsysActionInfo())
+        arm = await socket.send(QolsysActionArmStay(partition_id=0))
+        info.cancel()
+
+        socket._acknowledged()
+        self.assertTrue(arm.done())
+        self.assertFalse(arm.cancelled())
+
+    async def test_unit_ack_timeout_expires_pending_messages(self):
+        socket = self._socket()
+        socket.ack_timeout = 0.01
+
+        info = await socket.send(QolsysActionInfo())
+        await asyncio.sleep(0.05)
+
+        # The next ACK goes to the message sent after the timeout, instead
+        # of the expired one
+        arm = await socket.send(QolsysActionArmStay(partition_id=0))
+        socket._acknowledged()
+        self.assertTrue(info.cancelled())
+        self.assertTrue(arm.done())
+        self.assertFalse(arm.cancelled())
+        self.assertEqual(0, len(socket._acks))
+
+    async def test_unit_cancel_acks_cancels_pending_commands(self):
+        socket = self._socket()
+
+        await socket._write('\n')
+        arm = await socket.send(QolsysActionArmStay(partition_id=0))
+
+        socket._cancel_acks()
+        self.assertTrue(arm.cancelled())
+
+        # An ACK received once nothing is pending is ignored
+        socket._acknowledged()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,36 +1,58 @@
-import os
-import subprocess
 import unittest
 
-from unittest import mock
-
-from tests.unit.qolsysgw.qolsys.testenv import FIXTURES_DIR
-
-from qolsys.utils import get_mac_from_host
-
-
-class TestUnitGetMacFromHost(unittest.TestCase):
-
-    def test_unit_returns_none_on_subprocess_error(self):
-        with mock.patch('subprocess.run', side_effect=subprocess.SubprocessError):
-            self.assertIsNone(get_mac_from_host('random_host'))
-
-    def test_unit_returns_none_on_mac_address_not_found(self):
-        fixture = os.path.join(FIXTURES_DIR, 'subprocess_run_arp_unknown_host.txt')
-        with open(fixture, 'rb') as f:
-            output = f.read()
-
-        with mock.patch('subprocess.run', return_value=mock.Mock(stdout=output)):
-            self.assertIsNone(get_mac_from_host('random_host'))
-
-    def test_unit_returns_mac_address_on_success(self):
-        fixture = os.path.join(FIXTURES_DIR, 'subprocess_run_arp_known_host.txt')
-        with open(fixture, 'rb') as f:
-            output = f.read()
-
-        with mock.patch('subprocess.run', return_value=mock.Mock(stdout=output)):
-            self.assertEqual(get_mac_from_host('random_host'),
-                             '01:12:76:ef:11:02')
+import tests.unit.qolsysgw.qolsys.testenv  # noqa: F401
+
+from qolsys.control import QolsysControl
+from qolsys.control import QolsysControlArmCustomBypass
+from qolsys.events import QolsysEvent
+from qolsys.events import QolsysEventInfo
+from qolsys.events import QolsysEventZoneEvent
+from qolsys.sensors import QolsysSensor
+from qolsys.sensors import QolsysSensorCODetector
+from qolsys.utils import find_subclass
+from qolsys.utils import subtype_names
+from qolsys.utils import warm_subclass_cache
+
+
+class TestUnitFindSubclass(unittest.TestCase):
+
+    def test_unit_subtype_names_match_panel_names(self):
+        self.assertCountEqual(
+            ['INFO', 'ZONE_EVENT', 'ARMING', 'ALARM', 'ERROR'],
+            subtype_names(QolsysEvent, QolsysEvent.__subclasses__()))
+        self.assertCountEqual(['SUMMARY', 'SECURE_ARM'],
+                              subtype_names(QolsysEventInfo))
+        self.assertCountEqual(['ACTIVE', 'UPDATE', 'ADD'],
+                              subtype_names(QolsysEventZoneEvent))
+
+    def test_unit_warm_subclass_cache_resolves_subtypes(self):
+        cache = {}
+        warm_subclass_cache(QolsysControl, cache,
+                            subtypes=subtype_names(QolsysControl))
+
+        self.assertIs(QolsysControlArmCustomBypass,
+                      cache['ARM_CUSTOM_BYPASS'])
+
+        cache = {}
+        warm_subclass_cache(
+            QolsysSensor, cache,
+            subtypes=subtype_names(QolsysSensor, separator='', upper=False),
+            preserve_capitals=True)
+
+        self.assertIs(QolsysSensorCODetector, cache['CODetector'])
+        self.assertNotIn('_QolsysSensorWithoutUpdates', cache)
+
+    def test_unit_find_subclass_defined_after_warm_up(self):
+        warm_subclass_cache(QolsysControl, {})
+
+        class QolsysControlLateDefined(QolsysControl):
+            pass
+
+        cache = {}
+        self.assertIs(QolsysControlLateDefined,
+                      find_subclass(QolsysControl, 'LATE_DEFINED',
+                                    cache=cache))
+        self.assertIs(QolsysControlLateDefined, cache['LATE_DEFINED'])
 
 
 if __name__ == '__main__':
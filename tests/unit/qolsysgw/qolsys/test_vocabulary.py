@@ -0,0 +1,55 @@
+import unittest
+
+import tests.unit.qolsysgw.qolsys.testenv  # noqa: F401
+
+from qolsys.vocabulary import PARTITION_STATUS
+from qolsys.vocabulary import SENSOR_STATUS
+from qolsys.vocabulary import QolsysVocabulary
+
+
+class TestUnitQolsysVocabulary(unittest.TestCase):
+
+    def test_unit_known_values_are_exposed_as_attributes(self):
+        self.assertEqual('ARM_AWAY', PARTITION_STATUS.ARM_AWAY)
+        self.assertEqual('ARM-AWAY-EXIT-DELAY',
+                         PARTITION_STATUS.ARM_AWAY_EXIT_DELAY)
+        self.assertEqual('Open', SENSOR_STATUS.OPEN)
+
+    def test_unit_lookup_returns_the_canonical_instance(self):
+        value = ''.join(['arm', '_', 'away'])
+
+        self.assertIs(PARTITION_STATUS.ARM_AWAY, PARTITION_STATUS(value))
+        self.assertIs(SENSOR_STATUS.CLOSED, SENSOR_STATUS('CLOSED'))
+
+    def test_unit_unknown_values_are_learned(self):
+        vocabulary = QolsysVocabulary('test', ['A'], normalize=str.upper)
+
+        first = vocabulary(''.join(['b', 'b']))
+        second = vocabulary(''.join(['B', 'b']))
+
+        self.assertEqual('BB', first)
+        self.assertIs(first, second)
+        self.assertNotIn('BB', vocabulary)
+
+    def test_unit_strict_rejects_unknown_values(self):
+        self.assertIs(SENSOR_STATUS.OPEN, SENSOR_STATUS.strict('open'))
+
+        with self.assertRaises(ValueError):
+            SENSOR_STATUS.strict('Active')
+
+    def test_unit_non_string_values_are_rejected(self):
+        with self.assertRaises(TypeError):
+            PARTITION_STATUS(42)
+
+    def test_unit_table_size_is_bounded(self):
+        vocabulary = QolsysVocabulary('test', [], normalize=str.upper)
+        vocabulary._MAX_SIZE = 4
+
+        for i in range(10):
+            self.assertEqual(f'V{i}', vocabulary(f'v{i}'))
+
+        self.assertEqual(4, len(vocabulary._table))
+
+
+if __name__ == '__main__':
+    unittest.main()